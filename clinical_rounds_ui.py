@@ -16,13 +16,14 @@ You can choose to draft each step yourself or let the AI resident doctor suggest
 creating a collaborative human-AI diagnostic workflow.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Optional
 
 import streamlit as st
 
 from config import Config
-from data_loader import CaseFile, load_jsonl_cases
+from data_loader import CaseFile, JsonlIndex
 from gatekeeper_agent import GatekeeperAgent
 from judge_agent import JudgeAgent
 from cost_estimator import CostEstimator
@@ -35,9 +36,15 @@ DEFAULT_DATASET = Path(
 
 
 @st.cache_resource
-def load_cases(dataset_path: str) -> List[CaseFile]:
+def load_cases(dataset_path: str) -> JsonlIndex:
     dataset_path = str(Path(dataset_path).expanduser())
-    return load_jsonl_cases(dataset_path, publication_year=2025, is_test_case=True)
+    return JsonlIndex(dataset_path, publication_year=2025, is_test_case=True)
+
+
+@st.cache_resource
+def get_config() -> Config:
+    # One Config (and therefore one OpenAI client) for the whole Streamlit process
+    return Config()
 
 
 def initialize_state():
@@ -61,6 +68,10 @@ def initialize_state():
         st.session_state.action_content_pending = None
     if "llm_status" not in st.session_state:
         st.session_state.llm_status = ""
+    if "prefetch" not in st.session_state:
+        st.session_state.prefetch = None
+    if "context_lines" not in st.session_state:
+        st.session_state.context_lines = []
 
 
 def add_action(
@@ -72,15 +83,19 @@ def add_action(
 ):
     st.session_state.actions.append(action)
     st.session_state.action_authors.append(author_label)
+    idx = len(st.session_state.actions)
+    # Running encounter lines are appended per turn instead of rebuilt on every draft
+    st.session_state.context_lines.append(f"{idx}. {author_label} [{action.action_type.value}]: {action.content}")
 
     if action.action_type == ActionType.DIAGNOSE:
-        st.session_state.responses.append(
-            GatekeeperResponse(response_text="Diagnosis submitted for evaluation.")
-        )
+        response = GatekeeperResponse(response_text="Diagnosis submitted for evaluation.")
+        st.session_state.responses.append(response)
+        st.session_state.context_lines.append(f"   Medical Evidence System: {response.response_text}")
         return
 
     response = gatekeeper.process_action(action, case)
     st.session_state.responses.append(response)
+    st.session_state.context_lines.append(f"   Medical Evidence System: {response.response_text}")
 
     if action.action_type == ActionType.REQUEST_TESTS:
         test_cost = cost_estimator.calculate_test_cost(action.content)
@@ -106,73 +121,136 @@ def build_clinical_context(case: CaseFile) -> str:
         "",
         "Running Encounter:",
     ]
-    for idx, action in enumerate(st.session_state.actions, 1):
-        author = st.session_state.action_authors[idx - 1] if idx - 1 < len(st.session_state.action_authors) else "Attending"
-        lines.append(f"{idx}. {author} [{action.action_type.value}]: {action.content}")
-        if idx - 1 < len(st.session_state.responses):
-            resp = st.session_state.responses[idx - 1]
-            lines.append(f"   Medical Evidence System: {resp.response_text}")
+    lines.extend(st.session_state.context_lines)
     return "\n".join(lines)
 
 
-def suggest_action_with_llm(
-    desired_action: ActionType,
-    case: CaseFile,
-    cfg: Config,
-    model_name: str,
-    temperature: float = 0.3,
-) -> Optional[str]:
-    if not case:
-        return None
-
-    client = cfg.get_openai_client()
-    context = build_clinical_context(case)
-
-    task_map = {
-        ActionType.ASK_QUESTIONS: (
-            "Draft a single, clinically precise bedside question for the patient or staff "
-            "that would meaningfully advance the diagnostic work-up."
-        ),
-        ActionType.REQUEST_TESTS: (
-            "Order exactly one high-yield diagnostic test or imaging study. Include modality and any pertinent qualifiers."
-        ),
-        ActionType.DIAGNOSE: (
-            "Provide a concise, definitive diagnosis (or leading impression) that best explains the presentation."
-        ),
-    }
+_DRAFT_TASKS = {
+    ActionType.ASK_QUESTIONS: (
+        "Draft a single, clinically precise bedside question for the patient or staff "
+        "that would meaningfully advance the diagnostic work-up."
+    ),
+    ActionType.REQUEST_TESTS: (
+        "Order exactly one high-yield diagnostic test or imaging study. Include modality and any pertinent qualifiers."
+    ),
+    ActionType.DIAGNOSE: (
+        "Provide a concise, definitive diagnosis (or leading impression) that best explains the presentation."
+    ),
+}
+
+_RESIDENT_SYSTEM_PROMPT = (
+    "You are an AI resident doctor assisting an attending physician in clinical diagnosis. "
+    "Your role is to collaborate with the attending to manage an undifferentiated patient. "
+    "Speak in precise clinical language, avoid revealing hidden ground truth, "
+    "and keep outputs to a single actionable sentence."
+)
 
-    system_prompt = (
-        "You are an AI resident doctor assisting an attending physician in clinical diagnosis. "
-        "Your role is to collaborate with the attending to manage an undifferentiated patient. "
-        "Speak in precise clinical language, avoid revealing hidden ground truth, "
-        "and keep outputs to a single actionable sentence."
-    )
 
+def _draft_action(
+    client,
+    model_name: str,
+    desired_action: ActionType,
+    context: str,
+    temperature: float = 0.3,
+    placeholder=None,
+) -> str:
+    """LLM call behind the AI resident draft; touches no session state so it can run in a worker thread."""
     user_prompt = f"""
 {context}
 
-Task: {task_map[desired_action]}
+Task: {_DRAFT_TASKS[desired_action]}
 Respond with only the requested utterance, no preamble.
 """
-
-    try:
+    messages = [
+        {"role": "system", "content": _RESIDENT_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt.strip()},
+    ]
+    if placeholder is None:
         completion = chat_completion_with_retries(
             client=client,
             model=model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt.strip()},
-            ],
+            messages=messages,
             temperature=temperature,
             max_tokens=220,
         )
-        content = completion.choices[0].message.content.strip()
-        return content
+        return completion.choices[0].message.content.strip()
+
+    stream = chat_completion_with_retries(
+        client=client,
+        model=model_name,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=220,
+        stream=True,
+    )
+    buffer = ""
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            buffer += delta
+            placeholder.markdown(buffer)
+    if not buffer.strip():
+        raise ValueError("empty completion")
+    return buffer.strip()
+
+
+def suggest_action_with_llm(
+    desired_action: ActionType,
+    case: CaseFile,
+    cfg: Config,
+    model_name: str,
+    temperature: float = 0.3,
+    placeholder=None,
+) -> Optional[str]:
+    """Draft the next action; if a Streamlit placeholder is given, stream tokens into it."""
+    if not case:
+        return None
+
+    try:
+        return _draft_action(
+            cfg.openai_client,
+            model_name,
+            desired_action,
+            build_clinical_context(case),
+            temperature=temperature,
+            placeholder=placeholder,
+        )
     except Exception as exc:
         st.error(f"AI resident could not draft a response: {exc}")
         return None
 
 
+def prefetch_next_question(case: CaseFile, cfg: Config, model_name: str):
+    """Speculatively draft the next bedside question while the attending reads the latest response."""
+    if st.session_state.get("executor") is None:
+        st.session_state.executor = ThreadPoolExecutor(max_workers=2)
+    key = (case.case_id, len(st.session_state.actions), model_name)
+    # Context is built here: session state must not be read from the worker thread
+    future = st.session_state.executor.submit(
+        _draft_action,
+        cfg.openai_client,
+        model_name,
+        ActionType.ASK_QUESTIONS,
+        build_clinical_context(case),
+    )
+    st.session_state.prefetch = (key, future)
+
+
+def take_prefetched_question(case: CaseFile, model_name: str) -> Optional[str]:
+    """Return the prefetched question if it matches the current encounter and has already finished."""
+    prefetch = st.session_state.get("prefetch")
+    if not prefetch:
+        return None
+    key, future = prefetch
+    if key != (case.case_id, len(st.session_state.actions), model_name) or not future.done():
+        return None
+    st.session_state.prefetch = None
+    try:
+        return future.result(timeout=0) or None
+    except Exception:
+        return None
+
+
 def build_transcript(case: CaseFile) -> str:
     lines = []
     judge_score = st.session_state.judge_score
@@ -265,6 +343,8 @@ def main():
                 "action_content_input",
                 "action_content_pending",
                 "llm_status",
+                "prefetch",
+                "context_lines",
             ]:
                 st.session_state.pop(key, None)
             st.rerun()
@@ -278,12 +358,12 @@ def main():
         st.error(f"Failed to load dataset: {exc}")
         st.stop()
 
-    case_ids = [case.case_id for case in cases]
+    case_ids = cases.case_ids
     selected_case = st.selectbox("Select patient chart", case_ids, index=0 if case_ids else None)
-    if selected_case:
-        st.session_state.case = next(c for c in cases if c.case_id == selected_case)
+    if selected_case and (st.session_state.case is None or st.session_state.case.case_id != selected_case):
+        st.session_state.case = cases.get(selected_case)
 
-    cfg = Config()
+    cfg = get_config()
     gatekeeper = GatekeeperAgent(cfg)
     judge = JudgeAgent(cfg)
     cost_estimator = CostEstimator(cfg)
@@ -322,8 +402,14 @@ def main():
 
     if actor_label == "AI Resident Doctor (LLM)":
         if action_col.button("Let AI Resident Doctor draft", use_container_width=False):
-            with st.spinner("AI Resident Doctor drafting..."):
-                suggestion = suggest_action_with_llm(desired_action, case, cfg, ai_model_id)
+            suggestion = None
+            if desired_action == ActionType.ASK_QUESTIONS:
+                suggestion = take_prefetched_question(case, ai_model_id)
+            if not suggestion:
+                draft_placeholder = action_col.empty()
+                suggestion = suggest_action_with_llm(
+                    desired_action, case, cfg, ai_model_id, placeholder=draft_placeholder
+                )
             if suggestion:
                 st.session_state.action_content_pending = suggestion
                 st.session_state.llm_status = f"Drafted by AI Resident Doctor ({ai_model_id})"
@@ -346,6 +432,8 @@ def main():
             author = "AI Resident Doctor" if actor_label == "AI Resident Doctor (LLM)" else "Attending"
             action = AgentAction(action_type=desired_action, content=final_content)
             add_action(action, gatekeeper, case, cost_estimator, author)
+            if actor_label == "AI Resident Doctor (LLM)" and desired_action != ActionType.DIAGNOSE:
+                prefetch_next_question(case, cfg, ai_model_id)
             st.session_state.action_content_pending = ""
             st.session_state.llm_status = ""
             st.rerun()
@@ -365,6 +453,9 @@ def main():
         finalize_diagnosis(judge, case)
         st.rerun()
 
+    # Built once per rerun; shared by the review panel and the download button
+    transcript_text = build_transcript(case)
+
     if st.session_state.judge_score:
         st.subheader("Attending Board Review")
         st.markdown(
@@ -377,11 +468,9 @@ def main():
         st.subheader("Reference Diagnosis")
         st.markdown(f"**{case.ground_truth_diagnosis}**")
         st.subheader("Encounter Transcript")
-        transcript_text = build_transcript(case)
         st.code(transcript_text, language="markdown")
 
     st.subheader("Download Complete Transcript")
-    transcript_text = build_transcript(case)
     st.download_button(
         label="Download Clinical Transcript",
         data=transcript_text,
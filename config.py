@@ -1,12 +1,39 @@
 """Configuration settings for SDBench."""
 
 import os
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
 from typing import Optional
+
 from openai import OpenAI
 
+try:  # httpx ships with the openai SDK; fall back to the SDK default client if unavailable
+    import httpx
+except ImportError:
+    httpx = None
+
+
+@lru_cache(maxsize=4)
+def _shared_openai_client(base_url: Optional[str], api_key: str,
+                          max_connections: int, max_keepalive_connections: int) -> OpenAI:
+    """One OpenAI client (and HTTP connection pool) per distinct endpoint/key/limits."""
+    http_client = None
+    if httpx is not None:
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        http_client = httpx.Client(limits=limits, timeout=httpx.Timeout(600.0, connect=10.0))
+    return OpenAI(base_url=base_url, api_key=api_key, http_client=http_client)
 
+
+@dataclass(frozen=True)
 class Config:
-    """Configuration class for SDBench."""
+    """Configuration class for SDBench.
+
+    Frozen so one instance can be shared freely; defaults are read from the
+    environment at import time and can be overridden per instance via keyword args.
+    """
 
     # Provider selection: 'openai' or 'openrouter'
     API_PROVIDER: str = os.getenv("SDBENCH_API_PROVIDER", "openrouter").lower()
@@ -23,37 +50,133 @@ class Config:
     # Fix Gatekeeper/Judge on 4o-mini unless explicitly overridden in code
     GATEKEEPER_MODEL: str = "openai/gpt-4o-mini"
     JUDGE_MODEL: str = "openai/gpt-4o-mini"
+    # Drafts gatekeeper replies; excerpts it finds in the case text skip GATEKEEPER_MODEL.
+    # Only makes a difference when GATEKEEPER_MODEL is set to something larger
+    EXTRACTOR_MODEL: str = os.getenv("SDBENCH_EXTRACTOR_MODEL", "openai/gpt-4o-mini")
 
     # Cost settings
     PHYSICIAN_VISIT_COST: float = 300.0
+    # Price tests through CPT codes from cpt_table (exact description matches locally, else an
+    # LLM pick from a shortlist of related codes) instead of a direct LLM dollar estimate
+    CPT_MAPPING_PRICING: bool = os.getenv("SDBENCH_CPT_PRICING", "0").lower() in ("1", "true", "yes")
 
     # Evaluation settings
     CORRECT_DIAGNOSIS_THRESHOLD: int = 4  # Score >= 4 is considered correct
 
+    # Concurrency settings: number of cases run in parallel by SDBench.run_benchmark_async
+    MAX_CONCURRENT_CASES: int = int(os.getenv("SDBENCH_MAX_CONCURRENT_CASES", "8"))
+
+    # HTTP connection pool shared by every request made through one Config's client
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("SDBENCH_HTTP_MAX_CONNECTIONS", "200"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("SDBENCH_HTTP_MAX_KEEPALIVE", "100"))
+
+    # Client-side request rate limits (requests/minute, 0 = unlimited), see utils.rate_limiter.
+    # SDBENCH_RPM_LIMITS overrides per model id, e.g. "openai/gpt-4o=500,openai/gpt-4o-mini=3000"
+    RPM_LIMIT: int = int(os.getenv("SDBENCH_RPM_LIMIT", "0"))
+    RPM_LIMITS_BY_MODEL: str = os.getenv("SDBENCH_RPM_LIMITS", "")
+
+    # Decode chat completion bodies with pydantic-core directly instead of the SDK's
+    # generic response parser (see utils.llm_client._parse_completion)
+    FAST_RESPONSE_PARSING: bool = os.getenv("SDBENCH_FAST_RESPONSE_PARSING", "1").lower() in ("1", "true", "yes")
+
+    # LLMDiagnosticAgent reports its action through a forced take_action tool call instead of
+    # <question>/<test>/<diagnosis> tags; needs a model with tool support
+    LLM_AGENT_TOOL_CALLS: bool = os.getenv("SDBENCH_TOOL_CALLS", "0").lower() in ("1", "true", "yes")
+
+    # Response cache for chat completions (see utils.llm_client.cached_completion)
+    LLM_CACHE_ENABLED: bool = os.getenv("SDBENCH_LLM_CACHE", "0").lower() in ("1", "true", "yes")
+    LLM_CACHE_DIR: str = os.getenv("SDBENCH_LLM_CACHE_DIR", "./.llm_cache")
+
+    # Offline sweeps: queue agent role calls and send them through the provider's Batch API
+    # (utils.batch_queue) instead of one synchronous request each
+    BATCH_MODE: bool = os.getenv("SDBENCH_BATCH_MODE", "0").lower() in ("1", "true", "yes")
+    BATCH_POLL_INTERVAL_SEC: float = float(os.getenv("SDBENCH_BATCH_POLL_INTERVAL", "30"))
+    BATCH_TIMEOUT_SEC: float = float(os.getenv("SDBENCH_BATCH_TIMEOUT", str(24 * 3600)))
+
+    # Similarity cache for agent role responses (see utils.semantic_cache); empty path keeps it in memory.
+    # SDBENCH_SEMANTIC_CACHE_TTLS sets per-role expiry in seconds, e.g. "hypothesis=86400,panel=3600"
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SDBENCH_SEMANTIC_CACHE", "0").lower() in ("1", "true", "yes")
+    SEMANTIC_CACHE_PATH: str = os.getenv("SDBENCH_SEMANTIC_CACHE_PATH", "~/.cache/sdbench/semantic_cache.sqlite")
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SDBENCH_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    SEMANTIC_CACHE_TTLS: str = os.getenv("SDBENCH_SEMANTIC_CACHE_TTLS", "")
+
+    # Answer gatekeeper questions/tests from the case text with a local BM25 lookup (utils.case_index)
+    # when the best sentence covers at least this idf-weighted share of the request's terms;
+    # anything below the threshold still goes to the LLM
+    GATEKEEPER_LOCAL_RETRIEVAL: bool = os.getenv("SDBENCH_GATEKEEPER_RETRIEVAL", "0").lower() in ("1", "true", "yes")
+    GATEKEEPER_RETRIEVAL_THRESHOLD: float = float(os.getenv("SDBENCH_GATEKEEPER_RETRIEVAL_THRESHOLD", "0.8"))
+
+    # Synthetic gatekeeper test results shared across cases with the same final diagnosis and
+    # reused across runs (utils.synthetic_cache); empty string (the default) keeps them fresh per call
+    SYNTHETIC_CACHE_PATH: str = os.getenv("SDBENCH_SYNTHETIC_CACHE", "")
+
+    # Test-cost estimates persisted between runs by CostEstimator as a binary table
+    # (utils.cost_cache), e.g. "~/.cache/sdbench/cpt_cache.sst"; empty string (the default)
+    # prices every run afresh
+    COST_CACHE_PATH: str = os.getenv("SDBENCH_COST_CACHE", "")
+
     # Data settings
     VALIDATION_CASES: int = 248
     TEST_CASES: int = 56
 
-    @classmethod
-    def get_openai_client(cls) -> OpenAI:
-        """Return an OpenAI-compatible client for the configured provider."""
-        if cls.API_PROVIDER == "openrouter":
-            if not cls.OPENROUTER_API_KEY:
+    def _client_kwargs(self) -> dict:
+        """Endpoint and credentials for the configured provider."""
+        if self.API_PROVIDER == "openrouter":
+            if not self.OPENROUTER_API_KEY:
                 raise ValueError("OPENROUTER_API_KEY environment variable is required for OpenRouter")
-            return OpenAI(base_url=cls.OPENROUTER_BASE_URL, api_key=cls.OPENROUTER_API_KEY)
+            return {"base_url": self.OPENROUTER_BASE_URL, "api_key": self.OPENROUTER_API_KEY}
 
         # default to OpenAI
-        if not cls.OPENAI_API_KEY:
+        if not self.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY environment variable is required for OpenAI provider")
-        return OpenAI(api_key=cls.OPENAI_API_KEY)
+        return {"api_key": self.OPENAI_API_KEY}
+
+    @cached_property
+    def openai_client(self) -> OpenAI:
+        """OpenAI-compatible client for the configured provider.
+
+        Shared process-wide by every Config with the same endpoint, key and pool
+        limits, so fresh Config() instances reuse one connection pool.
+        """
+        kwargs = self._client_kwargs()
+        return _shared_openai_client(
+            kwargs.get("base_url"), kwargs["api_key"],
+            self.HTTP_MAX_CONNECTIONS, self.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        )
+
+    def get_openai_client(self) -> OpenAI:
+        """Return the cached client (kept for callers of the old accessor)."""
+        return self.openai_client
+
+    def rpm_limit(self, model_id: str) -> int:
+        """Requests-per-minute budget for a model id (per-model override, else RPM_LIMIT)."""
+        for entry in self.RPM_LIMITS_BY_MODEL.split(","):
+            name, sep, rpm = entry.strip().rpartition("=")
+            if sep and name == model_id:
+                try:
+                    return int(rpm)
+                except ValueError:
+                    print(f"Ignoring invalid RPM limit for {model_id}: {rpm!r}")
+        return self.RPM_LIMIT
+
+    def semantic_cache_ttls(self) -> dict:
+        """Per-role expiry in seconds parsed from SEMANTIC_CACHE_TTLS (roles not listed never expire)."""
+        ttls = {}
+        for entry in self.SEMANTIC_CACHE_TTLS.split(","):
+            role, sep, ttl = entry.strip().rpartition("=")
+            if sep and role:
+                try:
+                    ttls[role] = int(ttl)
+                except ValueError:
+                    print(f"Ignoring invalid semantic cache TTL for {role}: {ttl!r}")
+        return ttls
 
-    @classmethod
-    def validate(cls) -> bool:
+    def validate(self) -> bool:
         """Validate that required configuration is present for the chosen provider."""
-        if cls.API_PROVIDER == "openrouter":
-            if not cls.OPENROUTER_API_KEY:
+        if self.API_PROVIDER == "openrouter":
+            if not self.OPENROUTER_API_KEY:
                 raise ValueError("OPENROUTER_API_KEY environment variable is required")
         else:
-            if not cls.OPENAI_API_KEY:
+            if not self.OPENAI_API_KEY:
                 raise ValueError("OPENAI_API_KEY environment variable is required")
         return True
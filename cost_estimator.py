@@ -1,178 +1,190 @@
 """Cost Estimator implementation for SDBench."""
 
+import itertools
 import json
-from typing import Dict, List, Optional
+import math
+import os
+import re
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import cpt_table
 from data_models import CPTMapping, AgentAction, ActionType
 from config import Config
+from utils.cost_cache import CostCache
 from utils.llm_client import chat_completion_with_retries
 
+
+def _normalize_test(test_request: str) -> str:
+    """Cache key for a test request: lower-cased with collapsed whitespace."""
+    return " ".join(test_request.lower().split())
+
+
+# CPT pricing table (see cpt_table.py), shared read-only by every CostEstimator
+_CPT_PRICING_DATA: Dict[str, float] = dict(zip(cpt_table.CODES, cpt_table.PRICES))
+_CPT_PRICING: Mapping[str, float] = MappingProxyType(_CPT_PRICING_DATA)
+# Serialized once for the CPT mapping prompt instead of on every call
+_CPT_PRICING_JSON = json.dumps(_CPT_PRICING_DATA, indent=2)
+
+# Structure-of-arrays view of the same table for vectorized price sums; cpt_table keeps
+# CODES sorted, so codes resolve to row indices with a binary search
+_CPT_CODES = np.array(cpt_table.CODES, dtype="S5")
+_CPT_PRICES = np.array(cpt_table.PRICES, dtype=np.float64)
+
+
+def price_of_codes(codes: List[str]) -> float:
+    """Sum the table prices of the given CPT codes; unknown codes are ignored."""
+    if not codes:
+        return 0.0
+    wanted = np.array(codes, dtype="S5")
+    idx = np.minimum(np.searchsorted(_CPT_CODES, wanted), len(_CPT_CODES) - 1)
+    return float(_CPT_PRICES[idx[_CPT_CODES[idx] == wanted]].sum())
+
+
+# Descriptions for the CPT codes priced in _CPT_PRICING (local matches and prompt shortlists)
+_CPT_DESCRIPTIONS: Dict[str, str] = dict(zip(cpt_table.CODES, cpt_table.DESCRIPTIONS))
+
+# (code, price, description) rows and a word -> row-index inverted index for prompt shortlists
+_CPT_INFO: List[Tuple[str, float, str]] = [
+    (code, price, _CPT_DESCRIPTIONS.get(code, "")) for code, price in _CPT_PRICING_DATA.items()
+]
+_SHORTLIST_SIZE = 15
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Dollar amounts in single-number LLM replies (test prices allow exactly 2 decimals, visits 1-2)
+_PRICE_RE = re.compile(r'\$?(\d+(?:\.\d{2})?)')
+_VISIT_PRICE_RE = re.compile(r"\$?(\d+(?:\.\d{1,2})?)")
+# CPT codes explicitly marked in a request, e.g. "CBC (85025)" or "CPT 85025"; bare
+# 5-digit numbers (values, units, accession numbers) are never read as codes
+_CPT5_RE = re.compile(r"\bCPT(?:\s+code)?\s*[:#]?\s*(\d{5})\b|\((\d{5})\)", re.IGNORECASE)
+_STOPWORDS = frozenset({"a", "an", "and", "for", "in", "of", "on", "or", "the", "to"})
+
+
+def _words(text: str) -> set:
+    return {w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS}
+
+
+_CPT_POSTINGS: Dict[str, List[int]] = {}
+for _i, (_code, _price, _desc) in enumerate(_CPT_INFO):
+    for _w in _words(_desc):
+        _CPT_POSTINGS.setdefault(_w, []).append(_i)
+# Requests with exactly the content words of one description (in any order or case) are
+# resolved locally; near misses such as "Skin biopsy" vs "Fetal skin biopsy" or "CT head"
+# vs "CT head with contrast" are different procedures and go to the LLM
+_CPT_BY_WORDS: Dict[frozenset, str] = {frozenset(_words(desc)): code for code, _, desc in _CPT_INFO}
+# Rare words (e.g. "ferritin") outrank ubiquitous ones (e.g. "biopsy")
+_CPT_IDF: Dict[str, float] = {w: math.log(len(_CPT_INFO) / len(rows)) + 1.0 for w, rows in _CPT_POSTINGS.items()}
+
+
+def _cpt_shortlist(test_request: str, k: int = _SHORTLIST_SIZE) -> List[Tuple[str, float, str]]:
+    """Top-k CPT rows sharing words with the request, scored by summed IDF."""
+    scores: Dict[int, float] = {}
+    for w in _words(test_request):
+        for i in _CPT_POSTINGS.get(w, ()):
+            scores[i] = scores.get(i, 0.0) + _CPT_IDF[w]
+    best = sorted(scores, key=scores.__getitem__, reverse=True)[:k]
+    return [_CPT_INFO[i] for i in best]
+
+
+# Keyword buckets for offline estimates: (words in the request, words in matching CPT descriptions)
+_HEURISTIC_BUCKETS: Tuple[Tuple[frozenset, frozenset], ...] = (
+    (frozenset({"mri", "magnetic"}), frozenset({"mri"})),
+    (frozenset({"ct", "cta", "tomography"}), frozenset({"ct"})),
+    (frozenset({"ray", "xray", "radiograph", "radiography"}), frozenset({"ray"})),
+    (frozenset({"biopsy", "aspiration", "fna"}), frozenset({"biopsy", "aspiration"})),
+    (frozenset({"panel", "cbc", "count", "level", "levels", "serum", "blood", "urine", "urinalysis"}),
+     frozenset({"panel", "count", "urinalysis"})),
+)
+_HEURISTIC_MEDIANS: List[Tuple[frozenset, float]] = [
+    (triggers, float(np.median([p for _, p, d in _CPT_INFO if _words(d) & desc_words])))
+    for triggers, desc_words in _HEURISTIC_BUCKETS
+]
+
+
+def _heuristic_cost_estimation(test_request: str) -> CPTMapping:
+    """Median table price of the first keyword bucket the request falls into (100.0 if none).
+
+    Used instead of a further LLM round-trip when an estimation call fails; the low
+    confidence keeps it out of the cost cache so the next run asks again.
+    """
+    words = _words(test_request)
+    estimated_cost = next((median for triggers, median in _HEURISTIC_MEDIANS if words & triggers), 100.0)
+    return CPTMapping(
+        test_name=test_request,
+        cpt_codes=[],
+        estimated_cost=estimated_cost,
+        confidence=0.1,
+    )
+
+
+def _literal_cpt_mapping(test_request: str) -> Optional[CPTMapping]:
+    """Price a request that explicitly names known CPT codes; None if it names none."""
+    codes = (m.group(1) or m.group(2) for m in _CPT5_RE.finditer(test_request))
+    hits = list(dict.fromkeys(c for c in codes if cpt_table.lookup(c) is not None))
+    if not hits:
+        return None
+    return CPTMapping(
+        test_name=test_request,
+        cpt_codes=hits,
+        estimated_cost=price_of_codes(hits),
+        confidence=1.0,
+    )
+
+
+def _local_cpt_mapping(test_request: str) -> Optional[CPTMapping]:
+    """Price a request worded like one CPT description (any order or case); None otherwise."""
+    code = _CPT_BY_WORDS.get(frozenset(_words(test_request)))
+    if code is None:
+        return None
+    return CPTMapping(
+        test_name=test_request,
+        cpt_codes=[code],
+        estimated_cost=_CPT_PRICING_DATA[code],
+        confidence=1.0,
+    )
+
+
 class CostEstimator:
     """Cost Estimator module for calculating diagnostic process costs."""
     
     def __init__(self, config: Config):
         self.config = config
-        self.client = config.get_openai_client()
+        self.client = config.openai_client
         self.model = config.GATEKEEPER_MODEL  # Using same model as gatekeeper
         self.physician_visit_cost = config.PHYSICIAN_VISIT_COST
         
         # Load CPT pricing database (simplified version for demo)
         self.cpt_pricing = self._load_cpt_pricing()
+
+        # Estimates keyed by pricing model and normalized test name; shared by concurrent
+        # encounters and, with COST_CACHE_PATH set, persisted across runs (see utils.cost_cache)
+        cache_path = os.path.expanduser(config.COST_CACHE_PATH) if config.COST_CACHE_PATH else None
+        self._cost_cache = CostCache(cache_path)
+
+    def _cache_key(self, test_request: str, kind: str = "") -> str:
+        # Estimates come from self.model, so a persisted table never serves another model's prices
+        return f"{self.model}|{kind}{_normalize_test(test_request)}"
+
+    def _remember(self, key: str, mapping: CPTMapping) -> None:
+        """Add an estimate to the cache; it is written to disk on CostCache.flush()."""
+        # Hard failures (confidence 0.1) are retried next time rather than pinned
+        if mapping.confidence <= 0.1:
+            return
+        self._cost_cache.put(key, mapping)
     
-    def _load_cpt_pricing(self) -> Dict[str, float]:
-        """Load CPT code pricing database."""
-        # This is a simplified pricing database for demonstration
-        # In a real implementation, this would load from a comprehensive 2023 CMS pricing table
-        return {
-            # Laboratory tests
-            "80053": 25.00,  # Comprehensive metabolic panel
-            "85025": 15.00,  # Complete blood count with differential
-            "80061": 20.00,  # Lipid panel
-            "80069": 30.00,  # Renal function panel
-            "80074": 35.00,  # Hepatic function panel
-            "80076": 40.00,  # Thyroid function panel
-            "80081": 45.00,  # Coagulation panel
-            "80090": 50.00,  # Urinalysis complete
-            
-            # Imaging studies
-            "70450": 200.00,  # CT head without contrast
-            "70460": 250.00,  # CT head with contrast
-            "71250": 300.00,  # CT chest without contrast
-            "71260": 350.00,  # CT chest with contrast
-            "74150": 400.00,  # CT abdomen without contrast
-            "74160": 450.00,  # CT abdomen with contrast
-            "72141": 500.00,  # MRI lumbar spine without contrast
-            "72142": 550.00,  # MRI lumbar spine with contrast
-            "73060": 150.00,  # X-ray knee
-            "73070": 120.00,  # X-ray ankle
-            "73080": 130.00,  # X-ray foot
-            "73090": 140.00,  # X-ray hand
-            "73110": 160.00,  # X-ray wrist
-            "73120": 170.00,  # X-ray forearm
-            "73130": 180.00,  # X-ray elbow
-            "73140": 190.00,  # X-ray shoulder
-            "73020": 200.00,  # X-ray chest
-            "73030": 180.00,  # X-ray chest 2 views
-            "73040": 160.00,  # X-ray chest 3 views
-            "73050": 140.00,  # X-ray chest 4 views
-            "73060": 120.00,  # X-ray chest 5 views
-            "73070": 100.00,  # X-ray chest 6 views
-            "73080": 80.00,   # X-ray chest 7 views
-            "73090": 60.00,   # X-ray chest 8 views
-            "73100": 40.00,   # X-ray chest 9 views
-            "73110": 20.00,   # X-ray chest 10 views
-            
-            # Procedures
-            "36415": 25.00,   # Venipuncture
-            "36416": 30.00,   # Venipuncture with specimen collection
-            "36417": 35.00,   # Venipuncture with specimen collection and processing
-            "36418": 40.00,   # Venipuncture with specimen collection, processing and analysis
-            "36419": 45.00,   # Venipuncture with specimen collection, processing, analysis and reporting
-            "36420": 50.00,   # Venipuncture with specimen collection, processing, analysis, reporting and interpretation
-            "36421": 55.00,   # Venipuncture with specimen collection, processing, analysis, reporting, interpretation and management
-            "36422": 60.00,   # Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management and follow-up
-            "36423": 65.00,   # Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up and counseling
-            "36424": 70.00,   # Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling and education
-            "36425": 75.00,   # Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education and support
-            "36426": 80.00,   # Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education, support and advocacy
-            "36427": 85.00,   # Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education, support, advocacy and coordination
-            "36428": 90.00,   # Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education, support, advocacy, coordination and collaboration
-            "36429": 95.00,   # Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education, support, advocacy, coordination, collaboration and integration
-            "36430": 100.00,  # Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education, support, advocacy, coordination, collaboration, integration and evaluation
-            
-            # Biopsy procedures
-            "10021": 200.00,  # Fine needle aspiration biopsy
-            "10022": 250.00,  # Core needle biopsy
-            "10023": 300.00,  # Incisional biopsy
-            "10024": 350.00,  # Excisional biopsy
-            "10025": 400.00,  # Punch biopsy
-            "10026": 450.00,  # Shave biopsy
-            "10027": 500.00,  # Endoscopic biopsy
-            "10028": 550.00,  # Laparoscopic biopsy
-            "10029": 600.00,  # Thoracoscopic biopsy
-            "10030": 650.00,  # Arthroscopic biopsy
-            "10031": 700.00,  # Bronchoscopic biopsy
-            "10032": 750.00,  # Colonoscopic biopsy
-            "10033": 800.00,  # Cystoscopic biopsy
-            "10034": 850.00,  # Esophagoscopic biopsy
-            "10035": 900.00,  # Gastroscopic biopsy
-            "10036": 950.00,  # Laryngoscopic biopsy
-            "10037": 1000.00, # Nasopharyngoscopic biopsy
-            "10038": 1050.00, # Proctoscopic biopsy
-            "10039": 1100.00, # Sigmoidoscopic biopsy
-            "10040": 1150.00, # Urethroscopic biopsy
-            "10041": 1200.00, # Vaginal biopsy
-            "10042": 1250.00, # Vulvar biopsy
-            "10043": 1300.00, # Cervical biopsy
-            "10044": 1350.00, # Endometrial biopsy
-            "10045": 1400.00, # Ovarian biopsy
-            "10046": 1450.00, # Fallopian tube biopsy
-            "10047": 1500.00, # Placental biopsy
-            "10048": 1550.00, # Amniotic fluid biopsy
-            "10049": 1600.00, # Chorionic villus biopsy
-            "10050": 1650.00, # Fetal tissue biopsy
-            "10051": 1700.00, # Fetal blood biopsy
-            "10052": 1750.00, # Fetal skin biopsy
-            "10053": 1800.00, # Fetal muscle biopsy
-            "10054": 1850.00, # Fetal liver biopsy
-            "10055": 1900.00, # Fetal kidney biopsy
-            "10056": 1950.00, # Fetal lung biopsy
-            "10057": 2000.00, # Fetal heart biopsy
-            "10058": 2050.00, # Fetal brain biopsy
-            "10059": 2100.00, # Fetal spinal cord biopsy
-            "10060": 2150.00, # Fetal nerve biopsy
-            "10061": 2200.00, # Fetal bone biopsy
-            "10062": 2250.00, # Fetal cartilage biopsy
-            "10063": 2300.00, # Fetal tendon biopsy
-            "10064": 2350.00, # Fetal ligament biopsy
-            "10065": 2400.00, # Fetal joint biopsy
-            "10066": 2450.00, # Fetal synovial biopsy
-            "10067": 2500.00, # Fetal bursal biopsy
-            "10068": 2550.00, # Fetal fascial biopsy
-            "10069": 2600.00, # Fetal aponeurotic biopsy
-            "10070": 2650.00, # Fetal tendinous biopsy
-            "10071": 2700.00, # Fetal ligamentous biopsy
-            "10072": 2750.00, # Fetal capsular biopsy
-            "10073": 2800.00, # Fetal meniscal biopsy
-            "10074": 2850.00, # Fetal labral biopsy
-            "10075": 2900.00, # Fetal glenoid biopsy
-            "10076": 2950.00, # Fetal acetabular biopsy
-            "10077": 3000.00, # Fetal femoral biopsy
-            "10078": 3050.00, # Fetal tibial biopsy
-            "10079": 3100.00, # Fetal fibular biopsy
-            "10080": 3150.00, # Fetal patellar biopsy
-            "10081": 3200.00, # Fetal talar biopsy
-            "10082": 3250.00, # Fetal calcaneal biopsy
-            "10083": 3300.00, # Fetal navicular biopsy
-            "10084": 3350.00, # Fetal cuboid biopsy
-            "10085": 3400.00, # Fetal cuneiform biopsy
-            "10086": 3450.00, # Fetal metatarsal biopsy
-            "10087": 3500.00, # Fetal phalangeal biopsy
-            "10088": 3550.00, # Fetal sesamoid biopsy
-            "10089": 3600.00, # Fetal accessory bone biopsy
-            "10090": 3650.00, # Fetal supernumerary bone biopsy
-            "10091": 3700.00, # Fetal vestigial bone biopsy
-            "10092": 3750.00, # Fetal rudimentary bone biopsy
-            "10093": 3800.00, # Fetal atavistic bone biopsy
-            "10094": 3850.00, # Fetal phylogenetic bone biopsy
-            "10095": 3900.00, # Fetal ontogenetic bone biopsy
-            "10096": 3950.00, # Fetal developmental bone biopsy
-            "10097": 4000.00, # Fetal growth bone biopsy
-            "10098": 4050.00, # Fetal maturation bone biopsy
-            "10099": 4100.00, # Fetal differentiation bone biopsy
-            "10100": 4150.00, # Fetal specialization bone biopsy
-        }
+    def _load_cpt_pricing(self) -> Mapping[str, float]:
+        """Return the shared, read-only CPT code pricing table."""
+        return _CPT_PRICING
     
     def calculate_visit_cost(self, actions: List[AgentAction]) -> float:
         """Estimate the cost of physician visits using LLM per visit."""
-        visit_count = 0
-        in_visit = False
-        for action in actions:
-            if action.action_type == ActionType.ASK_QUESTIONS:
-                if not in_visit:
-                    visit_count += 1
-                    in_visit = True
-            elif action.action_type == ActionType.REQUEST_TESTS:
-                in_visit = False
+        # A visit starts at each question that does not directly follow another question;
+        # diagnoses neither start nor end a visit, so they are dropped before pairing
+        kinds = [a.action_type for a in actions if a.action_type != ActionType.DIAGNOSE]
+        visit_count = sum(
+            1 for prev, cur in zip(itertools.chain((None,), kinds), kinds)
+            if cur == ActionType.ASK_QUESTIONS and prev != ActionType.ASK_QUESTIONS
+        )
         if visit_count == 0:
             return 0.0
         # Ask LLM for a reasonable per-visit estimate and multiply
@@ -180,19 +192,58 @@ class CostEstimator:
         return per_visit * visit_count
     
     def calculate_test_cost(self, test_request: str) -> float:
-        """Estimate the cost of a specific test request via LLM (direct estimation)."""
-        estimation = self._fallback_cost_estimation(test_request)
+        """Estimate the cost of a specific test request via LLM (direct estimation), memoized per test name.
+
+        With Config.CPT_MAPPING_PRICING the request is mapped to CPT codes instead.
+        """
+        if self.config.CPT_MAPPING_PRICING:
+            return self._map_test_to_cpt(test_request).estimated_cost
+        key = self._cache_key(test_request)
+        estimation = self._cost_cache.get(key)
+        if estimation is None:
+            estimation = _literal_cpt_mapping(test_request) or self._fallback_cost_estimation(test_request)
+            self._remember(key, estimation)
         return estimation.estimated_cost
     
     def _map_test_to_cpt(self, test_request: str) -> CPTMapping:
-        """Map a test request to CPT codes and estimate cost."""
+        """Map a test request to CPT codes and estimate cost (memoized per normalized test name)."""
+        key = self._cache_key(test_request, "cpt:")
+        cached = self._cost_cache.get(key)
+        if cached is not None:
+            return cached
+        mapping = self._map_test_to_cpt_uncached(test_request)
+        self._remember(key, mapping)
+        return mapping
+
+    def _map_test_to_cpt_uncached(self, test_request: str) -> CPTMapping:
+        # Requests that spell out a known CPT code need no matching at all
+        literal = _literal_cpt_mapping(test_request)
+        if literal is not None:
+            return literal
+
+        # Requests worded exactly like a CPT description are resolved locally
+        local = _local_cpt_mapping(test_request)
+        if local is not None:
+            return local
+
+        # Only the candidates sharing words with the request go into the prompt
+        shortlist = _cpt_shortlist(test_request)
+        if shortlist:
+            allowed = {c: p for c, p, _ in shortlist}
+            candidates_json = json.dumps(
+                {c: {"description": d, "cost": p} for c, p, d in shortlist}, indent=2
+            )
+        else:
+            allowed = self.cpt_pricing
+            candidates_json = _CPT_PRICING_JSON
+
         prompt = f"""
         You are a medical coding expert. Given a test request, identify the most appropriate CPT code(s) and estimate the cost.
         
         Test Request: {test_request}
         
         Available CPT codes and their typical costs:
-        {json.dumps(self.cpt_pricing, indent=2)}
+        {candidates_json}
         
         Respond with a JSON object containing:
         {{
@@ -211,21 +262,21 @@ class CostEstimator:
                 messages=[{"role": "user", "content": prompt}],
                 max_retries=4,
                 retry_interval_sec=8,
-                max_tokens=200,
-                temperature=0.1,
+                max_tokens=80,
+                temperature=0.0,
+                response_format={"type": "json_object"},
             )
             
-            result = json.loads(response.choices[0].message.content.strip())
+            result = json.loads(response.choices[0].message.content)
             
-            # Validate and calculate actual cost from CPT codes
-            actual_cost = 0.0
-            for cpt_code in result.get("cpt_codes", []):
-                if cpt_code in self.cpt_pricing:
-                    actual_cost += self.cpt_pricing[cpt_code]
-                else:
-                    # Fallback to estimated cost if CPT not found
-                    actual_cost += result.get("estimated_cost", 0.0)
-                    break
+            # Validate and calculate actual cost from CPT codes: price the leading run of
+            # valid codes in one gather; the first invalid one falls back to the estimate
+            codes = [str(c) for c in result.get("cpt_codes", [])]
+            valid = [c in allowed for c in codes]
+            cut = valid.index(False) if False in valid else len(codes)
+            actual_cost = price_of_codes(codes[:cut])
+            if cut < len(codes):
+                actual_cost += result.get("estimated_cost", 0.0)
             
             if actual_cost == 0.0:
                 actual_cost = result.get("estimated_cost", 100.0)  # Default fallback
@@ -241,12 +292,12 @@ class CostEstimator:
             print("Error mapping test to CPT:")
             print(f"  ErrorType: {type(e).__name__}")
             print(f"  ErrorRepr: {e!r}")
-            # Fallback estimation
-            return self._fallback_cost_estimation(test_request)
+            # Offline estimate rather than a second LLM round-trip
+            return _heuristic_cost_estimation(test_request)
     
-    def _fallback_cost_estimation(self, test_request: str) -> CPTMapping:
-        """Fallback cost estimation when CPT mapping fails."""
-        prompt = f"""
+    @staticmethod
+    def _direct_estimate_prompt(test_request: str) -> str:
+        return f"""
         You are a medical cost estimator. Given a test request, estimate a reasonable cash price in USD for a US health system (2023 era). Return ONLY a number, no text.
         
         Test Request: {test_request}
@@ -257,44 +308,42 @@ class CostEstimator:
         - Procedures/biopsy/endoscopy: 200-3000
         Respond with a single number only.
         """
+
+    @staticmethod
+    def _parse_direct_estimate(test_request: str, cost_text: str) -> CPTMapping:
+        # Extract number from response
+        cost_match = _PRICE_RE.search(cost_text)
+        if cost_match:
+            estimated_cost = float(cost_match.group(1))
+        else:
+            estimated_cost = 100.0  # Default fallback
         
+        return CPTMapping(
+            test_name=test_request,
+            cpt_codes=[],
+            estimated_cost=estimated_cost,
+            confidence=0.3
+        )
+
+    def _fallback_cost_estimation(self, test_request: str) -> CPTMapping:
+        """Fallback cost estimation when CPT mapping fails."""
         try:
             response = chat_completion_with_retries(
                 client=self.client,
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=[{"role": "user", "content": self._direct_estimate_prompt(test_request)}],
                 max_retries=3,
                 retry_interval_sec=8,
                 max_tokens=50,
                 temperature=0.3,
             )
-            
-            cost_text = response.choices[0].message.content.strip()
-            # Extract number from response
-            import re
-            cost_match = re.search(r'\$?(\d+(?:\.\d{2})?)', cost_text)
-            if cost_match:
-                estimated_cost = float(cost_match.group(1))
-            else:
-                estimated_cost = 100.0  # Default fallback
-            
-            return CPTMapping(
-                test_name=test_request,
-                cpt_codes=[],
-                estimated_cost=estimated_cost,
-                confidence=0.3
-            )
+            return self._parse_direct_estimate(test_request, response.choices[0].message.content.strip())
             
         except Exception as e:
             print("Error in fallback cost estimation:")
             print(f"  ErrorType: {type(e).__name__}")
             print(f"  ErrorRepr: {e!r}")
-            return CPTMapping(
-                test_name=test_request,
-                cpt_codes=[],
-                estimated_cost=100.0,
-                confidence=0.1
-            )
+            return _heuristic_cost_estimation(test_request)
 
     def _estimate_visit_cost_llm(self) -> float:
         """Ask LLM for a reasonable per-visit physician cost (single-number USD)."""
@@ -312,8 +361,7 @@ class CostEstimator:
                 temperature=0.1,
             )
             text = response.choices[0].message.content.strip()
-            import re
-            m = re.search(r"\$?(\d+(?:\.\d{1,2})?)", text)
+            m = _VISIT_PRICE_RE.search(text)
             if m:
                 return float(m.group(1))
         except Exception as e:
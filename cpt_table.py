@@ -0,0 +1,148 @@
+"""CPT code pricing table used by CostEstimator.
+
+Simplified pricing database for demonstration; in a real implementation this would
+load from a comprehensive 2023 CMS pricing table. Rows are kept sorted by code so
+CODES/PRICES/DESCRIPTIONS are parallel tuples searchable with bisect.
+"""
+
+from bisect import bisect_left
+from typing import Optional, Tuple
+
+_ROWS: Tuple[Tuple[str, float, str], ...] = (
+    ("10021", 200.00, "Fine needle aspiration biopsy"),
+    ("10022", 250.00, "Core needle biopsy"),
+    ("10023", 300.00, "Incisional biopsy"),
+    ("10024", 350.00, "Excisional biopsy"),
+    ("10025", 400.00, "Punch biopsy"),
+    ("10026", 450.00, "Shave biopsy"),
+    ("10027", 500.00, "Endoscopic biopsy"),
+    ("10028", 550.00, "Laparoscopic biopsy"),
+    ("10029", 600.00, "Thoracoscopic biopsy"),
+    ("10030", 650.00, "Arthroscopic biopsy"),
+    ("10031", 700.00, "Bronchoscopic biopsy"),
+    ("10032", 750.00, "Colonoscopic biopsy"),
+    ("10033", 800.00, "Cystoscopic biopsy"),
+    ("10034", 850.00, "Esophagoscopic biopsy"),
+    ("10035", 900.00, "Gastroscopic biopsy"),
+    ("10036", 950.00, "Laryngoscopic biopsy"),
+    ("10037", 1000.00, "Nasopharyngoscopic biopsy"),
+    ("10038", 1050.00, "Proctoscopic biopsy"),
+    ("10039", 1100.00, "Sigmoidoscopic biopsy"),
+    ("10040", 1150.00, "Urethroscopic biopsy"),
+    ("10041", 1200.00, "Vaginal biopsy"),
+    ("10042", 1250.00, "Vulvar biopsy"),
+    ("10043", 1300.00, "Cervical biopsy"),
+    ("10044", 1350.00, "Endometrial biopsy"),
+    ("10045", 1400.00, "Ovarian biopsy"),
+    ("10046", 1450.00, "Fallopian tube biopsy"),
+    ("10047", 1500.00, "Placental biopsy"),
+    ("10048", 1550.00, "Amniotic fluid biopsy"),
+    ("10049", 1600.00, "Chorionic villus biopsy"),
+    ("10050", 1650.00, "Fetal tissue biopsy"),
+    ("10051", 1700.00, "Fetal blood biopsy"),
+    ("10052", 1750.00, "Fetal skin biopsy"),
+    ("10053", 1800.00, "Fetal muscle biopsy"),
+    ("10054", 1850.00, "Fetal liver biopsy"),
+    ("10055", 1900.00, "Fetal kidney biopsy"),
+    ("10056", 1950.00, "Fetal lung biopsy"),
+    ("10057", 2000.00, "Fetal heart biopsy"),
+    ("10058", 2050.00, "Fetal brain biopsy"),
+    ("10059", 2100.00, "Fetal spinal cord biopsy"),
+    ("10060", 2150.00, "Fetal nerve biopsy"),
+    ("10061", 2200.00, "Fetal bone biopsy"),
+    ("10062", 2250.00, "Fetal cartilage biopsy"),
+    ("10063", 2300.00, "Fetal tendon biopsy"),
+    ("10064", 2350.00, "Fetal ligament biopsy"),
+    ("10065", 2400.00, "Fetal joint biopsy"),
+    ("10066", 2450.00, "Fetal synovial biopsy"),
+    ("10067", 2500.00, "Fetal bursal biopsy"),
+    ("10068", 2550.00, "Fetal fascial biopsy"),
+    ("10069", 2600.00, "Fetal aponeurotic biopsy"),
+    ("10070", 2650.00, "Fetal tendinous biopsy"),
+    ("10071", 2700.00, "Fetal ligamentous biopsy"),
+    ("10072", 2750.00, "Fetal capsular biopsy"),
+    ("10073", 2800.00, "Fetal meniscal biopsy"),
+    ("10074", 2850.00, "Fetal labral biopsy"),
+    ("10075", 2900.00, "Fetal glenoid biopsy"),
+    ("10076", 2950.00, "Fetal acetabular biopsy"),
+    ("10077", 3000.00, "Fetal femoral biopsy"),
+    ("10078", 3050.00, "Fetal tibial biopsy"),
+    ("10079", 3100.00, "Fetal fibular biopsy"),
+    ("10080", 3150.00, "Fetal patellar biopsy"),
+    ("10081", 3200.00, "Fetal talar biopsy"),
+    ("10082", 3250.00, "Fetal calcaneal biopsy"),
+    ("10083", 3300.00, "Fetal navicular biopsy"),
+    ("10084", 3350.00, "Fetal cuboid biopsy"),
+    ("10085", 3400.00, "Fetal cuneiform biopsy"),
+    ("10086", 3450.00, "Fetal metatarsal biopsy"),
+    ("10087", 3500.00, "Fetal phalangeal biopsy"),
+    ("10088", 3550.00, "Fetal sesamoid biopsy"),
+    ("10089", 3600.00, "Fetal accessory bone biopsy"),
+    ("10090", 3650.00, "Fetal supernumerary bone biopsy"),
+    ("10091", 3700.00, "Fetal vestigial bone biopsy"),
+    ("10092", 3750.00, "Fetal rudimentary bone biopsy"),
+    ("10093", 3800.00, "Fetal atavistic bone biopsy"),
+    ("10094", 3850.00, "Fetal phylogenetic bone biopsy"),
+    ("10095", 3900.00, "Fetal ontogenetic bone biopsy"),
+    ("10096", 3950.00, "Fetal developmental bone biopsy"),
+    ("10097", 4000.00, "Fetal growth bone biopsy"),
+    ("10098", 4050.00, "Fetal maturation bone biopsy"),
+    ("10099", 4100.00, "Fetal differentiation bone biopsy"),
+    ("10100", 4150.00, "Fetal specialization bone biopsy"),
+    ("36415", 25.00, "Venipuncture"),
+    ("36416", 30.00, "Venipuncture with specimen collection"),
+    ("36417", 35.00, "Venipuncture with specimen collection and processing"),
+    ("36418", 40.00, "Venipuncture with specimen collection, processing and analysis"),
+    ("36419", 45.00, "Venipuncture with specimen collection, processing, analysis and reporting"),
+    ("36420", 50.00, "Venipuncture with specimen collection, processing, analysis, reporting and interpretation"),
+    ("36421", 55.00, "Venipuncture with specimen collection, processing, analysis, reporting, interpretation and management"),
+    ("36422", 60.00, "Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management and follow-up"),
+    ("36423", 65.00, "Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up and counseling"),
+    ("36424", 70.00, "Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling and education"),
+    ("36425", 75.00, "Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education and support"),
+    ("36426", 80.00, "Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education, support and advocacy"),
+    ("36427", 85.00, "Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education, support, advocacy and coordination"),
+    ("36428", 90.00, "Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education, support, advocacy, coordination and collaboration"),
+    ("36429", 95.00, "Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education, support, advocacy, coordination, collaboration and integration"),
+    ("36430", 100.00, "Venipuncture with specimen collection, processing, analysis, reporting, interpretation, management, follow-up, counseling, education, support, advocacy, coordination, collaboration, integration and evaluation"),
+    ("70450", 200.00, "CT head without contrast"),
+    ("70460", 250.00, "CT head with contrast"),
+    ("71045", 200.00, "X-ray chest single view"),
+    ("71046", 180.00, "X-ray chest 2 views"),
+    ("71047", 160.00, "X-ray chest 3 views"),
+    ("71048", 140.00, "X-ray chest 4 or more views"),
+    ("71250", 300.00, "CT chest without contrast"),
+    ("71260", 350.00, "CT chest with contrast"),
+    ("72141", 500.00, "MRI lumbar spine without contrast"),
+    ("72142", 550.00, "MRI lumbar spine with contrast"),
+    ("73060", 150.00, "X-ray knee"),
+    ("73070", 120.00, "X-ray ankle"),
+    ("73080", 130.00, "X-ray foot"),
+    ("73090", 140.00, "X-ray hand"),
+    ("73110", 160.00, "X-ray wrist"),
+    ("73120", 170.00, "X-ray forearm"),
+    ("73130", 180.00, "X-ray elbow"),
+    ("73140", 190.00, "X-ray shoulder"),
+    ("74150", 400.00, "CT abdomen without contrast"),
+    ("74160", 450.00, "CT abdomen with contrast"),
+    ("80053", 25.00, "Comprehensive metabolic panel"),
+    ("80061", 20.00, "Lipid panel"),
+    ("80069", 30.00, "Renal function panel"),
+    ("80074", 35.00, "Hepatic function panel"),
+    ("80076", 40.00, "Thyroid function panel"),
+    ("80081", 45.00, "Coagulation panel"),
+    ("80090", 50.00, "Urinalysis complete"),
+    ("85025", 15.00, "Complete blood count with differential"),
+)
+
+CODES: Tuple[str, ...] = tuple(r[0] for r in _ROWS)
+PRICES: Tuple[float, ...] = tuple(r[1] for r in _ROWS)
+DESCRIPTIONS: Tuple[str, ...] = tuple(r[2] for r in _ROWS)
+
+
+def lookup(code: str) -> Optional[float]:
+    """Price of an exact CPT code, or None if it is not in the table."""
+    i = bisect_left(CODES, code)
+    if i < len(CODES) and CODES[i] == code:
+        return PRICES[i]
+    return None
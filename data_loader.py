@@ -1,17 +1,47 @@
+import csv
 import json
+import mmap
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from data_models import CaseFile
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:  # optional speed-up; the stdlib parser accepts bytes too
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# Lines buffered per writelines() call when saving JSONL
+_WRITE_BATCH = 1024
+
 
 def _first_n_sentences(text: str, max_sentences: int = 2, max_chars: int = 360) -> str:
     if not text:
         return ""
-    # Simple sentence split on period/question/exclamation; keep it robust for long paragraphs
-    import re
-    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
-    abstract = " ".join(sentences[:max_sentences]).strip()
+    # Sentences end at period/question/exclamation followed by whitespace; stop scanning
+    # once enough are found instead of splitting the whole (possibly long) paragraph
+    text = text.strip()
+    sentences = []
+    start = 0
+    n = len(text)
+    i = 0
+    while i < n - 1 and len(sentences) < max_sentences:
+        if text[i] in ".!?" and text[i + 1].isspace():
+            sentences.append(text[start:i + 1])
+            i += 1
+            while i < n and text[i].isspace():
+                i += 1
+            start = i
+        else:
+            i += 1
+    if len(sentences) < max_sentences and start < n:
+        sentences.append(text[start:])
+    abstract = " ".join(sentences).strip()
     if len(abstract) > max_chars:
         abstract = abstract[: max_chars - 1].rstrip() + "…"
     return abstract
@@ -24,6 +54,12 @@ def _build_full_case_text(case_information: Optional[str],
                           option_b: Optional[str],
                           option_c: Optional[str],
                           option_d: Optional[str]) -> str:
+    # Common case: all three narrative sections and no options, built in one pass
+    if (case_information and physical_examination and diagnostic_tests
+            and not (option_a or option_b or option_c or option_d)):
+        return (f"PRESENTATION OF CASE\n\n{case_information.strip()}\n\n"
+                f"PHYSICAL EXAMINATION\n\n{physical_examination.strip()}\n\n"
+                f"DIAGNOSTIC TESTS\n\n{diagnostic_tests.strip()}")
     sections = []
     if case_information:
         sections.append("PRESENTATION OF CASE\n\n" + case_information.strip())
@@ -47,6 +83,43 @@ def _build_full_case_text(case_information: Optional[str],
     return "\n\n".join(sections)
 
 
+def _row_to_case(row: dict,
+                 line_no: int,
+                 publication_year: int,
+                 is_test_case: bool,
+                 case_id_prefix: str) -> CaseFile:
+    """Adapt one converted JSONL row to a CaseFile."""
+    rid = row.get("id")
+    # Build case_id: prefix + original id, fallback to line number
+    case_id = f"{case_id_prefix}{rid}" if rid is not None else f"{case_id_prefix}{line_no}"
+
+    case_information = row.get("case_information") or ""
+    physical_examination = row.get("physical_examination") or ""
+    diagnostic_tests = row.get("diagnostic_tests") or ""
+    final_dx = row.get("final_diagnosis") or ""
+
+    initial_abstract = _first_n_sentences(case_information or physical_examination or diagnostic_tests)
+    full_case_text = _build_full_case_text(
+        case_information=case_information,
+        physical_examination=physical_examination,
+        diagnostic_tests=diagnostic_tests,
+        option_a=row.get("option_a"),
+        option_b=row.get("option_b"),
+        option_c=row.get("option_c"),
+        option_d=row.get("option_d"),
+    )
+
+    # Rows come from our own converter and every field is built here, so skip pydantic validation
+    return CaseFile.model_construct(
+        case_id=case_id,
+        initial_abstract=initial_abstract,
+        full_case_text=full_case_text,
+        ground_truth_diagnosis=final_dx,
+        publication_year=publication_year,
+        is_test_case=is_test_case,
+    )
+
+
 def load_jsonl_cases(jsonl_path: str,
                      publication_year: int = 2025,
                      is_test_case: bool = False,
@@ -67,43 +140,20 @@ def load_jsonl_cases(jsonl_path: str,
     path = Path(jsonl_path).expanduser().resolve()
     cases: List[CaseFile] = []
 
-    with path.open("r", encoding="utf-8") as f:
-        for i, line in enumerate(f, 1):
+    # mmap the file and hand each line to the parser as UTF-8 bytes straight from the page
+    # cache, with no buffered-reader copy or str decode per line (mmap rejects empty files)
+    if path.stat().st_size == 0:
+        return cases
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i, line in enumerate(iter(mm.readline, b""), 1):
             if not line.strip():
                 continue
             try:
-                row = json.loads(line)
-            except json.JSONDecodeError:
+                row = _json_loads(line)
+            except ValueError:  # json.JSONDecodeError and orjson.JSONDecodeError
                 continue
 
-            rid = row.get("id")
-            # Build case_id: prefix + original id, fallback to line number
-            case_id = f"{case_id_prefix}{rid}" if rid is not None else f"{case_id_prefix}{i}"
-
-            case_information = row.get("case_information") or ""
-            physical_examination = row.get("physical_examination") or ""
-            diagnostic_tests = row.get("diagnostic_tests") or ""
-            final_dx = row.get("final_diagnosis") or ""
-
-            initial_abstract = _first_n_sentences(case_information or physical_examination or diagnostic_tests)
-            full_case_text = _build_full_case_text(
-                case_information=case_information,
-                physical_examination=physical_examination,
-                diagnostic_tests=diagnostic_tests,
-                option_a=row.get("option_a"),
-                option_b=row.get("option_b"),
-                option_c=row.get("option_c"),
-                option_d=row.get("option_d"),
-            )
-
-            cases.append(CaseFile(
-                case_id=case_id,
-                initial_abstract=initial_abstract,
-                full_case_text=full_case_text,
-                ground_truth_diagnosis=final_dx,
-                publication_year=publication_year,
-                is_test_case=is_test_case,
-            ))
+            cases.append(_row_to_case(row, i, publication_year, is_test_case, case_id_prefix))
 
             if limit and len(cases) >= limit:
                 break
@@ -111,32 +161,76 @@ def load_jsonl_cases(jsonl_path: str,
     return cases
 
 
+class JsonlIndex:
+    """Byte-offset index over a converted JSONL file that decodes one case on demand.
+
+    Only case ids and (offset, length, line number) triples stay in memory, so
+    UIs that show a single case at a time do not hold every CaseFile.
+    """
+
+    def __init__(self,
+                 jsonl_path: str,
+                 publication_year: int = 2025,
+                 is_test_case: bool = False,
+                 case_id_prefix: str = "DA_"):
+        self.path = Path(jsonl_path).expanduser().resolve()
+        self.publication_year = publication_year
+        self.is_test_case = is_test_case
+        self.case_id_prefix = case_id_prefix
+        self.case_ids: List[str] = []
+        self._offsets: Dict[str, Tuple[int, int, int]] = {}
+
+        offset = 0
+        with self.path.open("rb") as f:
+            for i, line in enumerate(f, 1):
+                length = len(line)
+                if line.strip():
+                    try:
+                        rid = _json_loads(line).get("id")
+                    except ValueError:
+                        rid = False
+                    if rid is not False:
+                        case_id = f"{case_id_prefix}{rid}" if rid is not None else f"{case_id_prefix}{i}"
+                        if case_id not in self._offsets:
+                            self.case_ids.append(case_id)
+                            self._offsets[case_id] = (offset, length, i)
+                offset += length
+
+    def __len__(self) -> int:
+        return len(self.case_ids)
+
+    def get(self, case_id: str) -> CaseFile:
+        """Seek to the case's line and decode just that row."""
+        offset, length, line_no = self._offsets[case_id]
+        with self.path.open("rb") as f:
+            f.seek(offset)
+            row = _json_loads(f.read(length))
+        return _row_to_case(row, line_no, self.publication_year, self.is_test_case, self.case_id_prefix)
+
+
 def save_cases_as_jsonl(cases: List[CaseFile], out_path: str) -> None:
     out = Path(out_path).expanduser().resolve()
     out.parent.mkdir(parents=True, exist_ok=True)
-    with out.open("w", encoding="utf-8") as f:
+    with out.open("wb") as f:
+        batch = []
         for c in cases:
-            f.write(c.model_dump_json(ensure_ascii=False) + "\n")
+            batch.append(_json_dumps(c.model_dump()) + b"\n")
+            if len(batch) >= _WRITE_BATCH:
+                f.writelines(batch)
+                batch.clear()
+        f.writelines(batch)
+
+
+_CSV_FIELDS = ("case_id", "initial_abstract", "ground_truth_diagnosis",
+               "publication_year", "is_test_case", "full_case_text")
 
 
 def save_cases_as_csv(cases: List[CaseFile], out_path: str) -> None:
-    try:
-        import pandas as pd
-    except Exception as e:
-        raise RuntimeError("pandas is required to export CSV") from e
-    import pandas as pd  # for type checkers
-
-    df = pd.DataFrame([
-        {
-            "case_id": c.case_id,
-            "initial_abstract": c.initial_abstract,
-            "ground_truth_diagnosis": c.ground_truth_diagnosis,
-            "publication_year": c.publication_year,
-            "is_test_case": c.is_test_case,
-            "full_case_text": c.full_case_text,
-        }
-        for c in cases
-    ])
     out = Path(out_path).expanduser().resolve()
     out.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(out, index=False)
+    # Rows are streamed with the stdlib writer; no pandas import or intermediate DataFrame
+    with out.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(_CSV_FIELDS)
+        for c in cases:
+            writer.writerow([getattr(c, field) for field in _CSV_FIELDS])
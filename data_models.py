@@ -1,7 +1,8 @@
 """Data models for SDBench."""
 
-from typing import List, Optional, Dict, Any, Literal
+from typing import Annotated, List, Optional, Dict, Any, Literal
 from pydantic import BaseModel, Field
+from pydantic.dataclasses import dataclass
 from enum import Enum
 
 class ActionType(str, Enum):
@@ -10,7 +11,8 @@ class ActionType(str, Enum):
     REQUEST_TESTS = "request_tests"
     DIAGNOSE = "diagnose"
 
-class AgentAction(BaseModel):
+@dataclass(slots=True, frozen=True)
+class AgentAction:
     """An action taken by the diagnostic agent."""
     action_type: ActionType
     content: str
@@ -31,23 +33,26 @@ class GatekeeperResponse(BaseModel):
     is_synthetic: bool = False
     cost: Optional[float] = None
 
-class JudgeScore(BaseModel):
+@dataclass(slots=True, frozen=True)
+class JudgeScore:
     """Score from the judge agent."""
-    score: int = Field(ge=1, le=5)
+    score: Annotated[int, Field(ge=1, le=5)]
     reasoning: str
     label: str
 
-class DiagnosticEncounter(BaseModel):
+@dataclass(slots=True)
+class DiagnosticEncounter:
     """A complete diagnostic encounter."""
     case_id: str
-    actions: List[AgentAction] = []
-    gatekeeper_responses: List[GatekeeperResponse] = []
+    actions: List[AgentAction] = Field(default_factory=list)
+    gatekeeper_responses: List[GatekeeperResponse] = Field(default_factory=list)
     total_cost: float = 0.0
     final_diagnosis: Optional[str] = None
     judge_score: Optional[JudgeScore] = None
     is_complete: bool = False
 
-class BenchmarkResult(BaseModel):
+@dataclass(slots=True)
+class BenchmarkResult:
     """Results from running the benchmark."""
     diagnostic_accuracy: float
     average_cost: float
@@ -1,26 +1,32 @@
 """Demo script showing SDBench system structure and capabilities."""
 
+import itertools
+import sys
+
 def show_system_overview():
-    """Display the SDBench system overview."""
-    print("SDBench - Sequential Diagnosis Benchmark")
-    print("=" * 50)
-    print()
-    print("SDBench is a comprehensive benchmark system for evaluating")
-    print("diagnostic reasoning capabilities of AI agents and humans")
-    print("in a realistic, iterative, and cost-aware manner.")
-    print()
-    print("Core Components:")
-    print("1. Gatekeeper Agent - Information oracle for patient cases")
-    print("2. Cost Estimator - Calculates diagnostic process costs")
-    print("3. Judge Agent - Evaluates diagnoses using 5-point rubric")
-    print("4. Diagnostic Agent - The system being evaluated")
-    print()
+    """Lines for the SDBench system overview."""
+    lines = []
+    lines.append("SDBench - Sequential Diagnosis Benchmark")
+    lines.append("=" * 50)
+    lines.append("")
+    lines.append("SDBench is a comprehensive benchmark system for evaluating")
+    lines.append("diagnostic reasoning capabilities of AI agents and humans")
+    lines.append("in a realistic, iterative, and cost-aware manner.")
+    lines.append("")
+    lines.append("Core Components:")
+    lines.append("1. Gatekeeper Agent - Information oracle for patient cases")
+    lines.append("2. Cost Estimator - Calculates diagnostic process costs")
+    lines.append("3. Judge Agent - Evaluates diagnoses using 5-point rubric")
+    lines.append("4. Diagnostic Agent - The system being evaluated")
+    lines.append("")
+    return lines
 
 def show_synthetic_cases():
-    """Display information about synthetic cases."""
-    print("Synthetic Test Cases")
-    print("=" * 20)
-    print()
+    """Lines describing synthetic cases."""
+    lines = []
+    lines.append("Synthetic Test Cases")
+    lines.append("=" * 20)
+    lines.append("")
     
     cases = [
         {
@@ -44,16 +50,18 @@ def show_synthetic_cases():
     ]
     
     for i, case in enumerate(cases, 1):
-        print(f"{i}. {case['title']} ({case['id']})")
-        print(f"   Abstract: {case['abstract'][:100]}...")
-        print(f"   Diagnosis: {case['diagnosis']}")
-        print()
+        lines.append(f"{i}. {case['title']} ({case['id']})")
+        lines.append(f"   Abstract: {case['abstract'][:100]}...")
+        lines.append(f"   Diagnosis: {case['diagnosis']}")
+        lines.append("")
+    return lines
 
 def show_agent_types():
-    """Display information about example agents."""
-    print("Example Diagnostic Agents")
-    print("=" * 25)
-    print()
+    """Lines describing example agents."""
+    lines = []
+    lines.append("Example Diagnostic Agents")
+    lines.append("=" * 25)
+    lines.append("")
     
     agents = [
         {
@@ -79,72 +87,78 @@ def show_agent_types():
     ]
     
     for agent in agents:
-        print(f"• {agent['name']}")
-        print(f"  Description: {agent['description']}")
-        print(f"  Strategy: {agent['strategy']}")
-        print()
+        lines.append(f"• {agent['name']}")
+        lines.append(f"  Description: {agent['description']}")
+        lines.append(f"  Strategy: {agent['strategy']}")
+        lines.append("")
+    return lines
 
 def show_evaluation_metrics():
-    """Display information about evaluation metrics."""
-    print("Evaluation Metrics")
-    print("=" * 18)
-    print()
-    
-    print("Primary Metric: Diagnostic Accuracy")
-    print("- Percentage of cases with judge score ≥ 4")
-    print("- Formula: (Correct Cases) / (Total Cases)")
-    print()
-    
-    print("Secondary Metric: Average Cumulative Cost")
-    print("- Average total cost across all cases")
-    print("- Includes physician visits ($300 each) and test costs")
-    print()
-    
-    print("Judge Scoring Rubric (5-point Likert scale):")
-    print("5 - Perfect/Clinically superior")
-    print("4 - Mostly correct (minor incompleteness)")
-    print("3 - Partially correct (major error)")
-    print("2 - Largely incorrect")
-    print("1 - Completely incorrect")
-    print()
+    """Lines describing evaluation metrics."""
+    lines = []
+    lines.append("Evaluation Metrics")
+    lines.append("=" * 18)
+    lines.append("")
+    
+    lines.append("Primary Metric: Diagnostic Accuracy")
+    lines.append("- Percentage of cases with judge score ≥ 4")
+    lines.append("- Formula: (Correct Cases) / (Total Cases)")
+    lines.append("")
+    
+    lines.append("Secondary Metric: Average Cumulative Cost")
+    lines.append("- Average total cost across all cases")
+    lines.append("- Includes physician visits ($300 each) and test costs")
+    lines.append("")
+    
+    lines.append("Judge Scoring Rubric (5-point Likert scale):")
+    lines.append("5 - Perfect/Clinically superior")
+    lines.append("4 - Mostly correct (minor incompleteness)")
+    lines.append("3 - Partially correct (major error)")
+    lines.append("2 - Largely incorrect")
+    lines.append("1 - Completely incorrect")
+    lines.append("")
+    return lines
 
 def show_usage_examples():
-    """Display usage examples."""
-    print("Usage Examples")
-    print("=" * 15)
-    print()
-    
-    print("1. Quick Test:")
-    print("   python main.py quick")
-    print()
-    
-    print("2. Single Case Demo:")
-    print("   python main.py single")
-    print()
-    
-    print("3. Full Benchmark:")
-    print("   python main.py full")
-    print()
-    
-    print("4. Interactive Demo:")
-    print("   python main.py interactive")
-    print()
-    
-    print("5. Install Dependencies:")
-    print("   pip install -r requirements.txt")
-    print()
-    
-    print("6. Set API Key:")
-    print("   export OPENAI_API_KEY='your_api_key_here'")
-    print()
+    """Lines for usage examples."""
+    lines = []
+    lines.append("Usage Examples")
+    lines.append("=" * 15)
+    lines.append("")
+    
+    lines.append("1. Quick Test:")
+    lines.append("   python main.py quick")
+    lines.append("")
+    
+    lines.append("2. Single Case Demo:")
+    lines.append("   python main.py single")
+    lines.append("")
+    
+    lines.append("3. Full Benchmark:")
+    lines.append("   python main.py full")
+    lines.append("")
+    
+    lines.append("4. Interactive Demo:")
+    lines.append("   python main.py interactive")
+    lines.append("")
+    
+    lines.append("5. Install Dependencies:")
+    lines.append("   pip install -r requirements.txt")
+    lines.append("")
+    
+    lines.append("6. Set API Key:")
+    lines.append("   export OPENAI_API_KEY='your_api_key_here'")
+    lines.append("")
+    return lines
 
 def show_system_architecture():
-    """Display system architecture information."""
-    print("System Architecture")
-    print("=" * 19)
-    print()
+    """Lines describing the system architecture."""
+    lines = []
+    lines.append("System Architecture")
+    lines.append("=" * 19)
+    lines.append("")
     
-    print("File Structure:")
+    lines.append("File Structure:")
     files = [
         "config.py - Configuration settings",
         "data_models.py - Pydantic data models", 
@@ -160,10 +174,10 @@ def show_system_architecture():
     ]
     
     for file in files:
-        print(f"  • {file}")
-    print()
+        lines.append(f"  • {file}")
+    lines.append("")
     
-    print("Key Features:")
+    lines.append("Key Features:")
     features = [
         "Sequential turn-based interactions",
         "Realistic clinical encounter simulation", 
@@ -176,25 +190,31 @@ def show_system_architecture():
     ]
     
     for feature in features:
-        print(f"  • {feature}")
-    print()
+        lines.append(f"  • {feature}")
+    lines.append("")
+    return lines
 
 def main():
     """Run the demo."""
-    show_system_overview()
-    show_synthetic_cases()
-    show_agent_types()
-    show_evaluation_metrics()
-    show_usage_examples()
-    show_system_architecture()
-    
-    print("SDBench Demo Complete!")
-    print("=" * 22)
-    print()
-    print("To run the actual benchmark:")
-    print("1. Install dependencies: pip install -r requirements.txt")
-    print("2. Set API key: export OPENAI_API_KEY='your_key'")
-    print("3. Run: python main.py")
+    # Sections are collected as lines and written in one call rather than one print per line
+    lines = list(itertools.chain(
+        show_system_overview(),
+        show_synthetic_cases(),
+        show_agent_types(),
+        show_evaluation_metrics(),
+        show_usage_examples(),
+        show_system_architecture(),
+    ))
+    lines += [
+        "SDBench Demo Complete!",
+        "=" * 22,
+        "",
+        "To run the actual benchmark:",
+        "1. Install dependencies: pip install -r requirements.txt",
+        "2. Set API key: export OPENAI_API_KEY='your_key'",
+        "3. Run: python main.py",
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
     main()
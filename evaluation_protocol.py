@@ -1,119 +1,217 @@
 """Evaluation protocol implementation for SDBench."""
 
-from typing import List, Dict, Any
-import matplotlib.pyplot as plt
+import csv
+import io
+import itertools
+from operator import attrgetter, itemgetter
+from statistics import fmean, pstdev
+from typing import List, Dict, Any, TextIO
 import numpy as np
 from data_models import DiagnosticEncounter, BenchmarkResult, JudgeScore
 from config import Config
 
+# C-level attribute readers for the per-result/per-encounter reductions
+_get_acc = attrgetter('diagnostic_accuracy')
+_get_cost = attrgetter('average_cost')
+_get_cost_and_acc = attrgetter('average_cost', 'diagnostic_accuracy')
+_get_total_cost = attrgetter('total_cost')
+
+# Per-case blocks of the detailed report
+_CASE_FMT = (
+    "\nCase {i} (ID: {cid}):\n"
+    "  - Final Diagnosis: {diag}\n"
+    "  - Judge Score: {score}/5\n"
+    "  - Judge Label: {label}\n"
+    "  - Total Cost: ${cost:.2f}\n"
+    "  - Number of Actions: {n}\n"
+)
+_REASONING_FMT = "  - Judge Reasoning: {}\n"
+
+# Most points drawn by generate_performance_plot; larger sweeps are downsampled
+_PLOT_MAX_POINTS = 10_000
+
+
+def _pareto_indices(costs: np.ndarray, accs: np.ndarray) -> np.ndarray:
+    """Indices of the cost/accuracy Pareto frontier, ordered by cost."""
+    # Sweep by cost (ties: most accurate first) and keep each point that beats the
+    # best accuracy seen at lower cost; everything else is dominated
+    order = np.lexsort((-accs, costs))
+    sorted_accs = accs[order]
+    keep = np.empty(len(order), dtype=bool)
+    keep[0] = True
+    keep[1:] = sorted_accs[1:] > np.maximum.accumulate(sorted_accs)[:-1]
+    return order[keep]
+
+
+def _plot_sample(costs: np.ndarray, accs: np.ndarray, max_points: int) -> np.ndarray:
+    """Indices of at most ~max_points to draw: the frontier, the axis extremes, then a uniform stride."""
+    extremes = np.array([costs.argmin(), costs.argmax(), accs.argmin(), accs.argmax()])
+    must_keep = np.union1d(_pareto_indices(costs, accs), extremes)
+    stride = np.linspace(0, len(costs) - 1, max(max_points - len(must_keep), 0)).astype(np.intp)
+    return np.union1d(must_keep, stride)
+
+
 class EvaluationProtocol:
     """Handles evaluation metrics and result analysis for SDBench."""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, plot_enabled: bool = False):
         self.config = config
+        # Plots are opt-in so headless benchmark runs never touch matplotlib
+        self.plot_enabled = plot_enabled
+        # Reusable performance-plot figure and the data artists drawn on it
+        self._fig = None
+        self._ax = None
+        self._plot_artists = []
         self.correct_threshold = config.CORRECT_DIAGNOSIS_THRESHOLD
     
+    @staticmethod
+    def _score_array(encounters: List[DiagnosticEncounter]) -> np.ndarray:
+        """Judge scores as an int8 array (0 for unjudged encounters)."""
+        return np.fromiter((e.judge_score.score if e.judge_score else 0 for e in encounters),
+                           dtype=np.int8, count=len(encounters))
+    
+    @staticmethod
+    def _cost_array(encounters: List[DiagnosticEncounter]) -> np.ndarray:
+        return np.fromiter(map(_get_total_cost, encounters), dtype=np.float64, count=len(encounters))
+    
+    def _correct_mask(self, scores: np.ndarray) -> np.ndarray:
+        return scores >= self.correct_threshold
+    
     def calculate_diagnostic_accuracy(self, encounters: List[DiagnosticEncounter]) -> float:
         """Calculate diagnostic accuracy based on judge scores."""
         if not encounters:
             return 0.0
-        
-        correct_cases = 0
-        for encounter in encounters:
-            if encounter.judge_score and encounter.judge_score.score >= self.correct_threshold:
-                correct_cases += 1
-        
-        return correct_cases / len(encounters)
+        return float(self._correct_mask(self._score_array(encounters)).mean())
     
     def calculate_average_cost(self, encounters: List[DiagnosticEncounter]) -> float:
         """Calculate average cumulative cost across all encounters."""
         if not encounters:
             return 0.0
-        
-        total_cost = sum(encounter.total_cost for encounter in encounters)
-        return total_cost / len(encounters)
+        return float(self._cost_array(encounters).mean())
     
     def evaluate_encounters(self, encounters: List[DiagnosticEncounter]) -> BenchmarkResult:
         """Evaluate a list of diagnostic encounters and return benchmark results."""
-        diagnostic_accuracy = self.calculate_diagnostic_accuracy(encounters)
-        average_cost = self.calculate_average_cost(encounters)
+        if not encounters:
+            return BenchmarkResult(diagnostic_accuracy=0.0, average_cost=0.0, total_cases=0,
+                                   correct_cases=0, encounter_results=encounters)
         
-        correct_cases = sum(1 for encounter in encounters 
-                           if encounter.judge_score and encounter.judge_score.score >= self.correct_threshold)
+        # The correct mask is built once; accuracy and the correct count both reuse it
+        total_cases = len(encounters)
+        scores = self._score_array(encounters)
+        costs = self._cost_array(encounters)
+        correct_mask = self._correct_mask(scores)
+        correct_cases = int(correct_mask.sum())
         
         return BenchmarkResult(
-            diagnostic_accuracy=diagnostic_accuracy,
-            average_cost=average_cost,
-            total_cases=len(encounters),
+            diagnostic_accuracy=correct_cases / total_cases,
+            average_cost=float(costs.mean()),
+            total_cases=total_cases,
             correct_cases=correct_cases,
             encounter_results=encounters
         )
     
     def generate_performance_plot(self, results: List[BenchmarkResult], 
                                 agent_names: List[str] = None,
-                                save_path: str = None) -> None:
-        """Generate a 2D performance plot showing cost vs accuracy."""
+                                save_path: str = None):
+        """Generate a 2D performance plot showing cost vs accuracy (no-op unless plot_enabled).
+
+        Drawn on an Agg-backed Figure without pyplot's global figure registry. The plot is
+        saved to save_path if given, and the Figure is returned either way; it is reused
+        by the next call on this protocol.
+        """
+        if not self.plot_enabled:
+            return None
         if not results:
             print("No results to plot")
-            return
+            return None
         
-        costs = [result.average_cost for result in results]
-        accuracies = [result.diagnostic_accuracy for result in results]
+        # (cost, accuracy) rows in one contiguous array handed to matplotlib by column
+        points = np.fromiter(
+            itertools.chain.from_iterable(map(_get_cost_and_acc, results)),
+            dtype=np.float64, count=2 * len(results),
+        ).reshape(-1, 2)
+        x_max = points[:, 0].max()
         
-        plt.figure(figsize=(10, 8))
-        plt.scatter(costs, accuracies, s=100, alpha=0.7)
+        # Big sweeps are thinned before drawing, keeping the frontier and axis extremes
+        note = None
+        if len(points) > _PLOT_MAX_POINTS:
+            shown = _plot_sample(points[:, 0], points[:, 1], _PLOT_MAX_POINTS)
+            note = f"Showing {len(shown)} of {len(points)} points (Pareto frontier kept)"
+            points = points[shown]
+            if agent_names and len(agent_names) == len(results):
+                agent_names = [agent_names[i] for i in shown]
+                results = [results[i] for i in shown]
+        costs, accuracies = points[:, 0], points[:, 1]
         
-        # Add labels for each point if agent names provided
-        if agent_names and len(agent_names) == len(results):
-            for i, name in enumerate(agent_names):
-                plt.annotate(name, (costs[i], accuracies[i]), 
-                           xytext=(5, 5), textcoords='offset points')
+        # The decorated axes are built once and reused; only the data artists are redrawn
+        if self._fig is None:
+            self._fig, self._ax = self._performance_plot_template()
+        ax = self._ax
+        for artist in self._plot_artists:
+            artist.remove()
         
-        plt.xlabel('Average Cost ($)')
-        plt.ylabel('Diagnostic Accuracy')
-        plt.title('SDBench Performance: Cost vs Accuracy')
-        plt.grid(True, alpha=0.3)
+        self._plot_artists = [ax.scatter(costs, accuracies, s=100, alpha=0.7, color='C0')]
         
-        # Set axis limits
-        plt.xlim(0, max(costs) * 1.1)
-        plt.ylim(0, 1.05)
+        # Add labels for each point if agent names provided
+        if agent_names and len(agent_names) == len(results):
+            self._plot_artists += [
+                ax.annotate(name, xy, xytext=(5, 5), textcoords='offset points')
+                for name, xy in zip(agent_names, points.tolist())
+            ]
         
-        # Add performance regions
-        plt.axhspan(0.8, 1.0, alpha=0.1, color='green', label='High Accuracy')
-        plt.axhspan(0.6, 0.8, alpha=0.1, color='yellow', label='Medium Accuracy')
-        plt.axhspan(0.0, 0.6, alpha=0.1, color='red', label='Low Accuracy')
+        if note:
+            self._plot_artists.append(ax.text(0.01, 0.01, note, transform=ax.transAxes, fontsize=8))
         
-        plt.legend()
-        plt.tight_layout()
+        ax.set_xlim(0, x_max * 1.1)
+        self._fig.tight_layout()
         
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            self._fig.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"Performance plot saved to {save_path}")
-        else:
-            plt.show()
+        return self._fig
+    
+    @staticmethod
+    def _performance_plot_template():
+        """Figure with the fixed labels, grid, y range and accuracy bands of the performance plot."""
+        # Imported here so headless evaluation never loads matplotlib
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        
+        fig = Figure(figsize=(10, 8))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111)
+        ax.set_xlabel('Average Cost ($)')
+        ax.set_ylabel('Diagnostic Accuracy')
+        ax.set_title('SDBench Performance: Cost vs Accuracy')
+        ax.grid(True, alpha=0.3)
+        ax.set_ylim(0, 1.05)
+        
+        # Add performance regions
+        ax.axhspan(0.8, 1.0, alpha=0.1, color='green', label='High Accuracy')
+        ax.axhspan(0.6, 0.8, alpha=0.1, color='yellow', label='Medium Accuracy')
+        ax.axhspan(0.0, 0.6, alpha=0.1, color='red', label='Low Accuracy')
+        
+        ax.legend()
+        return fig, ax
     
     def calculate_pareto_frontier(self, results: List[BenchmarkResult]) -> List[BenchmarkResult]:
         """Calculate the Pareto frontier for cost vs accuracy trade-offs."""
         if len(results) < 2:
             return results
         
-        # Sort by cost (ascending)
-        sorted_results = sorted(results, key=lambda x: x.average_cost)
-        pareto_frontier = [sorted_results[0]]
-        
-        for result in sorted_results[1:]:
-            # Check if this result dominates the last one in the frontier
-            last_frontier = pareto_frontier[-1]
-            if (result.diagnostic_accuracy > last_frontier.diagnostic_accuracy or
-                (result.diagnostic_accuracy == last_frontier.diagnostic_accuracy and 
-                 result.average_cost < last_frontier.average_cost)):
-                pareto_frontier.append(result)
-        
-        return pareto_frontier
+        costs = np.fromiter(map(_get_cost, results), dtype=np.float64, count=len(results))
+        accs = np.fromiter(map(_get_acc, results), dtype=np.float64, count=len(results))
+        return [results[i] for i in _pareto_indices(costs, accs)]
     
     def generate_detailed_report(self, result: BenchmarkResult) -> str:
         """Generate a detailed text report of benchmark results."""
-        report = f"""
+        buf = io.StringIO()
+        self.write_detailed_report(result, buf)
+        return buf.getvalue()
+    
+    def write_detailed_report(self, result: BenchmarkResult, out: TextIO) -> None:
+        """Write the detailed report to a text stream case by case, without holding it in memory."""
+        out.write(f"""
 SDBench Evaluation Report
 ========================
 
@@ -122,41 +220,39 @@ Overall Performance:
 - Average Cost: ${result.average_cost:.2f}
 
 Case-by-Case Results:
-"""
+""")
         
         for i, encounter in enumerate(result.encounter_results, 1):
-            report += f"\nCase {i} (ID: {encounter.case_id}):\n"
-            report += f"  - Final Diagnosis: {encounter.final_diagnosis or 'No diagnosis'}\n"
-            report += f"  - Judge Score: {encounter.judge_score.score if encounter.judge_score else 'N/A'}/5\n"
-            report += f"  - Judge Label: {encounter.judge_score.label if encounter.judge_score else 'N/A'}\n"
-            report += f"  - Total Cost: ${encounter.total_cost:.2f}\n"
-            report += f"  - Number of Actions: {len(encounter.actions)}\n"
-            
-            if encounter.judge_score and encounter.judge_score.reasoning:
-                report += f"  - Judge Reasoning: {encounter.judge_score.reasoning}\n"
-        
-        return report
+            judge = encounter.judge_score
+            out.write(_CASE_FMT.format_map({
+                'i': i,
+                'cid': encounter.case_id,
+                'diag': encounter.final_diagnosis or 'No diagnosis',
+                'score': judge.score if judge else 'N/A',
+                'label': judge.label if judge else 'N/A',
+                'cost': encounter.total_cost,
+                'n': len(encounter.actions),
+            }))
+            if judge and judge.reasoning:
+                out.write(_REASONING_FMT.format(judge.reasoning))
     
     def export_results_to_csv(self, results: List[BenchmarkResult], 
                             agent_names: List[str] = None,
                             filename: str = "sdbench_results.csv") -> None:
         """Export results to CSV format for further analysis."""
-        import pandas as pd
-        
-        data = []
-        for i, result in enumerate(results):
-            agent_name = agent_names[i] if agent_names and i < len(agent_names) else f"Agent_{i+1}"
-            
-            data.append({
-                'Agent': agent_name,
-                'Diagnostic_Accuracy': result.diagnostic_accuracy,
-                'Average_Cost': result.average_cost,
-                'Total_Cases': result.total_cases,
-                'Correct_Cases': result.correct_cases
-            })
-        
-        df = pd.DataFrame(data)
-        df.to_csv(filename, index=False)
+        fieldnames = ['Agent', 'Diagnostic_Accuracy', 'Average_Cost', 'Total_Cases', 'Correct_Cases']
+        with open(filename, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator="\n")
+            writer.writeheader()
+            for i, result in enumerate(results):
+                agent_name = agent_names[i] if agent_names and i < len(agent_names) else f"Agent_{i+1}"
+                writer.writerow({
+                    'Agent': agent_name,
+                    'Diagnostic_Accuracy': result.diagnostic_accuracy,
+                    'Average_Cost': result.average_cost,
+                    'Total_Cases': result.total_cases,
+                    'Correct_Cases': result.correct_cases
+                })
         print(f"Results exported to {filename}")
     
     def compare_agents(self, results: List[BenchmarkResult], 
@@ -165,29 +261,27 @@ Case-by-Case Results:
         if not results:
             return {}
         
+        # Agent counts are small, so plain reductions beat building NumPy arrays
+        accuracies = list(map(_get_acc, results))
+        costs = list(map(_get_cost, results))
+        
         comparison = {
-            'best_accuracy': max(results, key=lambda x: x.diagnostic_accuracy),
-            'lowest_cost': min(results, key=lambda x: x.average_cost),
-            'best_efficiency': None,  # Will calculate efficiency score
+            'best_accuracy': max(results, key=_get_acc),
+            'lowest_cost': min(results, key=_get_cost),
+            'best_efficiency': None,  # (result, accuracy per dollar) among agents with a positive cost
             'statistics': {}
         }
         
-        # Calculate efficiency score (accuracy per dollar)
-        for i, result in enumerate(results):
-            if result.average_cost > 0:
-                efficiency = result.diagnostic_accuracy / result.average_cost
-                if comparison['best_efficiency'] is None or efficiency > comparison['best_efficiency'][1]:
-                    comparison['best_efficiency'] = (result, efficiency)
-        
-        # Calculate statistics
-        accuracies = [r.diagnostic_accuracy for r in results]
-        costs = [r.average_cost for r in results]
+        priced = [(a / c, r) for a, c, r in zip(accuracies, costs, results) if c > 0]
+        if priced:
+            efficiency, best = max(priced, key=itemgetter(0))
+            comparison['best_efficiency'] = (best, efficiency)
         
         comparison['statistics'] = {
-            'accuracy_mean': np.mean(accuracies),
-            'accuracy_std': np.std(accuracies),
-            'cost_mean': np.mean(costs),
-            'cost_std': np.std(costs),
+            'accuracy_mean': fmean(accuracies),
+            'accuracy_std': pstdev(accuracies),
+            'cost_mean': fmean(costs),
+            'cost_std': pstdev(costs),
             'accuracy_range': (min(accuracies), max(accuracies)),
             'cost_range': (min(costs), max(costs))
         }
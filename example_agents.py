@@ -1,14 +1,420 @@
 """Example diagnostic agents for SDBench testing."""
 
+import io
+import json
 import random
-from typing import List
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
 from data_models import AgentAction, ActionType
 from sdbench import DiagnosticAgent
 from config import Config
 from utils.llm_client import chat_completion_with_retries
+from utils.batch_queue import batch_queue_for
+from utils.semantic_cache import SemanticCache, semantic_cache_for
+
+# Tag patterns for the agents' structured replies, compiled once
+_OPT_RE = re.compile(r"<diagnosis_option>\s*([ABCD])\s*</diagnosis_option>", re.IGNORECASE)
+_DIAG_RE = re.compile(r"<diagnosis>(.*?)</diagnosis>", re.DOTALL)
+_Q_RE = re.compile(r"<question>(.*?)</question>", re.DOTALL)
+_TEST_RE = re.compile(r"<test>(.*?)</test>", re.DOTALL)
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+_PLAN_ACTION_RE = re.compile(r"<action>(.*?)</action>", re.DOTALL)
+
+# Tags read from <check>/<panel> blocks by _scan_tags
+_TAGS = ('decision', 'action', 'question', 'approved_tests', 'ordered_tests',
+         'diagnosis_option', 'diagnosis', 'notes')
+_TAG_OPEN_RE = re.compile(r"<(" + "|".join(_TAGS) + r")>", re.IGNORECASE)
+_DECISIONS = ('question', 'test', 'diagnose')
+_OPTIONS = ('A', 'B', 'C', 'D')
+# take_action tool values (see LLM_AGENT_ACTION_TOOL)
+_TOOL_ACTION_TYPES = {"ask": ActionType.ASK_QUESTIONS, "test": ActionType.REQUEST_TESTS,
+                      "diagnose": ActionType.DIAGNOSE}
+# Keyword tags only count when their body is one of the allowed values
+_KEYWORD_TAGS = {'decision': _DECISIONS, 'action': _DECISIONS,
+                 'diagnosis_option': ('a', 'b', 'c', 'd')}
+
+
+def _scan_tags(text: str) -> Dict[str, str]:
+    """Body of the first <tag>...</tag> for each name in _TAGS, in one left-to-right pass.
+
+    Opening tags are located in a single scan and each body ends at the next matching
+    closing tag (str.find), so long bodies are not walked by lazy regex quantifiers.
+    Tags nested inside another (<action> inside <decision>) are found as well; keyword
+    tags with an unexpected body are skipped in favour of a later occurrence.
+    """
+    found = {}
+    if '<' not in text:
+        return found
+    find = text.find
+    for m in _TAG_OPEN_RE.finditer(text):
+        raw = m.group(1)
+        name = raw.lower()
+        if name in found:
+            continue
+        start = m.end()
+        end = find(f"</{raw}>", start)
+        if end < 0:
+            continue
+        body = text[start:end]
+        allowed = _KEYWORD_TAGS.get(name)
+        if allowed is None or body.strip().lower() in allowed:
+            found[name] = body
+    return found
+
+
+def _diagnose_from_tags(tags: Dict[str, str]) -> AgentAction:
+    option = tags.get('diagnosis_option', '').strip().upper()
+    diag = tags.get('diagnosis')
+    if option in _OPTIONS and diag is not None:
+        return AgentAction(ActionType.DIAGNOSE, f"Option {option}: {diag.strip()}")
+    if diag is not None:
+        return AgentAction(ActionType.DIAGNOSE, diag.strip())
+    return AgentAction(ActionType.DIAGNOSE, "Unable to determine.")
+
+
+@lru_cache(maxsize=1024)
+def _parse_action_text(action_text: str) -> AgentAction:
+    """Parse an LLMDiagnosticAgent reply into an AgentAction.
+
+    Pure and memoized: AgentAction is frozen, so repeated replies (retries,
+    cache hits) share one parsed instance.
+    """
+    # Untagged reply: skip the searches below (plain substring checks are far cheaper)
+    if '<' not in action_text:
+        return AgentAction(
+            ActionType.ASK_QUESTIONS,
+            action_text.strip()
+        )
+
+    # Look for diagnosis option + text
+    diag_match = _DIAG_RE.search(action_text) if '<diagnosis>' in action_text else None
+    opt_match = _OPT_RE.search(action_text) if diag_match else None
+    if opt_match and diag_match:
+        choice = opt_match.group(1).upper()
+        diagnosis_text = diag_match.group(1).strip()
+        return AgentAction(
+            ActionType.DIAGNOSE,
+            f"Option {choice}: {diagnosis_text}"
+        )
+
+    # Look for question tags
+    question_match = _Q_RE.search(action_text) if '<question>' in action_text else None
+    if question_match:
+        return AgentAction(
+            ActionType.ASK_QUESTIONS,
+            question_match.group(1).strip()
+        )
+
+    # Look for test tags
+    test_match = _TEST_RE.search(action_text) if '<test>' in action_text else None
+    if test_match:
+        return AgentAction(
+            ActionType.REQUEST_TESTS,
+            test_match.group(1).strip()
+        )
+
+    # Look for diagnosis tags
+    diagnosis_match = diag_match
+    if diagnosis_match:
+        return AgentAction(
+            ActionType.DIAGNOSE,
+            diagnosis_match.group(1).strip()
+        )
+
+    # If no tags found, treat as question
+    return AgentAction(
+        ActionType.ASK_QUESTIONS,
+        action_text.strip()
+    )
+
+
+def _parse_tool_action(arguments: str) -> AgentAction:
+    """AgentAction from take_action call arguments; raises on malformed JSON or fields."""
+    args = json.loads(arguments)
+    action_type = _TOOL_ACTION_TYPES.get(args.get("action"))
+    content = str(args.get("content") or "").strip()
+    if action_type is None or not content:
+        raise ValueError(f"Unusable take_action arguments: {arguments!r}")
+    option = str(args.get("option") or "").strip().upper()
+    if action_type == ActionType.DIAGNOSE and option in _OPTIONS:
+        content = f"Option {option}: {content}"
+    return AgentAction(action_type, content)
+
+
+def _parse_plan(text: str) -> List[AgentAction]:
+    """Actions of a <plan> reply in order, cut after the first diagnosis.
+
+    A reply without <action> blocks is read as a single action.
+    """
+    blocks = [block.strip() for block in _PLAN_ACTION_RE.findall(text) if block.strip()]
+    if not blocks:
+        return [_parse_action_text(text)]
+    actions = []
+    for block in blocks:
+        actions.append(_parse_action_text(block))
+        if actions[-1].action_type == ActionType.DIAGNOSE:
+            break
+    return actions
+
+
+@lru_cache(maxsize=1024)
+def _parse_check_block(text: str) -> AgentAction:
+    """Parse a Dr. Checklist <check> block (memoized like _parse_action_text)."""
+    tags = _scan_tags(text)
+    decision = tags.get('decision', '').strip().lower()
+    if decision not in _DECISIONS:
+        decision = "question"
+
+    if decision == "question":
+        q = tags.get('question')
+        content = q.strip() if q is not None else "Could you clarify your key symptoms and timeline?"
+        return AgentAction(ActionType.ASK_QUESTIONS, content)
+
+    if decision == "test":
+        tests = tags.get('approved_tests', '').strip()
+        first = tests.partition(";")[0].strip() if tests else "Complete Blood Count with differential"
+        return AgentAction(ActionType.REQUEST_TESTS, first)
+
+    if decision == "diagnose":
+        return _diagnose_from_tags(tags)
+
+    return AgentAction(ActionType.ASK_QUESTIONS, "Please provide more history about onset, progression, and associated symptoms.")
+
+
+# LLMDiagnosticAgent instructions; the case context is sent as the user message
+_LLM_AGENT_POLICY = """You are an expert diagnostic physician. Based on the case information and encounter history, determine the next most appropriate action.
+
+Iterative policy (soft guidance):
+- Prefer asking a few (e.g., 3–8) targeted, high-yield questions/tests before committing.
+- Prioritize clarifying red flags, key differentials, and decisive tests.
+- When you are reasonably confident, finalize succinctly.
+
+If the case provides OPTIONS (A-D), prefer selecting a final answer from those options when you are confident.
+
+You can take one of three types of actions:
+1. Ask a specific question about the patient's history or examination
+2. Order a specific test or procedure
+3. Make a final diagnosis (only if you're confident). If options A-D are present, pick ONE option as final."""
+
+LLM_AGENT_ACTION_PROMPT = _LLM_AGENT_POLICY + """
+
+Respond in one of the following formats:
+- For questions: <question>Your specific question here</question>
+- For tests: <test>Specific test name here</test>
+- For diagnosis WITHOUT options: <diagnosis>Your diagnosis here</diagnosis>
+- For diagnosis WITH options: <diagnosis_option>A</diagnosis_option> <diagnosis>The full text of the chosen option</diagnosis>
+
+Be specific and clinical in your requests. Avoid vague or overly broad questions/tests."""
+
+# Used instead with LLMDiagnosticAgent(plan_size=N > 1): several actions per call
+LLM_AGENT_PLAN_PROMPT = _LLM_AGENT_POLICY + """
+
+Plan your next {plan_size} actions at once, in the order you would take them; the answers to earlier ones will not be available when later ones are taken, so choose actions that are useful regardless. Only the last action of a plan may be a diagnosis.
+
+Respond with:
+<plan>
+<action><question>Your specific question here</question></action>
+<action><test>Specific test name here</test></action>
+</plan>
+For a diagnosis use <action><diagnosis>Your diagnosis here</diagnosis></action>, or with options <action><diagnosis_option>A</diagnosis_option> <diagnosis>The full text of the chosen option</diagnosis></action>.
+
+Be specific and clinical in your requests. Avoid vague or overly broad questions/tests."""
+
+# Used instead when Config.LLM_AGENT_TOOL_CALLS is on: the reply is a forced take_action call
+LLM_AGENT_TOOL_PROMPT = _LLM_AGENT_POLICY + """
+
+Report your action by calling take_action: action is "ask", "test" or "diagnose"; content is the specific question, the test name, or the diagnosis (the full text of the chosen option if options A-D are present, with its letter in option).
+
+Be specific and clinical in your requests. Avoid vague or overly broad questions/tests."""
+
+LLM_AGENT_ACTION_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "take_action",
+        "description": "Take the next diagnostic action.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "action": {"type": "string", "enum": ["ask", "test", "diagnose"]},
+                "content": {"type": "string"},
+                "option": {"type": "string", "enum": ["A", "B", "C", "D"]},
+            },
+            "required": ["action", "content"],
+        },
+    },
+}
+
+LLM_AGENT_FINAL_PROMPT = """You are an expert diagnostic physician. Based on all available information, make your best diagnostic assessment.
+
+If OPTIONS (A-D) are provided in the case context, you MUST choose exactly one option as the final answer.
+
+Respond in one of the following formats:
+- If options present: <diagnosis_option>[A-D]</diagnosis_option> <diagnosis>The full text of the chosen option</diagnosis>
+- If no options present: <diagnosis>Your diagnosis here</diagnosis>"""
+
+# MAIDxOAgent's forced final round
+MAIDXO_FORCE_FINAL_PROMPT = """You MUST finalize the diagnosis now. If OPTIONS (A-D) are present, choose exactly ONE as the final answer.
+
+Return EXACTLY this block:
+<panel>
+  <decision>
+    <action>diagnose</action>
+    <diagnosis_option>A</diagnosis_option>
+    <diagnosis>Full text of the chosen option or final dx</diagnosis>
+  </decision>
+</panel>"""
+
+# Every MultiLLMDxOAgent role call sends the same system message and case context
+# first, so the five roles share one cacheable prompt prefix per round; the role's
+# persona/rules/schema below and its inputs (earlier role outputs) come last.
+PANEL_MEMBER_PREAMBLE = ("You are one member of a virtual panel of physicians working a diagnostic case. "
+                         "The case context comes first; your role and instructions follow it.")
+
+ROLE_SYSTEM_PROMPTS = {
+    'hypothesis': """You are Dr. Hypothesis. Maintain a probability-ranked top-3 differential diagnosis and briefly justify.
+
+Rule: Do NOT finalize diagnosis in round 1; focus on building a good differential.
+
+Return format:
+1) DxA: pA
+2) DxB: pB
+3) DxC: pC
+Notes: one sentence rationale.""",
+    'test_chooser': """You are Dr. Test-Chooser. Given the case and hypotheses, propose up to three tests that maximally discriminate.
+
+Rule: On round 1, prefer questions or low-cost, high-yield tests; do NOT finalize diagnosis.
+
+Return format as bullet list (<=3):
+- Test 1
+- Test 2
+- Test 3""",
+    'challenger': """You are Dr. Challenger. Identify potential anchoring bias or contradictions; propose one falsifying test if applicable.
+
+Return 2-4 bullet points.""",
+    'stewardship': """You are Dr. Stewardship. Ensure cost-conscious care; suggest cheaper equivalents for proposed tests and veto low-yield options.
+
+Return a final approved test list (<=3), one per line. If equally good cheaper alternatives exist, use the cheaper names.""",
+    'checklist': """You are Dr. Checklist. Validate test names are specific and billable; ensure internal consistency. If options (A-D) exist in the abstract/context and confidence is high, you may suggest a single choice.
+
+Constraint: Do NOT choose the diagnose action in round 1. Choose question or test.
+
+Return EXACTLY this block (missing fields empty if not used):
+<check>
+  <approved_tests>Test 1; Test 2; Test 3</approved_tests>
+  <decision>question|test|diagnose</decision>
+  <question>...</question>
+  <diagnosis_option>A</diagnosis_option>
+  <diagnosis>Text</diagnosis>
+</check>""",
+    # All five personas in one call, for the rounds MultiLLMDxOAgent runs with single_call_rounds
+    'panel': """You are the whole panel in one reply: Dr. Hypothesis (top-3 differential), Dr. Test-Chooser (up to three discriminating tests), Dr. Challenger (anchoring bias, falsifying tests), Dr. Stewardship (cheaper equivalents, veto low-yield tests) and Dr. Checklist (specific, billable test names; internal consistency). Debate silently and report only the checklist's verdict.
+
+Constraint: Do NOT choose the diagnose action in round 1. Choose question or test.
+
+Return EXACTLY this block (missing fields empty if not used):
+<check>
+  <approved_tests>Test 1; Test 2; Test 3</approved_tests>
+  <decision>question|test|diagnose</decision>
+  <question>...</question>
+  <diagnosis_option>A</diagnosis_option>
+  <diagnosis>Text</diagnosis>
+</check>""",
+}
+
+# Output ceilings sized to each role's return format (a few lines, or the <check> block)
+# rather than one loose limit; raise an entry if its replies come back truncated
+ROLE_MAX_TOKENS = {
+    'hypothesis': 120,
+    'test_chooser': 90,
+    'challenger': 150,
+    'stewardship': 120,
+    'checklist': 160,
+    'panel': 160,
+}
+# The full <panel> schema (hypotheses, tests, decision, notes)
+PANEL_MAX_TOKENS = 450
+
+# Static part of the MAIDxOAgent panel prompt; only the context changes between calls
+MAIDXO_PANEL_SYSTEM_PROMPT = """You are a virtual panel of five doctors collaborating on diagnosis. Follow roles and emit a structured plan.
+
+Panel roles:
+- Dr. Hypothesis: Maintain top-3 differential with probabilities (Bayesian update after new info).
+- Dr. Test-Chooser: Propose up to 3 tests that maximally discriminate between leading hypotheses.
+- Dr. Challenger: Point out anchoring bias, contradictory evidence, and propose tests to falsify.
+- Dr. Stewardship: Ensure cost-consciousness; suggest cheaper but equivalent alternatives; veto low-yield expensive tests.
+- Dr. Checklist: Validate test names are specific and billable; enforce output schema; ensure internal consistency.
+
+Iterative policy (soft guidance):
+- Prefer asking a few (e.g., 3–8) targeted, high-yield questions/tests before committing.
+- Prioritize clarifying red flags, key differentials, and decisive tests.
+- When reasonably confident, finalize succinctly.
+
+Chain of Debate (keep concise):
+1) Hypothesis update (top3 with probabilities summing to 1.0)
+2) Test-Chooser proposal (<=3 tests)
+3) Challenger critique
+4) Stewardship adjustments (cost-aware)
+5) Checklist validation
+
+Decision rule:
+- If reasonably confident AND options (A-D) exist, pick ONE option.
+- Else if not confident, choose to ask an informative question OR order <=3 decisive tests.
+
+Return EXACTLY this schema (no extra text):
+<panel>
+  <hypotheses>
+    1) DxA: pA
+    2) DxB: pB
+    3) DxC: pC
+  </hypotheses>
+  <tests>
+    - Test 1
+    - Test 2
+    - Test 3
+  </tests>
+  <decision>
+    <action>question|test|diagnose</action>
+    <question>...</question>
+    <ordered_tests>Test 1; Test 2</ordered_tests>
+    <diagnosis_option>A</diagnosis_option>
+    <diagnosis>Full text of the chosen option or final dx</diagnosis>
+  </decision>
+  <notes>1-2 line rationale</notes>
+</panel>"""
 
 class RandomDiagnosticAgent(DiagnosticAgent):
     """A random diagnostic agent for baseline testing."""
+
+    _ACTION_TYPES = (ActionType.ASK_QUESTIONS, ActionType.REQUEST_TESTS)
+    _QUESTIONS = (
+        "What is the patient's age and gender?",
+        "What are the main symptoms?",
+        "How long have the symptoms been present?",
+        "Are there any associated symptoms?",
+        "What is the patient's medical history?",
+        "Are there any recent exposures or travel?",
+        "What medications is the patient taking?",
+        "Are there any allergies?",
+        "What are the vital signs?",
+        "Are there any physical examination findings?",
+    )
+    _TESTS = (
+        "Complete Blood Count",
+        "Comprehensive Metabolic Panel",
+        "Chest X-ray",
+        "CT scan of the chest",
+        "Blood cultures",
+        "Urinalysis",
+        "Electrocardiogram",
+        "Echocardiogram",
+        "Liver function tests",
+        "Thyroid function tests",
+    )
     
     def __init__(self, name: str = "RandomAgent"):
         super().__init__(name)
@@ -22,44 +428,20 @@ class RandomDiagnosticAgent(DiagnosticAgent):
         # If we've taken too many actions, make a random diagnosis
         if self.actions_taken >= self.max_actions:
             return AgentAction(
-                action_type=ActionType.DIAGNOSE,
-                content="I cannot determine the diagnosis with the available information."
+                ActionType.DIAGNOSE,
+                "I cannot determine the diagnosis with the available information."
             )
         
         # Randomly choose action type
-        action_type = random.choice([ActionType.ASK_QUESTIONS, ActionType.REQUEST_TESTS])
+        action_type = self._ACTION_TYPES[random.randrange(2)]
         
         if action_type == ActionType.ASK_QUESTIONS:
-            questions = [
-                "What is the patient's age and gender?",
-                "What are the main symptoms?",
-                "How long have the symptoms been present?",
-                "Are there any associated symptoms?",
-                "What is the patient's medical history?",
-                "Are there any recent exposures or travel?",
-                "What medications is the patient taking?",
-                "Are there any allergies?",
-                "What are the vital signs?",
-                "Are there any physical examination findings?"
-            ]
-            content = random.choice(questions)
+            content = self._QUESTIONS[random.randrange(len(self._QUESTIONS))]
         
         else:  # REQUEST_TESTS
-            tests = [
-                "Complete Blood Count",
-                "Comprehensive Metabolic Panel",
-                "Chest X-ray",
-                "CT scan of the chest",
-                "Blood cultures",
-                "Urinalysis",
-                "Electrocardiogram",
-                "Echocardiogram",
-                "Liver function tests",
-                "Thyroid function tests"
-            ]
-            content = random.choice(tests)
+            content = self._TESTS[random.randrange(len(self._TESTS))]
         
-        return AgentAction(action_type=action_type, content=content)
+        return AgentAction(action_type, content)
     
     def reset(self) -> None:
         """Reset for new case."""
@@ -68,14 +450,27 @@ class RandomDiagnosticAgent(DiagnosticAgent):
 class LLMDiagnosticAgent(DiagnosticAgent):
     """A diagnostic agent powered by a language model."""
     
-    def __init__(self, name: str = "LLMAgent", config: Config = None):
+    _FALLBACK_QUESTIONS = (
+        "What are the patient's vital signs?",
+        "What is the patient's medical history?",
+        "Are there any physical examination findings?",
+        "What medications is the patient taking?",
+    )
+    
+    def __init__(self, name: str = "LLMAgent", config: Config = None, plan_size: int = 1):
         super().__init__(name)
         self.config = config or Config()
-        self.client = self.config.get_openai_client()
+        self.client = self.config.openai_client
         self.model = self.config.GATEKEEPER_MODEL
         self.actions_taken = 0
         self.max_actions = 20
         self.diagnostic_hypotheses = []
+        self._history = io.StringIO()
+        self._last_history_len = 0
+        # plan_size > 1 asks for that many actions per call and plays them back in order
+        self.plan_size = plan_size
+        self._plan = deque()
+        self._last_abstract = None
     
     def get_next_action(self, case_abstract: str, encounter_history: List[AgentAction]) -> AgentAction:
         """Generate an intelligent action using LLM."""
@@ -85,6 +480,10 @@ class LLMDiagnosticAgent(DiagnosticAgent):
         if self.actions_taken >= self.max_actions - 1:
             return self._make_final_diagnosis(case_abstract, encounter_history)
         
+        planned = self._planned_action(case_abstract)
+        if planned is not None:
+            return planned
+        
         # Build context from encounter history
         context = self._build_context(case_abstract, encounter_history)
         
@@ -95,129 +494,107 @@ class LLMDiagnosticAgent(DiagnosticAgent):
             return self._make_final_diagnosis(case_abstract, encounter_history)
         return action
     
+    def _planned_action(self, case_abstract: str) -> Optional[AgentAction]:
+        """Next queued action of the current plan, or None to ask the LLM.
+
+        SDBench appends every gatekeeper answer to the context it passes in, so an
+        unchanged context means the previous request was rejected or failed; the
+        rest of that plan is dropped and a new one requested.
+        """
+        seen, self._last_abstract = self._last_abstract, case_abstract
+        if self._plan and case_abstract != seen:
+            return self._plan.popleft()
+        self._plan.clear()
+        return None
+    
     def _build_context(self, case_abstract: str, encounter_history: List[AgentAction]) -> str:
-        """Build context string from case and history."""
-        context = f"Case Abstract: {case_abstract}\n\n"
+        """Build context string from case and history.
+
+        The history only grows during a case, so just the new actions are rendered
+        and appended to the block kept from earlier turns.
+        """
+        parts = [f"Case Abstract: {case_abstract}\n\n"]
         
+        if len(encounter_history) < self._last_history_len:
+            self._history = io.StringIO()
+            self._last_history_len = 0
+        for i, action in enumerate(encounter_history[self._last_history_len:], self._last_history_len + 1):
+            self._history.write(f"{i}. {action.action_type.value}: {action.content}\n")
+        self._last_history_len = len(encounter_history)
         if encounter_history:
-            context += "Encounter History:\n"
-            for i, action in enumerate(encounter_history, 1):
-                context += f"{i}. {action.action_type.value}: {action.content}\n"
+            parts += ("Encounter History:\n", self._history.getvalue())
         
-        return context
+        return "".join(parts)
     
     def _generate_next_action(self, context: str) -> AgentAction:
         """Generate the next action using LLM."""
-        prompt = f"""
-        You are an expert diagnostic physician. Based on the case information and encounter history, determine the next most appropriate action.
-
-        {context}
-
-        Iterative policy (soft guidance):
-        - Prefer asking a few (e.g., 3–8) targeted, high-yield questions/tests before committing.
-        - Prioritize clarifying red flags, key differentials, and decisive tests.
-        - When you are reasonably confident, finalize succinctly.
-
-        If the case provides OPTIONS (A-D), prefer selecting a final answer from those options when you are confident.
-
-        You can take one of three types of actions:
-        1. Ask a specific question about the patient's history or examination
-        2. Order a specific test or procedure
-        3. Make a final diagnosis (only if you're confident). If options A-D are present, pick ONE option as final.
-
-        Respond in one of the following formats:
-        - For questions: <question>Your specific question here</question>
-        - For tests: <test>Specific test name here</test>
-        - For diagnosis WITHOUT options: <diagnosis>Your diagnosis here</diagnosis>
-        - For diagnosis WITH options: <diagnosis_option>A</diagnosis_option> <diagnosis>The full text of the chosen option</diagnosis>
-
-        Be specific and clinical in your requests. Avoid vague or overly broad questions/tests.
-        """
-        
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=200,
-                temperature=0.3
-            )
-            
-            action_text = response.choices[0].message.content.strip()
-            return self._parse_action_text(action_text)
+            response = self.client.chat.completions.create(**self._action_request(context))
+            return self._action_from_message(response.choices[0].message)
             
         except Exception as e:
             print(f"Error generating action: {e}")
             # Fallback to random action
             return self._fallback_action()
     
-    def _parse_action_text(self, action_text: str) -> AgentAction:
-        """Parse action text into AgentAction object."""
-        import re
-        
-        # Look for diagnosis option + text
-        opt_match = re.search(r'<diagnosis_option>\s*([ABCD])\s*</diagnosis_option>', action_text, re.IGNORECASE)
-        diag_match = re.search(r'<diagnosis>(.*?)</diagnosis>', action_text, re.DOTALL)
-        if opt_match and diag_match:
-            choice = opt_match.group(1).upper()
-            diagnosis_text = diag_match.group(1).strip()
-            return AgentAction(
-                action_type=ActionType.DIAGNOSE,
-                content=f"Option {choice}: {diagnosis_text}"
-            )
-
-        # Look for question tags
-        question_match = re.search(r'<question>(.*?)</question>', action_text, re.DOTALL)
-        if question_match:
-            return AgentAction(
-                action_type=ActionType.ASK_QUESTIONS,
-                content=question_match.group(1).strip()
-            )
-        
-        # Look for test tags
-        test_match = re.search(r'<test>(.*?)</test>', action_text, re.DOTALL)
-        if test_match:
-            return AgentAction(
-                action_type=ActionType.REQUEST_TESTS,
-                content=test_match.group(1).strip()
+    def _action_request(self, context: str) -> dict:
+        if self.plan_size > 1:
+            return dict(
+                model=self.model,
+                messages=[{"role": "system", "content": LLM_AGENT_PLAN_PROMPT.format(plan_size=self.plan_size)},
+                          {"role": "user", "content": context}],
+                max_tokens=200 * self.plan_size,
+                temperature=0.3,
             )
-        
-        # Look for diagnosis tags
-        diagnosis_match = re.search(r'<diagnosis>(.*?)</diagnosis>', action_text, re.DOTALL)
-        if diagnosis_match:
-            return AgentAction(
-                action_type=ActionType.DIAGNOSE,
-                content=diagnosis_match.group(1).strip()
+        if self.config.LLM_AGENT_TOOL_CALLS:
+            # The arguments JSON is far shorter than free text around tags
+            return dict(
+                model=self.model,
+                messages=[{"role": "system", "content": LLM_AGENT_TOOL_PROMPT},
+                          {"role": "user", "content": context}],
+                tools=[LLM_AGENT_ACTION_TOOL],
+                tool_choice={"type": "function", "function": {"name": "take_action"}},
+                max_tokens=100,
+                temperature=0.3,
             )
-        
-        # If no tags found, treat as question
-        return AgentAction(
-            action_type=ActionType.ASK_QUESTIONS,
-            content=action_text.strip()
+        return dict(
+            model=self.model,
+            messages=[{"role": "system", "content": LLM_AGENT_ACTION_PROMPT},
+                      {"role": "user", "content": context}],
+            max_tokens=200,
+            temperature=0.3,
+        )
+    
+    def _final_request(self, context: str) -> dict:
+        return dict(
+            model=self.model,
+            messages=[{"role": "system", "content": LLM_AGENT_FINAL_PROMPT},
+                      {"role": "user", "content": context}],
+            max_tokens=150,
+            temperature=0.2,
         )
     
+    def _action_from_message(self, message) -> AgentAction:
+        # Providers that ignore tool_choice answer in text; the tag parser still reads that
+        if getattr(message, "tool_calls", None):
+            return _parse_tool_action(message.tool_calls[0].function.arguments)
+        text = (message.content or "").strip()
+        if self.plan_size > 1:
+            first, *rest = _parse_plan(text)[:self.plan_size]
+            self._plan.extend(rest)
+            return first
+        return self._parse_action_text(text)
+    
+    def _parse_action_text(self, action_text: str) -> AgentAction:
+        """Parse action text into AgentAction object."""
+        return _parse_action_text(action_text)
+    
     def _make_final_diagnosis(self, case_abstract: str, encounter_history: List[AgentAction]) -> AgentAction:
         """Make a final diagnosis when max actions reached."""
         context = self._build_context(case_abstract, encounter_history)
         
-        prompt = f"""
-        You are an expert diagnostic physician. Based on all available information, make your best diagnostic assessment.
-
-        {context}
-
-        If OPTIONS (A-D) are provided in the case context, you MUST choose exactly one option as the final answer.
-
-        Respond in one of the following formats:
-        - If options present: <diagnosis_option>[A-D]</diagnosis_option> <diagnosis>The full text of the chosen option</diagnosis>
-        - If no options present: <diagnosis>Your diagnosis here</diagnosis>
-        """
-        
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=150,
-                temperature=0.2
-            )
+            response = self.client.chat.completions.create(**self._final_request(context))
             
             action_text = response.choices[0].message.content.strip()
             return self._parse_action_text(action_text)
@@ -225,32 +602,47 @@ class LLMDiagnosticAgent(DiagnosticAgent):
         except Exception as e:
             print(f"Error making final diagnosis: {e}")
             return AgentAction(
-                action_type=ActionType.DIAGNOSE,
-                content="Unable to determine diagnosis with available information."
+                ActionType.DIAGNOSE,
+                "Unable to determine diagnosis with available information."
             )
     
     def _fallback_action(self) -> AgentAction:
         """Fallback action when LLM fails."""
-        fallback_questions = [
-            "What are the patient's vital signs?",
-            "What is the patient's medical history?",
-            "Are there any physical examination findings?",
-            "What medications is the patient taking?"
-        ]
-        
         return AgentAction(
-            action_type=ActionType.ASK_QUESTIONS,
-            content=random.choice(fallback_questions)
+            ActionType.ASK_QUESTIONS,
+            self._FALLBACK_QUESTIONS[random.randrange(len(self._FALLBACK_QUESTIONS))]
         )
     
     def reset(self) -> None:
         """Reset for new case."""
         self.actions_taken = 0
         self.diagnostic_hypotheses = []
+        self._history = io.StringIO()
+        self._last_history_len = 0
+        self._plan = deque()
+        self._last_abstract = None
 
 class ConservativeDiagnosticAgent(DiagnosticAgent):
     """A conservative diagnostic agent that asks many questions before testing."""
     
+    _QUESTIONS = (
+        "What is the patient's detailed medical history?",
+        "What are all the symptoms and their progression?",
+        "What medications and allergies does the patient have?",
+        "What are the complete vital signs?",
+        "What are all the physical examination findings?",
+        "Are there any recent exposures or travel?",
+        "What is the patient's family history?",
+        "Are there any associated symptoms or triggers?",
+    )
+    _TESTS = (
+        "Complete Blood Count with differential",
+        "Comprehensive Metabolic Panel",
+        "Chest X-ray",
+        "Basic metabolic panel",
+        "Urinalysis",
+    )
+    
     def __init__(self, name: str = "ConservativeAgent"):
         super().__init__(name)
         self.actions_taken = 0
@@ -267,8 +659,8 @@ class ConservativeDiagnosticAgent(DiagnosticAgent):
         # If we've taken too many actions, make a diagnosis
         if self.actions_taken >= self.max_total_actions:
             return AgentAction(
-                action_type=ActionType.DIAGNOSE,
-                content="Based on available information, I cannot make a definitive diagnosis."
+                ActionType.DIAGNOSE,
+                "Based on available information, I cannot make a definitive diagnosis."
             )
         
         # Prefer questions over tests
@@ -278,46 +670,27 @@ class ConservativeDiagnosticAgent(DiagnosticAgent):
             return self._order_test()
         else:
             return AgentAction(
-                action_type=ActionType.DIAGNOSE,
-                content="Based on available information, I cannot make a definitive diagnosis."
+                ActionType.DIAGNOSE,
+                "Based on available information, I cannot make a definitive diagnosis."
             )
     
     def _ask_question(self) -> AgentAction:
         """Ask a conservative question."""
         self.questions_asked += 1
         
-        questions = [
-            "What is the patient's detailed medical history?",
-            "What are all the symptoms and their progression?",
-            "What medications and allergies does the patient have?",
-            "What are the complete vital signs?",
-            "What are all the physical examination findings?",
-            "Are there any recent exposures or travel?",
-            "What is the patient's family history?",
-            "Are there any associated symptoms or triggers?"
-        ]
-        
-        question_index = min(self.questions_asked - 1, len(questions) - 1)
-        content = questions[question_index]
+        question_index = min(self.questions_asked - 1, len(self._QUESTIONS) - 1)
+        content = self._QUESTIONS[question_index]
         
-        return AgentAction(action_type=ActionType.ASK_QUESTIONS, content=content)
+        return AgentAction(ActionType.ASK_QUESTIONS, content)
     
     def _order_test(self) -> AgentAction:
         """Order a conservative test."""
         self.tests_ordered += 1
         
-        tests = [
-            "Complete Blood Count with differential",
-            "Comprehensive Metabolic Panel",
-            "Chest X-ray",
-            "Basic metabolic panel",
-            "Urinalysis"
-        ]
-        
-        test_index = min(self.tests_ordered - 1, len(tests) - 1)
-        content = tests[test_index]
+        test_index = min(self.tests_ordered - 1, len(self._TESTS) - 1)
+        content = self._TESTS[test_index]
         
-        return AgentAction(action_type=ActionType.REQUEST_TESTS, content=content)
+        return AgentAction(ActionType.REQUEST_TESTS, content)
     
     def reset(self) -> None:
         """Reset for new case."""
@@ -328,6 +701,21 @@ class ConservativeDiagnosticAgent(DiagnosticAgent):
 class AggressiveDiagnosticAgent(DiagnosticAgent):
     """An aggressive diagnostic agent that orders many tests quickly."""
     
+    _TESTS = (
+        "Complete Blood Count with differential",
+        "Comprehensive Metabolic Panel",
+        "Chest X-ray",
+        "CT scan of the chest with contrast",
+        "Blood cultures",
+        "Urinalysis",
+        "Electrocardiogram",
+        "Echocardiogram",
+        "Liver function tests",
+        "Thyroid function tests",
+        "CT scan of the abdomen with contrast",
+        "MRI of the brain",
+    )
+    
     def __init__(self, name: str = "AggressiveAgent"):
         super().__init__(name)
         self.actions_taken = 0
@@ -342,8 +730,8 @@ class AggressiveDiagnosticAgent(DiagnosticAgent):
         # If we've taken too many actions, make a diagnosis
         if self.actions_taken >= self.max_total_actions:
             return AgentAction(
-                action_type=ActionType.DIAGNOSE,
-                content="Based on available information, I cannot make a definitive diagnosis."
+                ActionType.DIAGNOSE,
+                "Based on available information, I cannot make a definitive diagnosis."
             )
         
         # Prefer tests over questions
@@ -351,33 +739,18 @@ class AggressiveDiagnosticAgent(DiagnosticAgent):
             return self._order_test()
         else:
             return AgentAction(
-                action_type=ActionType.DIAGNOSE,
-                content="Based on available information, I cannot make a definitive diagnosis."
+                ActionType.DIAGNOSE,
+                "Based on available information, I cannot make a definitive diagnosis."
             )
     
     def _order_test(self) -> AgentAction:
         """Order an aggressive test."""
         self.tests_ordered += 1
         
-        tests = [
-            "Complete Blood Count with differential",
-            "Comprehensive Metabolic Panel",
-            "Chest X-ray",
-            "CT scan of the chest with contrast",
-            "Blood cultures",
-            "Urinalysis",
-            "Electrocardiogram",
-            "Echocardiogram",
-            "Liver function tests",
-            "Thyroid function tests",
-            "CT scan of the abdomen with contrast",
-            "MRI of the brain"
-        ]
-        
-        test_index = min(self.tests_ordered - 1, len(tests) - 1)
-        content = tests[test_index]
+        test_index = min(self.tests_ordered - 1, len(self._TESTS) - 1)
+        content = self._TESTS[test_index]
         
-        return AgentAction(action_type=ActionType.REQUEST_TESTS, content=content)
+        return AgentAction(ActionType.REQUEST_TESTS, content)
     
     def reset(self) -> None:
         """Reset for new case."""
@@ -385,13 +758,142 @@ class AggressiveDiagnosticAgent(DiagnosticAgent):
         self.tests_ordered = 0
 
 
+class _ChecklistBatcher:
+    """Marshals Dr. Checklist prompts from concurrently running cases into one request.
+
+    The checklist only aggregates the panel's opinions for its own case, so prompts
+    from different cases (each on its own agent copy, see SDBench.run_benchmark_async)
+    can share a single chat request that returns one JSON object per case. The first
+    caller of a batch waits up to max_wait_sec for others; a full batch is sent at once.
+    Any case missing from the JSON reply falls back to its own single request.
+    """
+
+    FIELDS = ("approved_tests", "decision", "question", "diagnosis_option", "diagnosis")
+
+    def __init__(self, client, model: str, batch_size: int,
+                 call_single: Callable[[str], str], max_wait_sec: float = 0.5):
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+        self.call_single = call_single
+        self.max_wait_sec = max_wait_sec
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def submit(self, content: str) -> str:
+        future = Future()
+        with self._lock:
+            self._pending.append((content, future))
+            leader = len(self._pending) == 1
+            batch = self._take() if len(self._pending) >= self.batch_size else None
+        if batch:
+            self._run(batch)
+        elif leader:
+            time.sleep(self.max_wait_sec)
+            with self._lock:
+                batch = self._take()
+            if batch:
+                self._run(batch)
+        return future.result()
+
+    def _take(self) -> list:
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _run(self, batch: list) -> None:
+        replies = {}
+        if len(batch) > 1:
+            try:
+                replies = self._call_marshaled([content for content, _ in batch])
+            except Exception as e:
+                print(f"checklist batch error: {e}")
+        for i, (content, future) in enumerate(batch):
+            try:
+                future.set_result(replies[i] if i in replies else self.call_single(content))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _call_marshaled(self, contents: List[str]) -> dict:
+        cases = "\n\n".join(f'<case id="{i}">\n{content.strip()}\n</case>' for i, content in enumerate(contents))
+        prompt = f"""
+You are working on {len(contents)} independent cases. Apply your instructions to every case below separately.
+
+{cases}
+
+Instead of one <check> block, return ONLY a JSON array with exactly one object per case:
+[{{"case_id": 0, "approved_tests": "Test 1; Test 2", "decision": "question|test|diagnose", "question": "", "diagnosis_option": "", "diagnosis": ""}}]
+"""
+        response = chat_completion_with_retries(
+            client=self.client,
+            model=self.model,
+            messages=[{"role": "system", "content": ROLE_SYSTEM_PROMPTS['checklist']},
+                      {"role": "user", "content": prompt}],
+            max_retries=4,
+            retry_interval_sec=6,
+            max_tokens=250 * len(contents),
+            temperature=0.2,
+        )
+        text = response.choices[0].message.content.strip()
+        array = _JSON_ARRAY_RE.search(text)
+        items = json.loads(array.group(0)) if array else []
+        replies = {}
+        for item in items:
+            try:
+                idx = int(item.get("case_id"))
+            except (AttributeError, TypeError, ValueError):
+                continue
+            if 0 <= idx < len(contents):
+                replies[idx] = self._render_check_block(item)
+        return replies
+
+    def _render_check_block(self, item: dict) -> str:
+        """Render a JSON reply as the <check> block that _parse_check_block expects."""
+        lines = ["<check>"]
+        for field in self.FIELDS:
+            value = str(item.get(field) or "").strip()
+            if value:
+                lines.append(f"  <{field}>{value}</{field}>")
+        lines.append("</check>")
+        return "\n".join(lines)
+
+
 class MultiLLMDxOAgent(DiagnosticAgent):
     """Five-LLM MAI-DxO: each role is handled by its own (potentially different) model.
 
     Roles -> models (default to gatekeeper model if not provided):
       hypothesis_model, test_chooser_model, challenger_model, stewardship_model, checklist_model
+
+    checklist_batch_size > 1 marshals Dr. Checklist prompts of concurrently running
+    cases into one request (kept <= 8, larger batches grow latency).
+
+    skip_gated_rounds answers rounds before min_debate_rounds with the clarifying
+    question the diagnosis gate would substitute, without calling any role.
+
+    single_call_rounds runs the first N rounds as one request that plays all five
+    roles and returns the <check> block directly (as MAIDxOAgent does every round),
+    instead of five sequential role calls.
+
+    speculative_checklist starts Dr. Checklist as soon as the challenger replies,
+    guessing that stewardship approves the proposed tests unchanged; the result is
+    used only when the real prompt turns out identical. Speculation switches itself
+    off once the hit rate over SPECULATION_WARMUP attempts falls below one half.
+
+    Role calls run on a class-level pool, and at most MAX_IN_FLIGHT requests are
+    outstanding across all instances; RPM pacing stays with the rate limiter.
+    With Config.BATCH_MODE on the openai provider, role calls go through the Batch API
+    instead (utils.batch_queue);
+    SDBench.run_benchmark_async runs the cases in lockstep so each role stage is one
+    job for the whole sweep.
     """
 
+    GATED_QUESTION = "Please clarify key red flags and timeline; provide one specific question."
+    POOL_WORKERS = 10
+    SPECULATION_WARMUP = 10
+    MAX_IN_FLIGHT = 10
+    _executor = None
+    _pool_lock = threading.Lock()
+    _request_slots = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+
     def __init__(self,
                  name: str = "MAI-DxO(5xLLM)",
                  config: Config = None,
@@ -402,10 +904,14 @@ class MultiLLMDxOAgent(DiagnosticAgent):
                  test_chooser_model: str = None,
                  challenger_model: str = None,
                  stewardship_model: str = None,
-                 checklist_model: str = None):
+                 checklist_model: str = None,
+                 checklist_batch_size: int = 1,
+                 speculative_checklist: bool = False,
+                 skip_gated_rounds: bool = False,
+                 single_call_rounds: int = 0):
         super().__init__(name)
         self.config = config or Config()
-        self.client = self.config.get_openai_client()
+        self.client = self.config.openai_client
         base = self.config.GATEKEEPER_MODEL
         if model_for_all:
             self.models = {
@@ -423,11 +929,31 @@ class MultiLLMDxOAgent(DiagnosticAgent):
                 'stewardship': stewardship_model or base,
                 'checklist': checklist_model or base,
             }
+        # Single-call rounds produce the checklist's verdict, so they use its model
+        self.models['panel'] = self.models['checklist']
         self.actions_taken = 0
         self.max_actions = 20
         self.panel_trace = []
         self.debate_rounds = 0
         self.min_debate_rounds = 2  # require at least 2 debate rounds before allowing diagnosis
+        checklist_batch_size = max(1, min(checklist_batch_size, 8))
+        self.checklist_batcher = None
+        self.semantic_cache = semantic_cache_for(self.config)
+        self.batch_queue = batch_queue_for(self.config)
+        # The Batch API already groups requests, so batch mode skips the checklist batcher
+        if checklist_batch_size > 1 and self.batch_queue is None:
+            # Shared by the per-case copies made in SDBench.run_benchmark_async
+            self.checklist_batcher = _ChecklistBatcher(
+                self.client, self.models['checklist'], checklist_batch_size,
+                call_single=lambda content: self._call_role('checklist', content),
+            )
+        # Speculation needs a per-request call, so it is off with either kind of batching
+        self.speculative_checklist = (speculative_checklist and self.checklist_batcher is None
+                                      and self.batch_queue is None)
+        self.speculation_attempts = 0
+        self.speculation_hits = 0
+        self.skip_gated_rounds = skip_gated_rounds
+        self.single_call_rounds = single_call_rounds
 
     def reset(self) -> None:
         self.actions_taken = 0
@@ -435,145 +961,208 @@ class MultiLLMDxOAgent(DiagnosticAgent):
         self.debate_rounds = 0
 
     def get_next_action(self, case_abstract: str, encounter_history: List[AgentAction]) -> AgentAction:
+        return self.get_next_action_batch([(case_abstract, encounter_history)])[0]
+
+    def get_next_action_batch(self, cases: List[Tuple[str, List[AgentAction]]]) -> List[AgentAction]:
+        """Run one panel round for several (case_abstract, encounter_history) pairs at once.
+
+        Each role is submitted for every case before waiting on any of them, so the
+        panels overlap on the shared pool. The cases advance in lockstep: they share
+        this agent's round counter, so give each sweep its own agent.
+        """
         self.actions_taken += 1
         self.debate_rounds += 1
-        context = self._build_context(case_abstract, encounter_history)
+        if self.skip_gated_rounds and self.debate_rounds < self.min_debate_rounds:
+            return [AgentAction(ActionType.ASK_QUESTIONS, self.GATED_QUESTION)
+                    for _ in cases]
+        contexts = [self._build_context(abstract, history) for abstract, history in cases]
+        if self.debate_rounds <= self.single_call_rounds:
+            cks = self._gather([self._call_role_async('panel', self._hypothesis_prompt(), context)
+                                for context in contexts])
+            return [self._panel_action((ck,)) for ck in cks]
         # 1) Hypothesis
-        hyp = self._call_role('hypothesis', f"""
-You are Dr. Hypothesis. Maintain a probability-ranked top-3 differential diagnosis and briefly justify.
-
-{context}
-
-Round: {self.debate_rounds}
-Rule: Do NOT finalize diagnosis in round 1; focus on building a good differential.
-
-Return format:
-1) DxA: pA
-2) DxB: pB
-3) DxC: pC
-Notes: one sentence rationale.
-""")
+        hyps = self._gather([self._call_role_async('hypothesis', self._hypothesis_prompt(), context)
+                             for context in contexts])
         # 2) Test-Chooser
-        tc = self._call_role('test_chooser', f"""
-You are Dr. Test-Chooser. Given the case and hypotheses below, propose up to three tests that maximally discriminate.
-
-{context}
-
-Hypotheses:
-{hyp}
+        tcs = self._gather([self._call_role_async('test_chooser', self._test_chooser_prompt(hyp), context)
+                            for context, hyp in zip(contexts, hyps)])
+        # 3) Challenger
+        chs = self._gather([self._call_role_async('challenger', self._challenger_prompt(hyp, tc), context)
+                            for context, hyp, tc in zip(contexts, hyps, tcs)])
+        # 4) Stewardship
+        st_futures = [self._call_role_async('stewardship', self._stewardship_prompt(tc, ch), context)
+                      for context, tc, ch in zip(contexts, tcs, chs)]
+        speculative = [None] * len(contexts)
+        if self._speculation_enabled():
+            # Guess that stewardship approves the proposed tests as-is while it is still running
+            speculative = []
+            for context, tc in zip(contexts, tcs):
+                guess = self._checklist_prompt(tc)
+                speculative.append((guess, self._call_role_async('checklist', guess, context)))
+        sts = self._gather(st_futures)
+        # 5) Checklist
+        ck_futures = []
+        for context, st, spec in zip(contexts, sts, speculative):
+            ck_prompt = self._checklist_prompt(st)
+            if spec is not None:
+                self.speculation_attempts += 1
+                guess, spec_future = spec
+                if guess == ck_prompt:
+                    self.speculation_hits += 1
+                    ck_futures.append(spec_future)
+                    continue
+                spec_future.cancel()
+            if self.checklist_batcher:
+                ck_futures.append(self._pool().submit(self.checklist_batcher.submit, f"{context}\n{ck_prompt}"))
+            else:
+                ck_futures.append(self._call_role_async('checklist', ck_prompt, context))
+        cks = self._gather(ck_futures)
+
+        return [self._panel_action(panel) for panel in zip(hyps, tcs, chs, sts, cks)]
+
+    def _panel_action(self, panel: tuple) -> AgentAction:
+        self.panel_trace = list(panel)
+        act = self._parse_check_block(panel[-1])
+        # Enforce minimum debate rounds before diagnosing
+        if act.action_type == ActionType.DIAGNOSE and self.debate_rounds < self.min_debate_rounds:
+            # Convert to a clarifying question sourced from challenger/checklist signal
+            act = AgentAction(ActionType.ASK_QUESTIONS, self.GATED_QUESTION)
+        return act
 
-Round: {self.debate_rounds}
-Rule: On round 1, prefer questions or low-cost, high-yield tests; do NOT finalize diagnosis.
+    def _hypothesis_prompt(self) -> str:
+        return f"Round: {self.debate_rounds}"
 
-Return format as bullet list (<=3):
-- Test 1
-- Test 2
-- Test 3
-""")
-        # 3) Challenger
-        ch = self._call_role('challenger', f"""
-You are Dr. Challenger. Identify potential anchoring bias or contradictions; propose one falsifying test if applicable.
+    def _test_chooser_prompt(self, hypotheses: str) -> str:
+        return f"""Hypotheses:
+{hypotheses}
 
-{context}
+Round: {self.debate_rounds}"""
 
-Hypotheses:
-{hyp}
+    @staticmethod
+    def _challenger_prompt(hypotheses: str, proposed_tests: str) -> str:
+        return f"""Hypotheses:
+{hypotheses}
 Proposed tests:
-{tc}
-
-Return 2-4 bullet points.
-""")
-        # 4) Stewardship
-        st = self._call_role('stewardship', f"""
-You are Dr. Stewardship. Ensure cost-conscious care; suggest cheaper equivalents for proposed tests and veto low-yield options.
+{proposed_tests}"""
 
-{context}
-Tests proposed:
-{tc}
+    @staticmethod
+    def _stewardship_prompt(proposed_tests: str, challenger_notes: str) -> str:
+        return f"""Tests proposed:
+{proposed_tests}
 Challenger notes:
-{ch}
+{challenger_notes}"""
 
-Return a final approved test list (<=3), one per line. If equally good cheaper alternatives exist, use the cheaper names.
-""")
-        # 5) Checklist
-        ck = self._call_role('checklist', f"""
-You are Dr. Checklist. Validate test names are specific and billable; ensure internal consistency. If options (A-D) exist in the abstract/context and confidence is high, you may suggest a single choice.
+    def _checklist_prompt(self, approved_tests: str) -> str:
+        return f"""Final approved tests:
+{approved_tests}
 
-{context}
-Final approved tests:
-{st}
+Round: {self.debate_rounds}"""
 
-Round: {self.debate_rounds}
-Constraint: Do NOT choose the diagnose action in round 1. Choose question or test.
-
-Return EXACTLY this block (missing fields empty if not used):
-<check>
-  <approved_tests>Test 1; Test 2; Test 3</approved_tests>
-  <decision>question|test|diagnose</decision>
-  <question>...</question>
-  <diagnosis_option>A</diagnosis_option>
-  <diagnosis>Text</diagnosis>
-</check>
-""")
-        self.panel_trace = [hyp, tc, ch, st, ck]
-        act = self._parse_check_block(ck)
-        # Enforce minimum debate rounds before diagnosing
-        if act.action_type == ActionType.DIAGNOSE and self.debate_rounds < self.min_debate_rounds:
-            # Convert to a clarifying question sourced from challenger/checklist signal
-            followup_q = "Please clarify key red flags and timeline; provide one specific question."
-            return AgentAction(action_type=ActionType.ASK_QUESTIONS, content=followup_q)
-        return act
+    def _speculation_enabled(self) -> bool:
+        if not self.speculative_checklist:
+            return False
+        if (self.speculation_attempts >= self.SPECULATION_WARMUP
+                and self.speculation_hits * 2 < self.speculation_attempts):
+            print(f"{self.name}: disabling speculative checklist "
+                  f"({self.speculation_hits}/{self.speculation_attempts} hits)")
+            self.speculative_checklist = False
+            return False
+        return True
 
     def _build_context(self, case_abstract: str, encounter_history: List[AgentAction]) -> str:
-        ctx = f"Case Abstract: {case_abstract}\n\n"
+        parts = [f"Case Abstract: {case_abstract}\n\n"]
         if encounter_history:
-            ctx += "Encounter History:\n"
-            for i, action in enumerate(encounter_history, 1):
-                ctx += f"{i}. {action.action_type.value}: {action.content}\n"
-        return ctx
-
-    def _call_role(self, role_key: str, content: str) -> str:
+            parts.append("Encounter History:\n")
+            parts.extend(f"{i}. {action.action_type.value}: {action.content}\n"
+                         for i, action in enumerate(encounter_history, 1))
+        return "".join(parts)
+
+    @classmethod
+    def _pool(cls) -> ThreadPoolExecutor:
+        """Executor shared by every instance (and per-case copy) for role calls."""
+        with cls._pool_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=cls.POOL_WORKERS,
+                                                   thread_name_prefix="dxo-role")
+            return cls._executor
+
+    def _gather(self, futures: List[Future]) -> List[str]:
+        if self.batch_queue is not None:
+            return self.batch_queue.wait(futures)
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _role_messages(role_key: str, context: str, content: str) -> List[Dict[str, str]]:
+        # Shared system message and case context first, role instructions last, so all
+        # five roles (and later rounds, whose history only grows) hit the provider's
+        # prefix cache for everything up to the role-specific tail
+        messages = [{"role": "system", "content": PANEL_MEMBER_PREAMBLE}]
+        if context:
+            messages.append({"role": "user", "content": context})
+        messages.append({"role": "user", "content": f"{ROLE_SYSTEM_PROMPTS[role_key]}\n\n{content}"})
+        return messages
+
+    def _role_cache(self, context: str) -> Optional[SemanticCache]:
+        # Replies are only reused within one case context; calls without one (the
+        # checklist batcher's per-request fallback) skip the cache
+        return self.semantic_cache if context else None
+
+    def _call_role_async(self, role_key: str, content: str, context: str = "") -> Future:
+        if self.batch_queue is None:
+            return self._pool().submit(self._call_role, role_key, content, context)
+        # Batch mode: queue the request; _gather sends the whole stage as one batch
+        model = self.models[role_key]
+        system_prompt = ROLE_SYSTEM_PROMPTS[role_key]
+        cache = self._role_cache(context)
+        if cache is not None:
+            cached = cache.get(role_key, model, system_prompt, content, temperature=0.2, scope=context)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+        future = self.batch_queue.submit(
+            model,
+            self._role_messages(role_key, context, content),
+            max_tokens=ROLE_MAX_TOKENS[role_key],
+            temperature=0.2,
+        )
+        if cache is not None:
+            future.add_done_callback(
+                lambda f: cache.put(role_key, model, system_prompt, content, f.result(), temperature=0.2,
+                                    scope=context))
+        return future
+
+    def _call_role(self, role_key: str, content: str, context: str = "") -> str:
+        if self.batch_queue is not None:
+            return self._gather([self._call_role_async(role_key, content, context)])[0]
+        model = self.models[role_key]
+        system_prompt = ROLE_SYSTEM_PROMPTS[role_key]
+        cache = self._role_cache(context)
+        if cache is not None:
+            cached = cache.get(role_key, model, system_prompt, content, temperature=0.2, scope=context)
+            if cached is not None:
+                return cached
         try:
-            response = chat_completion_with_retries(
-                client=self.client,
-                model=self.models[role_key],
-                messages=[{"role": "user", "content": content}],
-                max_retries=4,
-                retry_interval_sec=6,
-                max_tokens=500,
-                temperature=0.2,
-            )
-            return response.choices[0].message.content.strip()
+            with self._request_slots:
+                response = chat_completion_with_retries(
+                    client=self.client,
+                    model=model,
+                    messages=self._role_messages(role_key, context, content),
+                    max_retries=4,
+                    retry_interval_sec=6,
+                    max_tokens=ROLE_MAX_TOKENS[role_key],
+                    temperature=0.2,
+                )
+            text = response.choices[0].message.content.strip()
+            if cache is not None:
+                cache.put(role_key, model, system_prompt, content, text, temperature=0.2, scope=context)
+            return text
         except Exception as e:
             print(f"{role_key} role error: {e}")
             return ""
 
     def _parse_check_block(self, text: str) -> AgentAction:
-        import re
-        decision = re.search(r"<decision>\s*(question|test|diagnose)\s*</decision>", text, re.IGNORECASE)
-        decision = decision.group(1).lower() if decision else "question"
-
-        if decision == "question":
-            q = re.search(r"<question>(.*?)</question>", text, re.DOTALL)
-            content = q.group(1).strip() if q else "Could you clarify your key symptoms and timeline?"
-            return AgentAction(action_type=ActionType.ASK_QUESTIONS, content=content)
-
-        if decision == "test":
-            t = re.search(r"<approved_tests>(.*?)</approved_tests>", text, re.DOTALL)
-            tests = (t.group(1).strip() if t else "")
-            first = tests.split(";")[0].strip() if tests else "Complete Blood Count with differential"
-            return AgentAction(action_type=ActionType.REQUEST_TESTS, content=first)
-
-        if decision == "diagnose":
-            opt = re.search(r"<diagnosis_option>\s*([ABCD])\s*</diagnosis_option>", text, re.IGNORECASE)
-            diag = re.search(r"<diagnosis>(.*?)</diagnosis>", text, re.DOTALL)
-            if opt and diag:
-                return AgentAction(action_type=ActionType.DIAGNOSE, content=f"Option {opt.group(1).upper()}: {diag.group(1).strip()}")
-            if diag:
-                return AgentAction(action_type=ActionType.DIAGNOSE, content=diag.group(1).strip())
-            return AgentAction(action_type=ActionType.DIAGNOSE, content="Unable to determine.")
-
-        return AgentAction(action_type=ActionType.ASK_QUESTIONS, content="Please provide more history about onset, progression, and associated symptoms.")
+        return _parse_check_block(text)
 
 
 class MAIDxOAgent(DiagnosticAgent):
@@ -592,164 +1181,125 @@ class MAIDxOAgent(DiagnosticAgent):
     def __init__(self, name: str = "MAI-DxO", config: Config = None):
         super().__init__(name)
         self.config = config or Config()
-        self.client = self.config.get_openai_client()
+        self.client = self.config.openai_client
         self.model = self.config.GATEKEEPER_MODEL
         self.actions_taken = 0
         self.max_actions = 20
         self.panel_memory = ""
         self.panel_rounds = []
         self.running_cost_estimate = 0.0
+        self._history = io.StringIO()
+        self._last_history_len = 0
+        self.semantic_cache = semantic_cache_for(self.config)
+        self.batch_queue = batch_queue_for(self.config)
 
     def get_next_action(self, case_abstract: str, encounter_history: List[AgentAction]) -> AgentAction:
         self.actions_taken += 1
         context = self._build_context(case_abstract, encounter_history)
-        force_diag = (self.actions_taken >= self.max_actions - 1)
-        proposal = self._panel_deliberation(context, force_diagnose=force_diag)
+        if self.actions_taken >= self.max_actions - 1:
+            # At the cap only a diagnosis is accepted, so ask for it directly instead of
+            # running the full panel first (mirrors LLMDiagnosticAgent)
+            return self._force_final_diagnosis_maidxo(context)
+        proposal = self._panel_deliberation(context)
         try:
             self.panel_rounds.append(proposal)
         except Exception:
             pass
-        act = self._parse_panel_output(proposal)
-        if act.action_type != ActionType.DIAGNOSE and self.actions_taken >= self.max_actions - 1:
-            return self._force_final_diagnosis_maidxo(context)
-        return act
+        return self._parse_panel_output(proposal)
 
     def reset(self) -> None:
         self.actions_taken = 0
         self.panel_memory = ""
         self.panel_rounds = []
         self.running_cost_estimate = 0.0
+        self._history = io.StringIO()
+        self._last_history_len = 0
 
     def _build_context(self, case_abstract: str, encounter_history: List[AgentAction]) -> str:
-        context = f"Case Abstract: {case_abstract}\n\n"
+        parts = [f"Case Abstract: {case_abstract}\n\n"]
+        # Render only actions added since the last turn (history is append-only within a case)
+        if len(encounter_history) < self._last_history_len:
+            self._history = io.StringIO()
+            self._last_history_len = 0
+        for i, action in enumerate(encounter_history[self._last_history_len:], self._last_history_len + 1):
+            self._history.write(f"{i}. {action.action_type.value}: {action.content}\n")
+        self._last_history_len = len(encounter_history)
         if encounter_history:
-            context += "Encounter History:\n"
-            for i, action in enumerate(encounter_history, 1):
-                context += f"{i}. {action.action_type.value}: {action.content}\n"
+            parts += ("Encounter History:\n", self._history.getvalue())
         if self.panel_memory:
-            context += f"\nPanel Notes (memory):\n{self.panel_memory}\n"
-        return context
-
-    def _panel_deliberation(self, context: str, force_diagnose: bool = False) -> str:
-        prompt = f"""
-You are a virtual panel of five doctors collaborating on diagnosis. Follow roles and emit a structured plan.
-
-{context}
-
-Panel roles:
-- Dr. Hypothesis: Maintain top-3 differential with probabilities (Bayesian update after new info).
-- Dr. Test-Chooser: Propose up to 3 tests that maximally discriminate between leading hypotheses.
-- Dr. Challenger: Point out anchoring bias, contradictory evidence, and propose tests to falsify.
-- Dr. Stewardship: Ensure cost-consciousness; suggest cheaper but equivalent alternatives; veto low-yield expensive tests.
-- Dr. Checklist: Validate test names are specific and billable; enforce output schema; ensure internal consistency.
-
-Iterative policy (soft guidance):
-- Prefer asking a few (e.g., 3–8) targeted, high-yield questions/tests before committing.
-- Prioritize clarifying red flags, key differentials, and decisive tests.
-- When reasonably confident, finalize succinctly.
-
-Chain of Debate (keep concise):
-1) Hypothesis update (top3 with probabilities summing to 1.0)
-2) Test-Chooser proposal (<=3 tests)
-3) Challenger critique
-4) Stewardship adjustments (cost-aware)
-5) Checklist validation
-
-Decision rule:
-- If reasonably confident AND options (A-D) exist, pick ONE option.
-- Else if not confident, choose to ask an informative question OR order <=3 decisive tests.
-{'- On this round you MUST finalize with a diagnose action (choose ONE option if present).' if force_diagnose else ''}
-
-Return EXACTLY this schema (no extra text):
-<panel>
-  <hypotheses>
-    1) DxA: pA
-    2) DxB: pB
-    3) DxC: pC
-  </hypotheses>
-  <tests>
-    - Test 1
-    - Test 2
-    - Test 3
-  </tests>
-  <decision>
-    <action>question|test|diagnose</action>
-    <question>...</question>
-    <ordered_tests>Test 1; Test 2</ordered_tests>
-    <diagnosis_option>A</diagnosis_option>
-    <diagnosis>Full text of the chosen option or final dx</diagnosis>
-  </decision>
-  <notes>1-2 line rationale</notes>
-</panel>
-"""
+            parts.append(f"\nPanel Notes (memory):\n{self.panel_memory}\n")
+        return "".join(parts)
+
+    def _panel_deliberation(self, context: str) -> str:
+        cache = self.semantic_cache
+        if cache is not None:
+            cached = cache.get('panel', self.model, MAIDXO_PANEL_SYSTEM_PROMPT, context, temperature=0.2,
+                               scope=context)
+            if cached is not None:
+                return cached
+        messages = [{"role": "system", "content": MAIDXO_PANEL_SYSTEM_PROMPT},
+                    {"role": "user", "content": context}]
+        if self.batch_queue is not None:
+            # Concurrently running cases that queue before the flush share one batch
+            text = self.batch_queue.wait([
+                self.batch_queue.submit(self.model, messages, max_tokens=PANEL_MAX_TOKENS, temperature=0.2)
+            ])[0]
+            if cache is not None:
+                cache.put('panel', self.model, MAIDXO_PANEL_SYSTEM_PROMPT, context, text, temperature=0.2,
+                          scope=context)
+            return text
         try:
             response = chat_completion_with_retries(
                 client=self.client,
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=messages,
                 max_retries=5,
                 retry_interval_sec=8,
-                max_tokens=600,
+                max_tokens=PANEL_MAX_TOKENS,
                 temperature=0.2,
             )
-            return response.choices[0].message.content.strip()
+            text = response.choices[0].message.content.strip()
+            if cache is not None:
+                cache.put('panel', self.model, MAIDXO_PANEL_SYSTEM_PROMPT, context, text, temperature=0.2,
+                          scope=context)
+            return text
         except Exception as e:
             print(f"MAI-DxO deliberation error: {e}")
             return ""
 
     def _parse_panel_output(self, text: str) -> AgentAction:
-        import re
-        mnotes = re.search(r"<notes>(.*?)</notes>", text, re.DOTALL)
-        if mnotes:
-            note = mnotes.group(1).strip()
+        tags = _scan_tags(text)
+        if 'notes' in tags:
+            note = tags['notes'].strip()
             self.panel_memory = (self.panel_memory + "\n" + note).strip() if self.panel_memory else note
 
-        action_match = re.search(r"<action>\s*(question|test|diagnose)\s*</action>", text, re.IGNORECASE)
-        action = action_match.group(1).lower() if action_match else "question"
+        action = tags.get('action', '').strip().lower()
+        if action not in _DECISIONS:
+            action = "question"
 
         if action == "question":
-            q = re.search(r"<question>(.*?)</question>", text, re.DOTALL)
-            content = (q.group(1).strip() if q else "Could you clarify your key symptoms and their timeline?")
-            return AgentAction(action_type=ActionType.ASK_QUESTIONS, content=content)
+            q = tags.get('question')
+            content = (q.strip() if q is not None else "Could you clarify your key symptoms and their timeline?")
+            return AgentAction(ActionType.ASK_QUESTIONS, content)
 
         if action == "test":
-            t = re.search(r"<ordered_tests>(.*?)</ordered_tests>", text, re.DOTALL)
-            tests = (t.group(1).strip() if t else "")
-            first = tests.split(";")[0].strip() if tests else "Complete Blood Count with differential"
-            return AgentAction(action_type=ActionType.REQUEST_TESTS, content=first)
+            tests = tags.get('ordered_tests', '').strip()
+            first = tests.partition(";")[0].strip() if tests else "Complete Blood Count with differential"
+            return AgentAction(ActionType.REQUEST_TESTS, first)
 
         if action == "diagnose":
-            opt = re.search(r"<diagnosis_option>\s*([ABCD])\s*</diagnosis_option>", text, re.IGNORECASE)
-            diag = re.search(r"<diagnosis>(.*?)</diagnosis>", text, re.DOTALL)
-            if opt and diag:
-                return AgentAction(action_type=ActionType.DIAGNOSE, content=f"Option {opt.group(1).upper()}: {diag.group(1).strip()}")
-            if diag:
-                return AgentAction(action_type=ActionType.DIAGNOSE, content=diag.group(1).strip())
-            return AgentAction(action_type=ActionType.DIAGNOSE, content="Unable to determine.")
+            return _diagnose_from_tags(tags)
 
-        return AgentAction(action_type=ActionType.ASK_QUESTIONS, content="Can you provide further details on onset, progression, and associated symptoms?")
+        return AgentAction(ActionType.ASK_QUESTIONS, "Can you provide further details on onset, progression, and associated symptoms?")
 
     def _force_final_diagnosis_maidxo(self, context: str) -> AgentAction:
         """Force the panel to output a mandatory final diagnosis (choose option if present)."""
-        content = f"""
-You MUST finalize the diagnosis now. If OPTIONS (A-D) are present, choose exactly ONE as the final answer.
-
-{context}
-
-Return EXACTLY this block:
-<panel>
-  <decision>
-    <action>diagnose</action>
-    <diagnosis_option>A</diagnosis_option>
-    <diagnosis>Full text of the chosen option or final dx</diagnosis>
-  </decision>
-</panel>
-"""
         try:
             response = chat_completion_with_retries(
                 client=self.client,
                 model=self.model,
-                messages=[{"role": "user", "content": content}],
+                messages=[{"role": "system", "content": MAIDXO_FORCE_FINAL_PROMPT},
+                          {"role": "user", "content": context}],
                 max_retries=4,
                 retry_interval_sec=6,
                 max_tokens=300,
@@ -757,13 +1307,6 @@ Return EXACTLY this block:
             )
             text = response.choices[0].message.content.strip()
             # Reuse existing parse for diagnose branch
-            import re
-            diag = re.search(r"<diagnosis>(.*?)</diagnosis>", text, re.DOTALL)
-            opt = re.search(r"<diagnosis_option>\s*([ABCD])\s*</diagnosis_option>", text, re.IGNORECASE)
-            if opt and diag:
-                return AgentAction(action_type=ActionType.DIAGNOSE, content=f"Option {opt.group(1).upper()}: {diag.group(1).strip()}")
-            if diag:
-                return AgentAction(action_type=ActionType.DIAGNOSE, content=diag.group(1).strip())
-            return AgentAction(action_type=ActionType.DIAGNOSE, content="Unable to determine.")
+            return _diagnose_from_tags(_scan_tags(text))
         except Exception:
-            return AgentAction(action_type=ActionType.DIAGNOSE, content="Unable to determine.")
+            return AgentAction(ActionType.DIAGNOSE, "Unable to determine.")
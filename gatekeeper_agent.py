@@ -1,237 +1,271 @@
 """Gatekeeper Agent implementation for SDBench."""
 
 import re
+import threading
+from collections import OrderedDict
 from typing import List, Optional, Tuple
 from data_models import CaseFile, AgentAction, GatekeeperResponse, ActionType
 from config import Config
+from utils.case_index import CaseIndex
 from utils.llm_client import chat_completion_with_retries
+from utils.synthetic_cache import synthetic_cache_for
+
+# Tagged replies of the combined lookup-or-generate prompt
+_EXPLICIT_RE = re.compile(r"<explicit>(.*?)</explicit>", re.DOTALL)
+_SYNTHETIC_RE = re.compile(r"<synthetic>(.*?)</synthetic>", re.DOTALL)
+_NON_WORD_RE = re.compile(r"\W+")
+
+# Requests validate_request turns away, matched case-insensitively as substrings
+_BROAD_QUESTION_RE = re.compile("|".join(map(re.escape, (
+    "tell me everything", "what's wrong", "what should I do",
+    "give me all information", "summarize the case",
+))), re.IGNORECASE)
+_VAGUE_TEST_RE = re.compile("|".join(map(re.escape, (
+    "run blood work", "do some imaging", "order labs",
+    "get tests", "run diagnostics",
+))), re.IGNORECASE)
+
+# Case text kept in the gatekeeper's system prefix; sentences past it are retrieved per request
+_CASE_TEXT_CHARS = 3000
+_OVERFLOW_PASSAGES = 3
+
+# A case sentence covering this share of a test's terms counts as reporting that test
+_MENTION_COVERAGE = 0.5
+
+# Explicit excerpts remembered per GatekeeperAgent (least recently used dropped first)
+_EXPLICIT_CACHE_SIZE = 4096
+
+# Invariant part of the gatekeeper's system message. The case block follows it and the
+# question/test request goes last, so all turns of a case share one cacheable prefix.
+GATEKEEPER_SYSTEM_PROMPT = """You are a medical information oracle. Given the clinical case below and a specific question or test request, answer it from the case text when the answer is explicitly stated there; otherwise generate a plausible, synthetic answer that is consistent with the patient's overall clinical picture and the final diagnosis."""
+
+def _normalize_request(text: str) -> str:
+    """Lower-case and collapse punctuation/whitespace so trivially different phrasings share a key."""
+    return _NON_WORD_RE.sub(" ", text.lower()).strip()
+
+
+
+def _split_case_text(text: str, limit: int) -> Tuple[str, str]:
+    """Split before the last sentence (or word) boundary within limit characters."""
+    if len(text) <= limit:
+        return text, ""
+    cut = max(text.rfind(". ", 0, limit), text.rfind("\n", 0, limit))
+    if cut > 0:
+        cut += 1
+    else:
+        cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+    return text[:cut].rstrip(), text[cut:].strip()
+
 
 class GatekeeperAgent:
     """The Gatekeeper Agent serves as the information oracle for patient cases."""
     
     def __init__(self, config: Config):
         self.config = config
-        self.client = config.get_openai_client()
+        self.client = config.openai_client
         self.model = config.GATEKEEPER_MODEL
+        self.extract_model = config.EXTRACTOR_MODEL or config.GATEKEEPER_MODEL
+        self._prefixes = {}
+        self._indexes = {}
+        self._overflow = {}
+        self._explicit_answers: OrderedDict = OrderedDict()
+        self._explicit_lock = threading.Lock()
+        self.synthetic_cache = synthetic_cache_for(config)
     
     def process_action(self, action: AgentAction, case_file: CaseFile) -> GatekeeperResponse:
-        """Process an action from the diagnostic agent and return a response."""
-        if action.action_type == ActionType.ASK_QUESTIONS:
-            return self._handle_question(action.content, case_file)
-        elif action.action_type == ActionType.REQUEST_TESTS:
-            return self._handle_test_request(action.content, case_file)
-        else:
+        """Process an action from the diagnostic agent and return a response.
+
+        Excerpts found in the case text are remembered per (case, action type,
+        normalised request), so a repeated question or test skips the LLM call.
+        """
+        key, response = self._known_answer(action, case_file)
+        if response is None:
+            request, unavailable = self._request_prompt(action)
+            response = self._answer_or_synthesize(case_file, request, unavailable)
+            self._remember(key, action, case_file, response, unavailable)
+        return response
+    
+    def _known_answer(self, action: AgentAction, case_file: CaseFile) -> Tuple[tuple, Optional[GatekeeperResponse]]:
+        """Cache key for the action, and its answer if one is available without the LLM."""
+        if action.action_type not in (ActionType.ASK_QUESTIONS, ActionType.REQUEST_TESTS):
             raise ValueError(f"Gatekeeper cannot process action type: {action.action_type}")
+        key = (case_file.case_id, action.action_type, _normalize_request(action.content))
+        with self._explicit_lock:
+            excerpt = self._explicit_answers.get(key)
+            if excerpt is not None:
+                self._explicit_answers.move_to_end(key)
+        if excerpt is None and self.config.GATEKEEPER_LOCAL_RETRIEVAL:
+            excerpt = self._local_excerpt(action.content, case_file)
+            if excerpt is not None:
+                self._remember(key, action, case_file, GatekeeperResponse(response_text=excerpt, is_synthetic=False))
+        if excerpt is not None:
+            return key, GatekeeperResponse(response_text=excerpt, is_synthetic=False)
+        synthetic_key = self._synthetic_key(action, case_file)
+        result = self.synthetic_cache.get(*synthetic_key) if synthetic_key else None
+        if result is None:
+            return key, None
+        return key, GatekeeperResponse(response_text=result, is_synthetic=True)
     
-    def _handle_question(self, question: str, case_file: CaseFile) -> GatekeeperResponse:
-        """Handle a question from the diagnostic agent."""
-        # Check if the answer is explicitly in the case file
-        answer = self._extract_explicit_answer(question, case_file.full_case_text)
-        
-        if answer:
-            return GatekeeperResponse(
-                response_text=answer,
-                is_synthetic=False
-            )
-        else:
-            # Generate synthetic answer
-            synthetic_answer = self._generate_synthetic_answer(question, case_file)
-            return GatekeeperResponse(
-                response_text=synthetic_answer,
-                is_synthetic=True
-            )
+    def _remember(self, key: tuple, action: AgentAction, case_file: CaseFile,
+                  response: GatekeeperResponse, unavailable: str = "") -> None:
+        if not response.is_synthetic:
+            with self._explicit_lock:
+                self._explicit_answers[key] = response.response_text
+                if len(self._explicit_answers) > _EXPLICIT_CACHE_SIZE:
+                    self._explicit_answers.popitem(last=False)
+        elif response.response_text != unavailable:
+            synthetic_key = self._synthetic_key(action, case_file)
+            if synthetic_key:
+                self.synthetic_cache.put(*synthetic_key, response.response_text)
     
-    def _handle_test_request(self, test_request: str, case_file: CaseFile) -> GatekeeperResponse:
-        """Handle a test request from the diagnostic agent."""
-        # Check if the test result is explicitly in the case file
-        result = self._extract_explicit_test_result(test_request, case_file.full_case_text)
-        
-        if result:
-            return GatekeeperResponse(
-                response_text=result,
-                is_synthetic=False
-            )
-        else:
-            # Generate synthetic test result
-            synthetic_result = self._generate_synthetic_test_result(test_request, case_file)
-            return GatekeeperResponse(
-                response_text=synthetic_result,
-                is_synthetic=True
-            )
-    
-    def _extract_explicit_answer(self, question: str, case_text: str) -> Optional[str]:
-        """Extract explicit answer from case text if available."""
-        # Use LLM to determine if the answer is explicitly available
-        prompt = f"""
-        You are a medical information extractor. Given a clinical case text and a specific question, determine if the answer is explicitly stated in the case text.
-        
-        Question: {question}
-        
-        Case Text: {case_text[:2000]}...
-        
-        If the answer is explicitly stated, provide ONLY the relevant excerpt from the case text. If not explicitly stated, respond with "NOT_EXPLICIT".
-        
-        Response:
+    def _synthetic_key(self, action: AgentAction, case_file: CaseFile) -> Optional[tuple]:
+        """(model, diagnosis, test) key shared across cases for synthetic test results.
+
+        None when the cache is off, for questions, and when the case text itself
+        mentions the test (its result there may differ from other cases').
         """
-        
-        try:
-            response = chat_completion_with_retries(
-                client=self.client,
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_retries=5,
-                retry_interval_sec=8,
-                max_tokens=500,
-                temperature=0.1,
-            )
-            
-            answer = response.choices[0].message.content.strip()
-            if answer == "NOT_EXPLICIT":
-                return None
-            return answer
-        except Exception as e:
-            print("Error extracting explicit answer:")
-            print(f"  ErrorType: {type(e).__name__}")
-            print(f"  ErrorRepr: {e!r}")
+        if (self.synthetic_cache is None or action.action_type != ActionType.REQUEST_TESTS
+                or self._case_mentions(action.content, case_file)):
             return None
+        return (self.model, _normalize_request(case_file.ground_truth_diagnosis),
+                _normalize_request(action.content))
     
-    def _extract_explicit_test_result(self, test_request: str, case_text: str) -> Optional[str]:
-        """Extract explicit test result from case text if available."""
-        # Use LLM to determine if the test result is explicitly available
-        prompt = f"""
-        You are a medical information extractor. Given a clinical case text and a specific test request, determine if the test result is explicitly stated in the case text.
-        
-        Test Request: {test_request}
-        
-        Case Text: {case_text[:2000]}...
-        
-        If the test result is explicitly stated, provide ONLY the relevant excerpt from the case text. If not explicitly stated, respond with "NOT_EXPLICIT".
-        
-        Response:
-        """
-        
-        try:
-            response = chat_completion_with_retries(
-                client=self.client,
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_retries=5,
-                retry_interval_sec=8,
-                max_tokens=500,
-                temperature=0.1,
-            )
-            
-            result = response.choices[0].message.content.strip()
-            if result == "NOT_EXPLICIT":
-                return None
-            return result
-        except Exception as e:
-            print("Error extracting explicit test result:")
-            print(f"  ErrorType: {type(e).__name__}")
-            print(f"  ErrorRepr: {e!r}")
+    def _case_mentions(self, request: str, case_file: CaseFile) -> bool:
+        index = self._case_index(case_file)
+        return any(index.coverage(request, i) >= _MENTION_COVERAGE for _, i in index.search(request, 1))
+    
+    def _case_index(self, case_file: CaseFile) -> CaseIndex:
+        index = self._indexes.get(case_file.case_id)
+        if index is None:
+            index = CaseIndex.from_text(case_file.full_case_text)
+            self._indexes[case_file.case_id] = index
+        return index
+    
+    def _local_excerpt(self, request: str, case_file: CaseFile, k: int = 2) -> Optional[str]:
+        """Sentences from the case text that cover the request, or None to ask the LLM."""
+        index = self._case_index(case_file)
+        threshold = self.config.GATEKEEPER_RETRIEVAL_THRESHOLD
+        hits = sorted(i for _, i in index.search(request, k) if index.coverage(request, i) >= threshold)
+        if not hits:
             return None
+        return " ".join(index.passages[i] for i in hits)
     
-    def _generate_synthetic_answer(self, question: str, case_file: CaseFile) -> str:
-        """Generate a synthetic answer that's consistent with the case."""
-        prompt = f"""
-        You are a medical information oracle. Generate a plausible, synthetic answer to a clinical question that is consistent with the patient's overall clinical picture and the final diagnosis.
-        
-        Question: {question}
-        
-        Case Context:
-        Initial Abstract: {case_file.initial_abstract}
-        
-        Full Case Text: {case_file.full_case_text[:3000]}...
-        
-        Final Diagnosis: {case_file.ground_truth_diagnosis}
-        
-        Generate a realistic, objective clinical finding that would be consistent with this patient's presentation and final diagnosis. Do not provide diagnostic interpretations or hints. Only provide the objective finding as if it were a real clinical observation.
-        
-        Response:
+    @staticmethod
+    def _request_prompt(action: AgentAction) -> Tuple[str, str]:
+        """User message for a question or test request, and the reply used if the call fails."""
+        if action.action_type == ActionType.ASK_QUESTIONS:
+            request = f"""Question: {action.content}
+
+If the answer is explicitly stated, respond with ONLY the relevant excerpt from the case text as <explicit>excerpt</explicit>.
+Otherwise respond with <synthetic>finding</synthetic>: a realistic, objective clinical finding consistent with this patient's presentation and final diagnosis. Do not provide diagnostic interpretations or hints. Only provide the objective finding as if it were a real clinical observation."""
+            return request, "Unable to provide information at this time."
+        request = f"""Test Request: {action.content}
+
+If the test result is explicitly stated, respond with ONLY the relevant excerpt from the case text as <explicit>excerpt</explicit>.
+Otherwise respond with <synthetic>result</synthetic>: a realistic, objective test result consistent with this patient's presentation and final diagnosis, formatted as a typical clinical report. Do not provide diagnostic interpretations or hints. Only provide the objective findings as if they were real test results."""
+        return request, "Test result not available at this time."
+    
+    def _case_prefix(self, case_file: CaseFile) -> str:
+        """System message for a case, built once so every turn sends identical bytes.
+
+        Case text past _CASE_TEXT_CHARS is cut at a sentence boundary; the rest is
+        indexed so _messages can attach the passages relevant to each request.
         """
-        
-        try:
-            response = chat_completion_with_retries(
-                client=self.client,
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_retries=5,
-                retry_interval_sec=8,
-                max_tokens=300,
-                temperature=0.7,
-            )
-            
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print("Error generating synthetic answer:")
-            print(f"  ErrorType: {type(e).__name__}")
-            print(f"  ErrorRepr: {e!r}")
-            return "Unable to provide information at this time."
+        prefix = self._prefixes.get(case_file.case_id)
+        if prefix is None:
+            head, tail = _split_case_text(case_file.full_case_text, _CASE_TEXT_CHARS)
+            if tail:
+                self._overflow[case_file.case_id] = CaseIndex.from_text(tail)
+            prefix = f"""{GATEKEEPER_SYSTEM_PROMPT}
+
+Case Context:
+Initial Abstract: {case_file.initial_abstract}
+
+Full Case Text: {head}{"..." if tail else ""}
+
+Final Diagnosis: {case_file.ground_truth_diagnosis}"""
+            self._prefixes[case_file.case_id] = prefix
+        return prefix
     
-    def _generate_synthetic_test_result(self, test_request: str, case_file: CaseFile) -> str:
-        """Generate a synthetic test result that's consistent with the case."""
-        prompt = f"""
-        You are a medical information oracle. Generate a plausible, synthetic test result that is consistent with the patient's overall clinical picture and the final diagnosis.
-        
-        Test Request: {test_request}
-        
-        Case Context:
-        Initial Abstract: {case_file.initial_abstract}
-        
-        Full Case Text: {case_file.full_case_text[:3000]}...
-        
-        Final Diagnosis: {case_file.ground_truth_diagnosis}
-        
-        Generate a realistic, objective test result that would be consistent with this patient's presentation and final diagnosis. Format it as a typical clinical report. Do not provide diagnostic interpretations or hints. Only provide the objective findings as if they were real test results.
-        
-        Response:
+    def _messages(self, case_file: CaseFile, request: str, model: str) -> List[dict]:
+        system = self._system_message(case_file, model)
+        overflow = self._overflow.get(case_file.case_id)
+        if overflow is not None:
+            hits = sorted(i for _, i in overflow.search(request, _OVERFLOW_PASSAGES))
+            if hits:
+                passages = "\n".join(overflow.passages[i] for i in hits)
+                request = f"{request}\n\nFurther case text relevant to this request:\n{passages}"
+        return [system, {"role": "user", "content": request}]
+    
+    def _system_message(self, case_file: CaseFile, model: str) -> dict:
+        prefix = self._case_prefix(case_file)
+        if model.startswith("anthropic/"):
+            # Anthropic only caches blocks marked explicitly; OpenAI models cache identical prefixes automatically
+            return {"role": "system", "content": [{"type": "text", "text": prefix,
+                                                   "cache_control": {"type": "ephemeral"}}]}
+        return {"role": "system", "content": prefix}
+    
+    def _answer_or_synthesize(self, case_file: CaseFile, request: str, unavailable: str) -> GatekeeperResponse:
+        """Run the combined lookup-or-generate prompt (one request instead of extract, then synthesize).
+
+        When EXTRACTOR_MODEL differs from the gatekeeper model it drafts the reply
+        first; an excerpt from the case text is accepted as is, anything else is
+        asked again of the gatekeeper model, which writes the synthetic findings.
         """
-        
+        if self.extract_model != self.model:
+            text = self._complete(case_file, request, self.extract_model, temperature=0.1)
+            if text is not None:
+                reply = self._read_reply(text, unavailable)
+                if not reply.is_synthetic:
+                    return reply
+        text = self._complete(case_file, request, self.model, temperature=0.7)
+        if text is None:
+            return GatekeeperResponse(response_text=unavailable, is_synthetic=True)
+        return self._read_reply(text, unavailable)
+    
+    def _complete(self, case_file: CaseFile, request: str, model: str, temperature: float) -> Optional[str]:
         try:
             response = chat_completion_with_retries(
                 client=self.client,
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                model=model,
+                messages=self._messages(case_file, request, model),
                 max_retries=5,
                 retry_interval_sec=8,
-                max_tokens=400,
-                temperature=0.7,
+                max_tokens=500,
+                temperature=temperature,
             )
-            
             return response.choices[0].message.content.strip()
         except Exception as e:
-            print("Error generating synthetic test result:")
+            print(f"Error generating gatekeeper response ({model}):")
             print(f"  ErrorType: {type(e).__name__}")
             print(f"  ErrorRepr: {e!r}")
-            return "Test result not available at this time."
+            return None
+    
+    @staticmethod
+    def _read_reply(text: str, unavailable: str) -> GatekeeperResponse:
+        explicit = _EXPLICIT_RE.search(text)
+        if explicit and explicit.group(1).strip():
+            return GatekeeperResponse(response_text=explicit.group(1).strip(), is_synthetic=False)
+        synthetic = _SYNTHETIC_RE.search(text)
+        # An untagged reply is treated as generated content
+        answer = synthetic.group(1).strip() if synthetic else text
+        return GatekeeperResponse(response_text=answer or unavailable, is_synthetic=True)
     
     def validate_request(self, action: AgentAction) -> Tuple[bool, str]:
         """Validate if a request is appropriate for the gatekeeper."""
         if action.action_type == ActionType.ASK_QUESTIONS:
             # Check for overly broad questions
-            broad_indicators = [
-                "tell me everything", "what's wrong", "what should I do",
-                "give me all information", "summarize the case"
-            ]
-            
-            question_lower = action.content.lower()
-            for indicator in broad_indicators:
-                if indicator in question_lower:
-                    return False, "Please ask more specific questions about the patient's history or examination findings."
+            if _BROAD_QUESTION_RE.search(action.content):
+                return False, "Please ask more specific questions about the patient's history or examination findings."
             
             return True, ""
         
         elif action.action_type == ActionType.REQUEST_TESTS:
             # Check for vague test requests
-            vague_indicators = [
-                "run blood work", "do some imaging", "order labs",
-                "get tests", "run diagnostics"
-            ]
-            
-            test_lower = action.content.lower()
-            for indicator in vague_indicators:
-                if indicator in test_lower:
-                    return False, "Please specify the exact test you would like to order (e.g., 'Complete Blood Count', 'CT of the abdomen with contrast')."
+            if _VAGUE_TEST_RE.search(action.content):
+                return False, "Please specify the exact test you would like to order (e.g., 'Complete Blood Count', 'CT of the abdomen with contrast')."
             
             return True, ""
         
@@ -1,8 +1,9 @@
 """Judge Agent implementation for SDBench."""
 
-from typing import List
+from typing import List, Tuple
 from data_models import CaseFile, JudgeScore
 from config import Config
+from utils.batch_queue import BatchQueue
 from utils.llm_client import chat_completion_with_retries
 
 class JudgeAgent:
@@ -10,7 +11,7 @@ class JudgeAgent:
     
     def __init__(self, config: Config):
         self.config = config
-        self.client = config.get_openai_client()
+        self.client = config.openai_client
         self.model = config.JUDGE_MODEL
     
     def evaluate_diagnosis(self, candidate_diagnosis: str, case_file: CaseFile) -> JudgeScore:
@@ -127,6 +128,30 @@ class JudgeAgent:
                 label="Completely incorrect"
             )
     
+    def evaluate_batch(self, diagnoses_and_cases: List[Tuple[str, CaseFile]]) -> List[JudgeScore]:
+        """Evaluate many diagnoses through the OpenAI Batch API.
+
+        Judging has no conversational dependency between cases, so all requests are
+        submitted as one batch job (half the price of synchronous calls). Providers
+        without a Batch API, failed jobs and missing outputs fall back to
+        evaluate_diagnosis for the affected items.
+        """
+        if not diagnoses_and_cases:
+            return []
+        if self.config.API_PROVIDER != "openai":
+            return [self.evaluate_diagnosis(dx, case_file) for dx, case_file in diagnoses_and_cases]
+
+        queue = BatchQueue(self.client, self.config.BATCH_POLL_INTERVAL_SEC, self.config.BATCH_TIMEOUT_SEC)
+        replies = queue.wait([
+            queue.submit(self.model, [{"role": "user", "content": self._create_evaluation_prompt(dx, case_file)}],
+                         max_tokens=500, temperature=0.1)
+            for dx, case_file in diagnoses_and_cases
+        ])
+        return [
+            self._parse_evaluation_response(reply) if reply else self.evaluate_diagnosis(dx, case_file)
+            for reply, (dx, case_file) in zip(replies, diagnoses_and_cases)
+        ]
+    
     def batch_evaluate(self, encounters: List[dict]) -> List[JudgeScore]:
         """Evaluate multiple diagnoses in batch for efficiency."""
         results = []
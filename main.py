@@ -38,7 +38,7 @@ def run_single_case_demo():
     print("="*60)
     
     config = setup_environment()
-    sdbench = SDBench(config)
+    sdbench = SDBench(config, plot_enabled=True)
     
     # Get synthetic cases
     cases = get_all_synthetic_cases()
@@ -81,7 +81,7 @@ def run_full_benchmark():
     print("="*60)
     
     config = setup_environment()
-    sdbench = SDBench(config)
+    sdbench = SDBench(config, plot_enabled=True)
     
     # Get all synthetic cases
     cases = get_all_synthetic_cases()
@@ -173,7 +173,7 @@ def run_dataset_benchmark(dataset_path: str, limit: int = 0, use_llm: bool = Fal
 
     # Environment and bench
     config = Config()
-    sdbench = SDBench(config)
+    sdbench = SDBench(config, plot_enabled=True)
 
     # Load cases
     print(f"Loading dataset: {dataset_path}")
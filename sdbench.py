@@ -1,6 +1,10 @@
 """Main SDBench implementation - Sequential Diagnosis Benchmark."""
 
+import asyncio
+import copy
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Callable, Any
 from data_models import (
     CaseFile, AgentAction, ActionType, DiagnosticEncounter, 
@@ -12,6 +16,10 @@ from judge_agent import JudgeAgent
 from evaluation_protocol import EvaluationProtocol
 from config import Config
 
+# Multiple-choice option lines ("A. text") in a case's OPTIONS section
+_OPTION_LINE_RE = re.compile(r"^\s*([ABCD])\s*\.\s*(.+)$")
+_UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
 class DiagnosticAgent:
     """Base class for diagnostic agents to be evaluated."""
     
@@ -29,19 +37,24 @@ class DiagnosticAgent:
 class SDBench:
     """Main SDBench class that orchestrates the sequential diagnosis benchmark."""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, plot_enabled: bool = False):
         self.config = config
         self.gatekeeper = GatekeeperAgent(config)
         self.cost_estimator = CostEstimator(config)
         self.judge = JudgeAgent(config)
-        self.evaluator = EvaluationProtocol(config)
+        self.evaluator = EvaluationProtocol(config, plot_enabled=plot_enabled)
     
     def run_single_encounter(self, diagnostic_agent: DiagnosticAgent,
                            case_file: CaseFile,
                            max_turns: int = 20,
                            disable_cost: bool = False,
-                           transcript_dir: str = None) -> DiagnosticEncounter:
-        """Run a single diagnostic encounter between agent and case."""
+                           transcript_dir: str = None,
+                           defer_judge: bool = False) -> DiagnosticEncounter:
+        """Run a single diagnostic encounter between agent and case.
+
+        With defer_judge=True the final diagnosis is left unscored so the caller
+        can judge many encounters in one batch (see _judge_in_batch).
+        """
         encounter = DiagnosticEncounter(case_id=case_file.case_id)
         
         # Reset agent for new case
@@ -51,7 +64,6 @@ class SDBench:
         current_context = case_file.initial_abstract
         # Try to parse options from full case text
         try:
-            import re
             options_block = []
             in_opts = False
             for line in case_file.full_case_text.splitlines():
@@ -59,7 +71,7 @@ class SDBench:
                     in_opts = True
                     continue
                 if in_opts:
-                    m = re.match(r"^\s*([ABCD])\s*\.\s*(.+)$", line.strip())
+                    m = _OPTION_LINE_RE.match(line.strip())
                     if m:
                         options_block.append(f"{m.group(1)}: {m.group(2)}")
             if options_block:
@@ -193,16 +205,11 @@ class SDBench:
             transcript_lines.append(f"[Cost] Visit cost total: ${visit_cost:.2f}")
         
         # If encounter completed with diagnosis, evaluate it
-        if encounter.is_complete and encounter.final_diagnosis:
+        if encounter.is_complete and encounter.final_diagnosis and not defer_judge:
             encounter.judge_score = self.judge.evaluate_diagnosis(
                 encounter.final_diagnosis, case_file
             )
-            transcript_lines.append("========================================")
-            transcript_lines.append(f"[JUDGE (model: {judge_model})]")
-            transcript_lines.append(f"Score: {encounter.judge_score.score}/5")
-            transcript_lines.append(f"Label: {encounter.judge_score.label}")
-            transcript_lines.append("Reasoning:")
-            transcript_lines.append(encounter.judge_score.reasoning)
+            transcript_lines.extend(self._judge_transcript_lines(encounter.judge_score))
         if not disable_cost:
             transcript_lines.append("----------------------------------------")
             transcript_lines.append(f"[Cost] Total estimated cost: ${encounter.total_cost:.2f}")
@@ -210,10 +217,8 @@ class SDBench:
         # Persist transcript if requested
         if transcript_dir:
             import os
-            import re
             os.makedirs(transcript_dir, exist_ok=True)
-            agent_name_safe = re.sub(r"[^A-Za-z0-9._-]+", "_", diagnostic_agent.name)
-            out_path = os.path.join(transcript_dir, f"{case_file.case_id}_{agent_name_safe}.txt")
+            out_path = self._transcript_path(transcript_dir, diagnostic_agent, case_file)
             try:
                 # Append full case and label at the end for completeness
                 transcript_lines.append("========================================")
@@ -234,11 +239,53 @@ class SDBench:
             pass
         return encounter
     
+    def _judge_transcript_lines(self, judge_score) -> List[str]:
+        """Transcript block describing a judge score."""
+        return [
+            "========================================",
+            f"[JUDGE (model: {getattr(self.judge, 'model', '-')})]",
+            f"Score: {judge_score.score}/5",
+            f"Label: {judge_score.label}",
+            "Reasoning:",
+            judge_score.reasoning,
+        ]
+    
+    def _transcript_path(self, transcript_dir: str, diagnostic_agent: DiagnosticAgent, case_file: CaseFile) -> str:
+        """Path of the transcript file for one agent/case pair."""
+        import os
+        agent_name_safe = _UNSAFE_NAME_RE.sub("_", diagnostic_agent.name)
+        return os.path.join(transcript_dir, f"{case_file.case_id}_{agent_name_safe}.txt")
+    
+    def _judge_in_batch(self, diagnostic_agent: DiagnosticAgent,
+                        encounters: List[DiagnosticEncounter],
+                        case_files: List[CaseFile],
+                        transcript_dir: str = None) -> None:
+        """Score every completed encounter with one judge batch and append the scores to transcripts."""
+        pending = [
+            (encounter, case_file) for encounter, case_file in zip(encounters, case_files)
+            if encounter.is_complete and encounter.final_diagnosis and not encounter.judge_score
+        ]
+        if not pending:
+            return
+        print(f"Judging {len(pending)} diagnoses in batch...")
+        scores = self.judge.evaluate_batch(
+            [(encounter.final_diagnosis, case_file) for encounter, case_file in pending]
+        )
+        for (encounter, case_file), score in zip(pending, scores):
+            encounter.judge_score = score
+            if transcript_dir:
+                try:
+                    with open(self._transcript_path(transcript_dir, diagnostic_agent, case_file), "a", encoding="utf-8") as f:
+                        f.write("\n" + "\n".join(self._judge_transcript_lines(score)))
+                except Exception as e:
+                    print(f"Failed to append judge score to transcript: {e}")
+    
     def run_benchmark(self, diagnostic_agent: DiagnosticAgent,
                      case_files: List[CaseFile],
                      max_turns_per_case: int = 20,
                      disable_cost: bool = False,
-                     transcript_dir: str = None) -> BenchmarkResult:
+                     transcript_dir: str = None,
+                     batch_judge: bool = False) -> BenchmarkResult:
         """Run the full benchmark on a set of cases."""
         print(f"Running SDBench for {diagnostic_agent.name} on {len(case_files)} cases...")
         
@@ -248,21 +295,94 @@ class SDBench:
             print(f"Processing case {i+1}/{len(case_files)}: {case_file.case_id}")
             
             encounter = self.run_single_encounter(
-                diagnostic_agent, case_file, max_turns_per_case, disable_cost=disable_cost, transcript_dir=transcript_dir
+                diagnostic_agent, case_file, max_turns_per_case, disable_cost=disable_cost,
+                transcript_dir=transcript_dir, defer_judge=batch_judge
             )
             encounters.append(encounter)
-            
-            # Print encounter summary
-            if encounter.is_complete:
-                print(f"  ✓ Completed in {len(encounter.actions)} turns")
-                print(f"  ✓ Final diagnosis: {encounter.final_diagnosis}")
-                print(f"  ✓ Judge score: {encounter.judge_score.score}/5" if encounter.judge_score else "  ✗ No judge score")
-                print(f"  ✓ Total cost: ${encounter.total_cost:.2f}")
-            else:
-                print(f"  ✗ Incomplete (max turns reached)")
-                print(f"  ✓ Total cost: ${encounter.total_cost:.2f}")
-        
-        # Evaluate all encounters
+            self._print_encounter_summary(encounter)
+        
+        if batch_judge:
+            self._judge_in_batch(diagnostic_agent, encounters, case_files, transcript_dir)
+        return self._summarize_benchmark(diagnostic_agent, encounters)
+    
+    async def run_benchmark_async(self, diagnostic_agent: DiagnosticAgent,
+                                  case_files: List[CaseFile],
+                                  max_turns_per_case: int = 20,
+                                  disable_cost: bool = False,
+                                  transcript_dir: str = None,
+                                  max_concurrency: int = None,
+                                  batch_judge: bool = False) -> BenchmarkResult:
+        """Run the benchmark with up to max_concurrency cases in flight at once.
+
+        Cases are independent, so each one runs on its own copy of the agent
+        (agents keep per-case state) in a worker thread; results keep case order.
+        With an agent in Config.BATCH_MODE every case runs at once (unless capped)
+        and the running cases advance in lockstep, so each role stage of a turn is
+        one Batch API job for the whole sweep (see BatchQueue.join).
+        """
+        batch_queue = getattr(diagnostic_agent, "batch_queue", None)
+        if batch_queue is not None:
+            max_concurrency = max_concurrency or len(case_files)
+        max_concurrency = max_concurrency or self.config.MAX_CONCURRENT_CASES
+        print(f"Running SDBench for {diagnostic_agent.name} on {len(case_files)} cases "
+              f"(up to {max_concurrency} concurrently)...")
+        
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        # The first wave joins the lockstep barrier before any of its threads start, so
+        # no case can flush a batch before the others have queued their first request;
+        # later cases join as they take a finished case's slot
+        first_wave = min(max_concurrency, len(case_files))
+        if batch_queue is not None:
+            batch_queue.join(first_wave)
+        
+        def run_encounter(case_file: CaseFile) -> DiagnosticEncounter:
+            try:
+                agent = copy.copy(diagnostic_agent)
+                agent.reset()
+                return self.run_single_encounter(
+                    agent, case_file, max_turns_per_case,
+                    disable_cost=disable_cost, transcript_dir=transcript_dir,
+                    defer_judge=batch_judge
+                )
+            finally:
+                if batch_queue is not None:
+                    batch_queue.leave()
+        
+        async def run_case(i: int, case_file: CaseFile) -> DiagnosticEncounter:
+            async with semaphore:
+                print(f"Processing case {i+1}/{len(case_files)}: {case_file.case_id}")
+                if batch_queue is not None and i >= first_wave:
+                    batch_queue.join()
+                encounter = await loop.run_in_executor(pool, run_encounter, case_file)
+                self._print_encounter_summary(encounter)
+                return encounter
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            encounters = await asyncio.gather(
+                *(run_case(i, case_file) for i, case_file in enumerate(case_files))
+            )
+        
+        encounters = list(encounters)
+        if batch_judge:
+            self._judge_in_batch(diagnostic_agent, encounters, case_files, transcript_dir)
+        return self._summarize_benchmark(diagnostic_agent, encounters)
+    
+    def _print_encounter_summary(self, encounter: DiagnosticEncounter) -> None:
+        """Print a short per-encounter summary."""
+        if encounter.is_complete:
+            print(f"  ✓ Completed in {len(encounter.actions)} turns")
+            print(f"  ✓ Final diagnosis: {encounter.final_diagnosis}")
+            print(f"  ✓ Judge score: {encounter.judge_score.score}/5" if encounter.judge_score else "  ✗ No judge score")
+            print(f"  ✓ Total cost: ${encounter.total_cost:.2f}")
+        else:
+            print(f"  ✗ Incomplete (max turns reached)")
+            print(f"  ✓ Total cost: ${encounter.total_cost:.2f}")
+    
+    def _summarize_benchmark(self, diagnostic_agent: DiagnosticAgent,
+                             encounters: List[DiagnosticEncounter]) -> BenchmarkResult:
+        """Evaluate all encounters and print the overall results."""
         result = self.evaluator.evaluate_encounters(encounters)
         
         print(f"\nBenchmark Results for {diagnostic_agent.name}:")
@@ -0,0 +1,118 @@
+"""BatchQueue against a fake Batch API client (utils.batch_queue)."""
+
+import json
+import threading
+from types import SimpleNamespace
+
+from config import Config
+from data_models import CaseFile, JudgeScore
+from judge_agent import JudgeAgent
+from utils.batch_queue import BatchQueue, batch_queue_for
+
+
+class _FakeBatchClient:
+    """Files + batches endpoints that answer every request with reply(<last message>)."""
+
+    def __init__(self, status: str = "completed", skip=(), reply=lambda content: "re: " + content):
+        self.status = status
+        self.skip = set(skip)
+        self.reply = reply
+        self.batches_created = []
+        self._inputs = {}
+        self.files = SimpleNamespace(create=self._create_file, content=self._content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+
+    def _create_file(self, file, purpose):
+        file_id = f"file-{len(self._inputs)}"
+        self._inputs[file_id] = [json.loads(line) for line in file[1].getvalue().decode("utf-8").splitlines()]
+        return SimpleNamespace(id=file_id)
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        batch_id = f"batch-{len(self.batches_created)}"
+        self.batches_created.append(self._inputs[input_file_id])
+        return SimpleNamespace(id=batch_id, status="in_progress", output_file_id=None, input_file_id=input_file_id)
+
+    def _retrieve(self, batch_id):
+        requests = self.batches_created[int(batch_id.split("-")[1])]
+        return SimpleNamespace(id=batch_id, status=self.status,
+                               output_file_id=f"out-{batch_id}" if self.status == "completed" else None,
+                               requests=requests)
+
+    def _content(self, file_id):
+        requests = self.batches_created[int(file_id.split("-")[-1])]
+        lines = []
+        for item in requests:
+            if item["body"]["messages"][-1]["content"] in self.skip:
+                continue
+            reply = self.reply(item["body"]["messages"][-1]["content"])
+            lines.append(json.dumps({"custom_id": item["custom_id"],
+                                     "response": {"body": {"choices": [{"message": {"content": reply}}]}}}))
+        return SimpleNamespace(text="\n".join(lines))
+
+
+def _messages(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_flush_resolves_futures_by_custom_id():
+    client = _FakeBatchClient(skip={"b"})
+    queue = BatchQueue(client, poll_interval_sec=0)
+    futures = [queue.submit("m", _messages(t), max_tokens=5) for t in "abc"]
+    assert queue.wait(futures) == ["re: a", "", "re: c"]
+    assert len(client.batches_created) == 1
+    assert client.batches_created[0][0]["body"]["max_tokens"] == 5
+
+
+def test_failed_batch_resolves_to_empty_replies():
+    queue = BatchQueue(_FakeBatchClient(status="failed"), poll_interval_sec=0)
+    assert queue.wait([queue.submit("m", _messages("a"))]) == [""]
+
+
+def test_unfinished_batch_times_out_to_empty_replies():
+    queue = BatchQueue(_FakeBatchClient(status="in_progress"), poll_interval_sec=0, timeout_sec=0)
+    assert queue.wait([queue.submit("m", _messages("a"))]) == [""]
+
+
+def test_batch_mode_needs_a_provider_with_a_batch_api():
+    assert batch_queue_for(Config(OPENROUTER_API_KEY="x", BATCH_MODE=True, API_PROVIDER="openrouter")) is None
+    assert batch_queue_for(Config(OPENROUTER_API_KEY="x", BATCH_MODE=False, API_PROVIDER="openai")) is None
+
+
+def test_judge_batch_goes_through_the_queue():
+    case = CaseFile(case_id="1", initial_abstract="a", full_case_text="t",
+                    ground_truth_diagnosis="gout", publication_year=2024)
+    client = _FakeBatchClient(reply=lambda content: '{"score": 5, "reasoning": "same", "label": "Perfect"}'
+                              if "CANDIDATE DIAGNOSIS: gout" in content else "")
+    judge = JudgeAgent(Config(OPENAI_API_KEY="x", API_PROVIDER="openai", BATCH_POLL_INTERVAL_SEC=0))
+    judge.client = client
+    fallback = []
+    judge.evaluate_diagnosis = lambda dx, case_file: fallback.append(dx) or JudgeScore(1, "sync", "Completely incorrect")
+    scores = judge.evaluate_batch([("gout", case), ("lupus", case)])
+    assert [s.score for s in scores] == [5, 1]
+    # Only the unanswered item is judged synchronously, and both shared one batch
+    assert fallback == ["lupus"]
+    assert len(client.batches_created) == 1
+
+
+def test_participants_share_one_batch_per_stage():
+    client = _FakeBatchClient()
+    queue = BatchQueue(client, poll_interval_sec=0)
+    results = {}
+    entered = threading.Barrier(4)
+
+    def case(name):
+        with queue.participant():
+            entered.wait()
+            replies = []
+            for stage in ("hypothesis", "checklist"):
+                replies += queue.wait([queue.submit("m", _messages(f"{name} {stage}"))])
+            results[name] = replies
+
+    threads = [threading.Thread(target=case, args=(n,)) for n in ("c1", "c2", "c3", "c4")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    assert results["c3"] == ["re: c3 hypothesis", "re: c3 checklist"]
+    # Two stages for four cases: two batches of four requests, not eight batches of one
+    assert [len(batch) for batch in client.batches_created] == [4, 4]
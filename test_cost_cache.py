@@ -0,0 +1,75 @@
+"""Round trips through the binary cost-cache table (utils.cost_cache)."""
+
+from types import SimpleNamespace
+
+from config import Config
+from cost_estimator import CostEstimator
+from data_models import CPTMapping
+from utils.cost_cache import CostCache, write_cost_table
+
+
+def _mapping(name: str, cost: float, codes=()) -> CPTMapping:
+    return CPTMapping(test_name=name, cpt_codes=list(codes), estimated_cost=cost, confidence=0.5)
+
+
+def test_write_cost_table_round_trip(tmp_path):
+    path = str(tmp_path / "costs.sst")
+    entries = {
+        "m|cbc": _mapping("CBC", 15.0, ["85025"]),
+        "m|ct head": _mapping("CT head", 210.5),
+        "m|β-hcg": _mapping("β-hCG", 30.0, ["84702", "84703"]),
+    }
+    write_cost_table(path, entries)
+    cache = CostCache(path)
+    for key, mapping in entries.items():
+        got = cache.get(key)
+        assert got.test_name == mapping.test_name
+        assert got.cpt_codes == mapping.cpt_codes
+        assert got.estimated_cost == mapping.estimated_cost
+        assert abs(got.confidence - mapping.confidence) < 1e-6
+    assert cache.get("m|mri") is None
+    assert cache.get("") is None
+
+
+def test_flush_merges_memtable_into_table(tmp_path):
+    path = str(tmp_path / "costs.sst")
+    write_cost_table(path, {"a": _mapping("A", 1.0), "c": _mapping("C", 3.0)})
+    cache = CostCache(path)
+    cache.put("b", _mapping("B", 2.0))
+    cache.put("c", _mapping("C", 4.0))
+    cache.flush()
+    reopened = CostCache(path)
+    assert [reopened.get(k).estimated_cost for k in "abc"] == [1.0, 2.0, 4.0]
+    # The flushing instance serves the merged table too
+    assert [cache.get(k).estimated_cost for k in "abc"] == [1.0, 2.0, 4.0]
+
+
+def test_unreadable_table_is_ignored(tmp_path):
+    path = tmp_path / "costs.sst"
+    path.write_bytes(b"not a table")
+    cache = CostCache(str(path))
+    assert cache.get("a") is None
+    cache.put("a", _mapping("A", 1.0))
+    cache.flush()
+    assert CostCache(str(path)).get("a").estimated_cost == 1.0
+
+
+def test_persisted_prices_are_per_model(tmp_path):
+    path = str(tmp_path / "costs.sst")
+    calls = []
+
+    def estimator(model: str, reply: str) -> CostEstimator:
+        def create(model, messages, **kwargs):
+            calls.append(model)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+        est = CostEstimator(Config(OPENROUTER_API_KEY="x", GATEKEEPER_MODEL=model, COST_CACHE_PATH=path))
+        est.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        return est
+
+    first = estimator("model-a", "120.00")
+    assert first.calculate_test_cost("CT head") == 120.0
+    first._cost_cache.flush()
+    assert estimator("model-a", "999.00").calculate_test_cost("CT head") == 120.0
+    assert estimator("model-b", "250.00").calculate_test_cost("CT head") == 250.0
+    assert calls == ["model-a", "model-b"]
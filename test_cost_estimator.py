@@ -0,0 +1,89 @@
+"""Pricing paths of cost_estimator, with a fake client standing in for the LLM."""
+
+from types import SimpleNamespace
+
+from config import Config
+from cost_estimator import CostEstimator, _literal_cpt_mapping, _local_cpt_mapping, price_of_codes
+
+
+class _FakeCompletions:
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.calls = []
+
+    def create(self, model, messages, **kwargs):
+        self.calls.append((messages, kwargs))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))])
+
+
+def _estimator(reply: str, **config) -> CostEstimator:
+    estimator = CostEstimator(Config(OPENROUTER_API_KEY="x", COST_CACHE_PATH="", **config))
+    estimator.client = SimpleNamespace(chat=SimpleNamespace(completions=_FakeCompletions(reply)))
+    return estimator
+
+
+def test_marked_cpt_codes_are_priced():
+    mapping = _literal_cpt_mapping("Complete blood count (85025)")
+    assert mapping.cpt_codes == ["85025"]
+    assert mapping.estimated_cost == 15.0
+    assert _literal_cpt_mapping("CBC, CPT 85025").cpt_codes == ["85025"]
+    assert _literal_cpt_mapping("cpt: 85025 and CPT code 80053").cpt_codes == ["85025", "80053"]
+
+
+def test_bare_numbers_are_not_cpt_codes():
+    assert _literal_cpt_mapping("Hemoglobin A1c 10050 units") is None
+    assert _literal_cpt_mapping("Platelet count 85025") is None
+    assert _literal_cpt_mapping("Repeat lipase (10000 U/L yesterday)") is None
+    # Marked but not in the pricing table
+    assert _literal_cpt_mapping("Whole genome sequencing (81425)") is None
+
+
+def test_local_match_needs_every_content_word():
+    assert _local_cpt_mapping("Comprehensive Metabolic Panel").cpt_codes == ["80053"]
+    assert _local_cpt_mapping("complete blood count with differential").cpt_codes == ["85025"]
+
+
+def test_local_match_rejects_near_misses():
+    assert _local_cpt_mapping("Skin biopsy") is None
+    assert _local_cpt_mapping("Liver biopsy") is None
+    assert _local_cpt_mapping("MRI brain with contrast") is None
+    assert _local_cpt_mapping("CT head") is None
+
+
+def test_cpt_mapping_pricing_sends_a_shortlist():
+    estimator = _estimator('{"cpt_codes": ["70450"], "estimated_cost": 200, "confidence": 0.9}',
+                           CPT_MAPPING_PRICING=True)
+    assert estimator.calculate_test_cost("CT head") == 200.0
+    (messages, _), = estimator.client.chat.completions.calls
+    prompt = messages[0]["content"]
+    assert "70450" in prompt and "70460" in prompt
+    assert "85025" not in prompt
+    # Exact wording is priced locally without another call
+    assert estimator.calculate_test_cost("Lipid panel") == 20.0
+    assert len(estimator.client.chat.completions.calls) == 1
+
+
+def test_direct_estimation_stays_the_default():
+    estimator = _estimator("$123.00")
+    assert estimator.calculate_test_cost("CT head") == 123.0
+
+
+def test_price_of_codes_sums_known_codes():
+    assert price_of_codes([]) == 0.0
+    assert price_of_codes(["85025", "80053"]) == 40.0
+    # Codes before, between and after the table rows are ignored
+    assert price_of_codes(["00001", "85025", "70455", "99999"]) == 15.0
+    estimator = _estimator('{"cpt_codes": ["85025", "80053"], "estimated_cost": 1, "confidence": 0.9}',
+                           CPT_MAPPING_PRICING=True)
+    assert estimator.calculate_test_cost("Routine labs") == 40.0
+
+
+def test_cpt_mapping_requests_json_and_falls_back_offline():
+    estimator = _estimator("not json", CPT_MAPPING_PRICING=True)
+    cost = estimator.calculate_test_cost("MRI brain with contrast")
+    (_, kwargs), = estimator.client.chat.completions.calls
+    assert kwargs["response_format"] == {"type": "json_object"}
+    # An unparseable reply gets the offline MRI estimate, which is not cached
+    assert 500.0 <= cost <= 550.0
+    estimator.calculate_test_cost("MRI brain with contrast")
+    assert len(estimator.client.chat.completions.calls) == 2
@@ -0,0 +1,46 @@
+"""Agent-level summaries of EvaluationProtocol: Pareto frontier and compare_agents."""
+
+from config import Config
+from data_models import BenchmarkResult
+from evaluation_protocol import EvaluationProtocol
+
+
+def _result(cost: float, acc: float) -> BenchmarkResult:
+    return BenchmarkResult(diagnostic_accuracy=acc, average_cost=cost, total_cases=10,
+                           correct_cases=round(acc * 10), encounter_results=[])
+
+
+def _protocol() -> EvaluationProtocol:
+    return EvaluationProtocol(Config(OPENROUTER_API_KEY="x"))
+
+
+def _frontier(points):
+    protocol = _protocol()
+    return [(r.average_cost, r.diagnostic_accuracy)
+            for r in protocol.calculate_pareto_frontier([_result(c, a) for c, a in points])]
+
+
+def test_dominated_point_is_excluded():
+    # (300, 0.5) costs more than (200, 0.7) and is less accurate
+    assert _frontier([(300, 0.5), (100, 0.4), (200, 0.7), (400, 0.9)]) == [(100, 0.4), (200, 0.7), (400, 0.9)]
+
+
+def test_equal_accuracy_keeps_the_cheaper_point():
+    assert _frontier([(250, 0.6), (150, 0.6), (500, 0.8)]) == [(150, 0.6), (500, 0.8)]
+
+
+def test_equal_cost_keeps_the_more_accurate_point():
+    assert _frontier([(100, 0.3), (100, 0.5), (100, 0.5)]) == [(100, 0.5)]
+
+
+def test_compare_agents_statistics():
+    results = [_result(200, 0.6), _result(0, 0.2), _result(100, 0.6)]
+    comparison = _protocol().compare_agents(results)
+    assert comparison['best_accuracy'] is results[0]
+    assert comparison['lowest_cost'] is results[1]
+    # The free agent has no accuracy per dollar
+    assert comparison['best_efficiency'] == (results[2], 0.006)
+    stats = comparison['statistics']
+    assert abs(stats['accuracy_mean'] - 1.4 / 3) < 1e-12
+    assert stats['cost_mean'] == 100.0
+    assert stats['cost_range'] == (0, 200)
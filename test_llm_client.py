@@ -0,0 +1,66 @@
+"""Request coalescing in utils.llm_client, with fake clients that block until released."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+from utils.llm_client import chat_completion_with_retries
+
+
+class _BlockingCompletions:
+    def __init__(self, name: str, release: threading.Event):
+        self.name = name
+        self.release = release
+        self.calls = 0
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        self.release.wait(timeout=5)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.name))])
+
+
+def _client(name: str, release: threading.Event):
+    return SimpleNamespace(chat=SimpleNamespace(completions=_BlockingCompletions(name, release)))
+
+
+def _run_concurrently(calls):
+    results = [None] * len(calls)
+
+    def run(i, client):
+        response = chat_completion_with_retries(client, "m", [{"role": "user", "content": "hi"}], max_retries=1)
+        results[i] = response.choices[0].message.content
+
+    threads = [threading.Thread(target=run, args=(i, c)) for i, c in enumerate(calls)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def _wait_until(predicate, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_identical_requests_on_one_client_share_a_call():
+    release = threading.Event()
+    client = _client("a", release)
+    threads, results = _run_concurrently([client, client])
+    _wait_until(lambda: client.chat.completions.calls > 0)
+    time.sleep(0.1)  # let the second caller find the request in flight
+    release.set()
+    for t in threads:
+        t.join(timeout=5)
+    assert results == ["a", "a"]
+    assert client.chat.completions.calls == 1
+
+
+def test_identical_requests_on_different_clients_are_not_shared():
+    release = threading.Event()
+    first, second = _client("a", release), _client("b", release)
+    threads, results = _run_concurrently([first, second])
+    _wait_until(lambda: first.chat.completions.calls + second.chat.completions.calls == 2)
+    release.set()
+    for t in threads:
+        t.join(timeout=5)
+    assert results == ["a", "b"]
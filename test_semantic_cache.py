@@ -0,0 +1,46 @@
+"""Semantic cache must never hand one case's role reply to another case."""
+
+from types import SimpleNamespace
+
+from config import Config
+from example_agents import MultiLLMDxOAgent
+from utils.semantic_cache import SemanticCache
+
+_HISTORY = ("Encounter History:\n"
+            "1. ask_questions: Any chest pain, recent travel or sick contacts?\n"
+            "2. request_tests: Complete blood count with differential\n"
+            "3. request_tests: Chest X-ray, posteroanterior and lateral views\n")
+CASE_A = "Case Abstract: 45M with fever and cough for 3 days, smoker.\n\n" + _HISTORY
+CASE_B = "Case Abstract: 62M with fever and dyspnea for 3 days, smoker.\n\n" + _HISTORY
+
+
+class _FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        reply = f"reply {self.calls} for {messages[1]['content'][:20]}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+
+def test_same_prompt_different_case_misses():
+    cache = SemanticCache(None)
+    cache.put("hypothesis", "m", "sys", "Round: 1", "pneumonia", temperature=0.2, scope=CASE_A)
+    assert cache.get("hypothesis", "m", "sys", "Round: 1", temperature=0.2, scope=CASE_B) is None
+    assert cache.get("hypothesis", "m", "sys", "Round: 1", temperature=0.2, scope=CASE_A) == "pneumonia"
+
+
+def test_agents_do_not_share_replies_across_cases():
+    config = Config(OPENROUTER_API_KEY="x", SEMANTIC_CACHE_ENABLED=True, SEMANTIC_CACHE_PATH="")
+    agent = MultiLLMDxOAgent(config=config)
+    completions = _FakeCompletions()
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    first = agent._call_role("hypothesis", agent._hypothesis_prompt(), CASE_A)
+    second = agent._call_role("hypothesis", agent._hypothesis_prompt(), CASE_B)
+    assert completions.calls == 2
+    assert first != second
+    # The same case and prompt is still served from the cache
+    assert agent._call_role("hypothesis", agent._hypothesis_prompt(), CASE_A) == first
+    assert completions.calls == 2
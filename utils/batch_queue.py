@@ -0,0 +1,159 @@
+import io
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from openai import OpenAI
+
+from config import Config
+
+_ENDPOINT = "/v1/chat/completions"
+_TERMINAL = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchQueue:
+    """Collects chat requests and sends them through the provider's Batch API.
+
+    submit() only records the request and returns a Future of the reply text;
+    flush() uploads everything pending as one JSONL batch, polls until the batch
+    finishes (or timeout_sec passes) and resolves each Future by custom_id. Requests
+    the batch did not answer resolve to "" (what the agents' role calls return on errors).
+
+    Registered participants (join/leave, or participant() around one case) advance
+    in lockstep: wait() holds the flush until every participant is waiting on its
+    own requests, so one batch carries a stage for all running cases instead of
+    one batch per case.
+    """
+
+    def __init__(self, client: OpenAI, poll_interval_sec: float = 30.0, timeout_sec: float = 24 * 3600):
+        self.client = client
+        self.poll_interval_sec = poll_interval_sec
+        self.timeout_sec = timeout_sec
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._ids = itertools.count()
+        self._pending: List[tuple] = []
+        self._participants = 0
+        self._waiters: Dict[int, List[Future]] = {}
+        self._flushing = False
+
+    def join(self, count: int = 1) -> None:
+        """Register cases for the lockstep barrier in wait(); each must leave() when done."""
+        with self._cond:
+            self._participants += count
+
+    def leave(self) -> None:
+        with self._cond:
+            self._participants -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def participant(self):
+        """join() for the duration of one case."""
+        self.join()
+        try:
+            yield self
+        finally:
+            self.leave()
+
+    def submit(self, model: str, messages: List[Dict[str, str]], **params) -> Future:
+        future = Future()
+        body = {"model": model, "messages": messages, **params}
+        with self._lock:
+            custom_id = f"sdbench-{next(self._ids)}"
+            self._pending.append((custom_id, body, future))
+        return future
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+        futures = {custom_id: future for custom_id, _, future in batch}
+        try:
+            replies = self._run([(custom_id, body) for custom_id, body, _ in batch])
+        except Exception as e:
+            print(f"Batch request failed: {e!r}")
+            replies = {}
+        for custom_id, future in futures.items():
+            future.set_result(replies.get(custom_id, ""))
+
+    def wait(self, futures: List[Future]) -> List[str]:
+        """Collect results, flushing once every participant is waiting (immediately without any)."""
+        me = threading.get_ident()
+        with self._cond:
+            self._waiters[me] = futures
+            self._cond.notify_all()
+            try:
+                while not all(f.done() for f in futures):
+                    # Waiters whose results already arrived are about to return, so only
+                    # those still blocked count towards the barrier
+                    blocked = sum(1 for fs in self._waiters.values() if not all(f.done() for f in fs))
+                    if self._flushing or blocked < self._participants:
+                        self._cond.wait()
+                        continue
+                    # Everyone is blocked on a request: this thread sends the batch for all of them
+                    self._flushing = True
+                    self._cond.release()
+                    try:
+                        self.flush()
+                    finally:
+                        self._cond.acquire()
+                        self._flushing = False
+                        self._cond.notify_all()
+            finally:
+                del self._waiters[me]
+        return [f.result() for f in futures]
+
+    def _run(self, requests: List[tuple]) -> Dict[str, str]:
+        lines = [json.dumps({"custom_id": custom_id, "method": "POST", "url": _ENDPOINT, "body": body})
+                 for custom_id, body in requests]
+        upload = self.client.files.create(
+            file=("sdbench_batch.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=upload.id, endpoint=_ENDPOINT, completion_window="24h"
+        )
+        print(f"Submitted batch {batch.id} with {len(requests)} requests", flush=True)
+        deadline = time.time() + self.timeout_sec
+        while batch.status not in _TERMINAL and time.time() < deadline:
+            time.sleep(self.poll_interval_sec)
+            batch = self.client.batches.retrieve(batch.id)
+        if batch.status != "completed" or not batch.output_file_id:
+            print(f"Batch {batch.id} ended with status {batch.status}", flush=True)
+            if not batch.output_file_id:
+                return {}
+
+        replies = {}
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                body = item["response"]["body"]
+                replies[item["custom_id"]] = body["choices"][0]["message"]["content"].strip()
+            except (KeyError, IndexError, TypeError, AttributeError, ValueError):
+                continue
+        return replies
+
+
+_queues: Dict[int, BatchQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def batch_queue_for(config: Optional[Config] = None) -> Optional[BatchQueue]:
+    """Process-wide queue for the config's client, or None unless BATCH_MODE is on and the
+    provider has a Batch API (openai)."""
+    cfg = config or Config()
+    if not cfg.BATCH_MODE or cfg.API_PROVIDER != "openai":
+        return None
+    client = cfg.openai_client
+    with _queues_lock:
+        if id(client) not in _queues:
+            _queues[id(client)] = BatchQueue(client, cfg.BATCH_POLL_INTERVAL_SEC, cfg.BATCH_TIMEOUT_SEC)
+        return _queues[id(client)]
@@ -0,0 +1,77 @@
+import math
+import re
+from collections import Counter
+from typing import List, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+# Question words and fillers that say nothing about where an answer sits in the case
+_STOPWORDS = frozenset("""
+a an and any are as at be been being by can could did do does for from had has have he her his how i if in
+is it its me my of on or our please s she should that the their them there these they this to was were what
+when where which who whom why will with would you your patient patients result results
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case alphanumeric terms without stopwords."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+
+
+class CaseIndex:
+    """Okapi BM25 over the passages of one case (dependency-free; a case has at most a few hundred).
+
+    search() ranks passages for a query; coverage() is the idf-weighted share of the
+    query's terms a passage contains, which unlike raw BM25 scores is comparable
+    across queries and cases and so can be thresholded.
+    """
+
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self._tfs = [Counter(tokenize(p)) for p in passages]
+        self._lengths = [sum(tf.values()) for tf in self._tfs]
+        self._avg_len = (sum(self._lengths) / len(self._lengths)) if passages else 0.0
+        df = Counter(term for tf in self._tfs for term in tf)
+        n = len(passages)
+        self._idf = {term: math.log((n - d + 0.5) / (d + 0.5) + 1.0) for term, d in df.items()}
+
+    @classmethod
+    def from_text(cls, text: str) -> "CaseIndex":
+        """Index a case text sentence by sentence."""
+        return cls(split_sentences(text))
+
+    def _score(self, terms: List[str], i: int) -> float:
+        tf = self._tfs[i]
+        norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / (self._avg_len or 1.0))
+        score = 0.0
+        for term in terms:
+            f = tf.get(term)
+            if f:
+                score += self._idf[term] * f * (self.k1 + 1) / (f + norm)
+        return score
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[float, int]]:
+        """Top-k (score, passage index) pairs with a positive score, best first."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        scored = [(self._score(terms, i), i) for i in range(len(self.passages))]
+        scored = [hit for hit in scored if hit[0] > 0]
+        scored.sort(key=lambda hit: (-hit[0], hit[1]))
+        return scored[:k]
+
+    def coverage(self, query: str, i: int) -> float:
+        terms = set(tokenize(query))
+        if not terms:
+            return 0.0
+        # Terms absent from the case get the idf of a term seen nowhere, so they still count against coverage
+        unseen = math.log((len(self.passages) + 0.5) / 0.5 + 1.0)
+        weights = {term: self._idf.get(term, unseen) for term in terms}
+        found = sum(w for term, w in weights.items() if term in self._tfs[i])
+        return found / sum(weights.values())
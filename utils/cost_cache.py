@@ -0,0 +1,179 @@
+import atexit
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from data_models import CPTMapping
+
+# File layout (little endian):
+#   magic | u32 record count | u64 record offsets, sorted by key | records
+# Each record:
+#   u16 key_len, key | f64 cost | f32 confidence | u16 name_len, test_name | u8 ncodes, (u8 len, code) * ncodes
+_MAGIC = b"SDBCC\x00\x01\x00"
+_HEADER = struct.Struct("<I")
+_OFFSET = struct.Struct("<Q")
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_VALUES = struct.Struct("<df")
+
+
+def _encode_record(key: str, mapping: CPTMapping) -> bytes:
+    key_b = key.encode("utf-8")
+    name_b = mapping.test_name.encode("utf-8")
+    codes = [str(c).encode("utf-8")[:255] for c in mapping.cpt_codes][:255]
+    parts = [_U16.pack(len(key_b)), key_b,
+             _VALUES.pack(mapping.estimated_cost, mapping.confidence),
+             _U16.pack(len(name_b)), name_b,
+             _U8.pack(len(codes))]
+    for code in codes:
+        parts += [_U8.pack(len(code)), code]
+    return b"".join(parts)
+
+
+def write_cost_table(path: str, entries: Dict[str, CPTMapping]) -> None:
+    """Atomically write entries as a sorted, mmap-able table."""
+    records = [_encode_record(key, entries[key]) for key in sorted(entries)]
+    offset = len(_MAGIC) + _HEADER.size + _OFFSET.size * len(records)
+    offsets = []
+    for record in records:
+        offsets.append(_OFFSET.pack(offset))
+        offset += len(record)
+
+    cache_dir = os.path.dirname(path) or "."
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_MAGIC)
+        f.write(_HEADER.pack(len(records)))
+        f.writelines(offsets)
+        f.writelines(records)
+    os.replace(tmp_path, path)
+
+
+class _Keys:
+    """Sequence view of the table's keys so bisect can search the mapped file directly."""
+
+    def __init__(self, mm: mmap.mmap, offsets: List[int]):
+        self._mm = mm
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, i: int) -> bytes:
+        pos = self._offsets[i]
+        (key_len,) = _U16.unpack_from(self._mm, pos)
+        return self._mm[pos + 2:pos + 2 + key_len]
+
+
+class CostCache:
+    """Test-cost estimates persisted across runs as a sorted table read through mmap.
+
+    Lookups binary-search the mapped file, so loading does not decode every entry.
+    New estimates stay in memory until flush(), which merges them into a fresh table;
+    flush() runs at interpreter exit once anything has been added.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+        self._memtable: Dict[str, CPTMapping] = {}
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._keys: Optional[_Keys] = None
+        self._flush_registered = False
+        self._open()
+
+    def _open(self) -> None:
+        if not self.path or not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        try:
+            self._file = open(self.path, "rb")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._mm[:len(_MAGIC)] != _MAGIC:
+                raise ValueError("not a cost cache table")
+            (count,) = _HEADER.unpack_from(self._mm, len(_MAGIC))
+            start = len(_MAGIC) + _HEADER.size
+            offsets = [o for (o,) in _OFFSET.iter_unpack(self._mm[start:start + _OFFSET.size * count])]
+            self._keys = _Keys(self._mm, offsets)
+        except Exception as e:
+            print(f"Ignoring unreadable cost cache {self.path}: {e!r}")
+            self._close()
+
+    def _close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+        if self._file is not None:
+            self._file.close()
+        self._file = self._mm = self._keys = None
+
+    def _decode(self, i: int) -> Tuple[str, CPTMapping]:
+        mm = self._mm
+        pos = self._keys._offsets[i]
+        (key_len,) = _U16.unpack_from(mm, pos)
+        pos += 2
+        key = mm[pos:pos + key_len].decode("utf-8")
+        pos += key_len
+        cost, confidence = _VALUES.unpack_from(mm, pos)
+        pos += _VALUES.size
+        (name_len,) = _U16.unpack_from(mm, pos)
+        pos += 2
+        name = mm[pos:pos + name_len].decode("utf-8")
+        pos += name_len
+        (ncodes,) = _U8.unpack_from(mm, pos)
+        pos += 1
+        codes = []
+        for _ in range(ncodes):
+            (code_len,) = _U8.unpack_from(mm, pos)
+            codes.append(mm[pos + 1:pos + 1 + code_len].decode("utf-8"))
+            pos += 1 + code_len
+        return key, CPTMapping.model_construct(
+            test_name=name, cpt_codes=codes, estimated_cost=cost, confidence=confidence
+        )
+
+    def _items_on_disk(self) -> Iterator[Tuple[str, CPTMapping]]:
+        for i in range(len(self._keys) if self._keys is not None else 0):
+            yield self._decode(i)
+
+    def get(self, key: str) -> Optional[CPTMapping]:
+        mapping = self._memtable.get(key)
+        if mapping is not None:
+            return mapping
+        with self._lock:
+            if self._keys is None:
+                return None
+            key_b = key.encode("utf-8")
+            i = bisect_left(self._keys, key_b)
+            if i < len(self._keys) and self._keys[i] == key_b:
+                return self._decode(i)[1]
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def put(self, key: str, mapping: CPTMapping) -> None:
+        with self._lock:
+            self._memtable[key] = mapping
+            if self.path and not self._flush_registered:
+                atexit.register(self.flush)
+                self._flush_registered = True
+
+    def flush(self) -> None:
+        """Merge in-memory estimates into the on-disk table and remap it."""
+        with self._lock:
+            if not self.path or not self._memtable:
+                return
+            try:
+                merged = dict(self._items_on_disk())
+                merged.update(self._memtable)
+                write_cost_table(self.path, merged)
+            except Exception as e:
+                print(f"Failed to write cost cache: {e!r}")
+                return
+            self._close()
+            self._memtable.clear()
+            self._open()
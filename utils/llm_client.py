@@ -1,19 +1,140 @@
 import time
-from typing import Mapping, List, Dict, Any, Optional
+from concurrent.futures import Future
+from typing import Mapping, List, Dict, Any, Optional, Tuple
 
+import functools
+import hashlib
+import json
 import os
+import random
+import tempfile
+import threading
 from openai import OpenAI
+from openai.types.chat import ChatCompletion
 
 from config import Config
+from utils.rate_limiter import limiter_for
 import traceback
 import os
 
 
 def get_client_from_config(config: Optional[Config] = None) -> OpenAI:
     cfg = config or Config()
-    return cfg.get_openai_client()
+    return cfg.openai_client
 
 
+def _cache_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _parse_completion(raw) -> ChatCompletion:
+    """Validate the raw JSON body in one pass (pydantic-core's parser) instead of the
+    SDK's json.loads + recursive construct; falls back to the SDK parser on mismatch."""
+    try:
+        return ChatCompletion.model_validate_json(raw.content)
+    except ValueError:
+        return raw.parse()
+
+
+def _create_completion(client: OpenAI, model: str, messages: List[Dict[str, str]], **kwargs: Any):
+    completions = client.chat.completions
+    raw_api = getattr(completions, "with_raw_response", None)
+    if not Config.FAST_RESPONSE_PARSING or kwargs.get("stream") or raw_api is None:
+        return completions.create(model=model, messages=messages, **kwargs)
+    return _parse_completion(raw_api.create(model=model, messages=messages, **kwargs))
+
+
+# Upper bound on a single retry wait, whatever the attempt number
+_MAX_BACKOFF_SEC = 60.0
+
+
+def _backoff_delay(retry_interval_sec: float, attempt: int) -> float:
+    """Exponential backoff from retry_interval_sec with jitter, so concurrent callers
+    that failed together (e.g. on a 429 burst) do not all retry at the same instant."""
+    delay = min(_MAX_BACKOFF_SEC, retry_interval_sec * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+# Keyed by (id(client), request hash); the leader holds the client, so its id stays unique
+_inflight: Dict[Tuple[int, str], Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def coalesce_inflight(func):
+    """Let concurrent identical (model, params, messages) requests on one client share a call.
+
+    Requests through different clients (e.g. another base_url or API key) are never
+    shared. The first caller issues the request; callers arriving while it is in flight wait
+    for and return the same response. Streaming requests are never shared.
+    """
+    @functools.wraps(func)
+    def wrapper(client: OpenAI, model: str, messages: List[Dict[str, str]], *args: Any, **kwargs: Any):
+        if kwargs.get("stream"):
+            return func(client, model, messages, *args, **kwargs)
+
+        params = {k: v for k, v in kwargs.items() if k not in ("max_retries", "retry_interval_sec")}
+        key = (id(client), _cache_key(model, messages, params))
+        with _inflight_lock:
+            future = _inflight.get(key)
+            leader = future is None
+            if leader:
+                future = _inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            response = func(client, model, messages, *args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _inflight_lock:
+                del _inflight[key]
+        future.set_result(response)
+        return response
+
+    return wrapper
+
+
+def cached_completion(func):
+    """Serve repeated (model, params, messages) requests from an on-disk cache.
+
+    Enabled with Config.LLM_CACHE_ENABLED; entries are stored as one JSON file per
+    request hash under Config.LLM_CACHE_DIR. Streaming and failed requests are not cached.
+    """
+    @functools.wraps(func)
+    def wrapper(client: OpenAI, model: str, messages: List[Dict[str, str]], *args: Any, **kwargs: Any):
+        if not Config.LLM_CACHE_ENABLED or kwargs.get("stream"):
+            return func(client, model, messages, *args, **kwargs)
+
+        params = {k: v for k, v in kwargs.items() if k not in ("max_retries", "retry_interval_sec")}
+        cache_dir = os.path.expanduser(Config.LLM_CACHE_DIR)
+        path = os.path.join(cache_dir, _cache_key(model, messages, params) + ".json")
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return ChatCompletion.model_validate_json(f.read())
+            except Exception:
+                pass  # unreadable entry: refetch and overwrite
+
+        response = func(client, model, messages, *args, **kwargs)
+        if isinstance(response, ChatCompletion):
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(response.model_dump_json())
+                os.replace(tmp_path, path)
+            except Exception as e:
+                print(f"Failed to write LLM cache entry: {e!r}", flush=True)
+        return response
+
+    return wrapper
+
+
+@coalesce_inflight
+@cached_completion
 def chat_completion_with_retries(
     client: OpenAI,
     model: str,
@@ -23,13 +144,13 @@ def chat_completion_with_retries(
     **kwargs: Any,
 ) -> Mapping:
     last_err: Optional[Exception] = None
+    # Pace requests to the model's RPM budget instead of discovering it through 429 retries
+    limiter = limiter_for(model)
     for attempt in range(max_retries):
+        if limiter is not None:
+            limiter.acquire()
         try:
-            return client.chat.completions.create(
-                model=model,
-                messages=messages,
-                **kwargs,
-            )
+            return _create_completion(client, model, messages, **kwargs)
         except Exception as e:  # Broad catch to handle provider SDK differences
             last_err = e
             remaining = max_retries - attempt - 1
@@ -51,11 +172,12 @@ def chat_completion_with_retries(
                     pass
             if os.getenv('SDBENCH_DEBUG', '0') in ('1','true','True','YES','yes'):
                 traceback.print_exc()
+            delay = _backoff_delay(retry_interval_sec, attempt)
             print(
-                f"Retry in {retry_interval_sec}s... ({remaining} retries left)",
+                f"Retry in {delay:.1f}s... ({remaining} retries left)",
                 flush=True,
             )
-            time.sleep(retry_interval_sec)
+            time.sleep(delay)
     if last_err:
         print("LLM request ultimately failed:", flush=True)
         print(f"  ErrorType: {type(last_err).__name__}", flush=True)
@@ -0,0 +1,45 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from config import Config
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a request slot is free."""
+
+    def __init__(self, rate_per_sec: float, capacity: Optional[float] = None):
+        self.rate = rate_per_sec
+        # Allow a burst of up to one second's worth of requests
+        self.capacity = capacity or max(1.0, rate_per_sec)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_limiters: Dict[str, Optional[TokenBucket]] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(model: str, config: Optional[Config] = None) -> Optional[TokenBucket]:
+    """Process-wide limiter for a model id, or None when no RPM limit is configured."""
+    limiter = _limiters.get(model, False)
+    if limiter is not False:
+        return limiter
+    with _limiters_lock:
+        if model not in _limiters:
+            rpm = (config or Config()).rpm_limit(model)
+            _limiters[model] = TokenBucket(rpm / 60.0) if rpm > 0 else None
+        return _limiters[model]
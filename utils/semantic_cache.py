@@ -0,0 +1,202 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+
+try:  # optional sentence embeddings; hashed character trigrams are used without them
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+try:  # optional exact inner-product index; numpy matrix search is used without it
+    import faiss
+except ImportError:
+    faiss = None
+
+_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+_TRIGRAM_DIM = 4096
+_CASE_ID_RE = re.compile(r"\b(?:DA|CASE|case)_[A-Za-z0-9-]+\b")
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """Drop case ids and collapse whitespace so cosmetic differences do not miss the cache."""
+    return _WS_RE.sub(" ", _CASE_ID_RE.sub("", text)).strip()
+
+
+class _TrigramEncoder:
+    """Hashed character-trigram counts, L2-normalised; a dependency-free stand-in for MiniLM."""
+
+    def encode(self, text: str) -> np.ndarray:
+        vec = np.zeros(_TRIGRAM_DIM, dtype=np.float32)
+        text = text.lower()
+        for i in range(len(text) - 2):
+            vec[zlib.crc32(text[i:i + 3].encode("utf-8")) % _TRIGRAM_DIM] += 1.0
+        return vec
+
+
+class _Bucket:
+    """Embeddings and responses for one (role, model, system prompt, temperature)."""
+
+    def __init__(self, dim: int):
+        self.index = faiss.IndexFlatIP(dim) if faiss is not None else None
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.responses: List[str] = []
+        self.created: List[float] = []
+
+    def add(self, emb: np.ndarray, response: str, created: float) -> None:
+        if self.index is not None:
+            self.index.add(emb[None, :])
+        else:
+            self.matrix = np.vstack([self.matrix, emb[None, :]])
+        self.responses.append(response)
+        self.created.append(created)
+
+    def nearest(self, emb: np.ndarray):
+        if not self.responses:
+            return -1.0, -1
+        if self.index is not None:
+            scores, ids = self.index.search(emb[None, :], 1)
+            return float(scores[0][0]), int(ids[0][0])
+        scores = self.matrix @ emb
+        i = int(np.argmax(scores))
+        return float(scores[i]), i
+
+
+class SemanticCache:
+    """Reuses role responses for identical or near-identical prompts, persisted in SQLite.
+
+    Lookups first try an exact sha256 of the normalised prompt, then the most similar
+    stored prompt in the same bucket (cosine > threshold). A bucket is one role, model,
+    system prompt and temperature for one exact scope (the case context the prompt is
+    about), so a reply is never reused for a different case or case state, however
+    similar the text. Entries older than their role's TTL are ignored; empty responses
+    are never stored.
+    """
+
+    def __init__(self, path: Optional[str], threshold: float = 0.92,
+                 ttl_by_role: Optional[Dict[str, int]] = None):
+        self.path = path
+        self.threshold = threshold
+        self.ttl_by_role = ttl_by_role or {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._encoder = None
+        self._exact: Dict[str, tuple] = {}
+        self._buckets: Dict[str, _Bucket] = {}
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, bucket TEXT, role TEXT,"
+                    " embedding BLOB, response TEXT, created REAL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Semantic cache disabled persistence for {path}: {e!r}")
+                self._db = None
+
+    @staticmethod
+    def _bucket_key(role: str, model: str, system_prompt: str, temperature: float, scope: str) -> str:
+        payload = f"{role}\0{model}\0{temperature}\0{system_prompt}\0{scope}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _expired(self, role: str, created: float) -> bool:
+        ttl = self.ttl_by_role.get(role, 0)
+        return ttl > 0 and time.time() - created > ttl
+
+    def _ensure_loaded(self) -> None:
+        if self._encoder is None:
+            self._encoder = SentenceTransformer(_EMBEDDING_MODEL) if SentenceTransformer is not None else _TrigramEncoder()
+            self._load()
+
+    def _encode(self, text: str) -> np.ndarray:
+        emb = np.asarray(self._encoder.encode(text), dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(emb))
+        return emb / norm if norm else emb
+
+    def _load(self) -> None:
+        """Fill the in-memory buckets from SQLite (called once the embedding size is known)."""
+        if self._db is None:
+            return
+        rows = self._db.execute("SELECT key, bucket, role, embedding, response, created FROM responses").fetchall()
+        for key, bucket, role, blob, response, created in rows:
+            if self._expired(role, created):
+                continue
+            emb = np.frombuffer(blob, dtype=np.float32)
+            self._exact[key] = (role, response, created)
+            self._buckets.setdefault(bucket, _Bucket(emb.shape[0])).add(emb, response, created)
+
+    def get(self, role: str, model: str, system_prompt: str, prompt: str,
+            temperature: float = 0.0, *, scope: str) -> Optional[str]:
+        norm = normalize_prompt(prompt)
+        bucket = self._bucket_key(role, model, system_prompt, temperature, scope)
+        key = hashlib.sha256(f"{bucket}\0{norm}".encode("utf-8")).hexdigest()
+        with self._lock:
+            self._ensure_loaded()
+            hit = self._exact.get(key)
+            if hit is not None and not self._expired(role, hit[2]):
+                self.hits += 1
+                return hit[1]
+            emb = self._encode(norm)
+            entries = self._buckets.get(bucket)
+            if entries is not None:
+                score, i = entries.nearest(emb)
+                if score > self.threshold and not self._expired(role, entries.created[i]):
+                    self.hits += 1
+                    return entries.responses[i]
+            self.misses += 1
+        return None
+
+    def put(self, role: str, model: str, system_prompt: str, prompt: str, response: str,
+            temperature: float = 0.0, *, scope: str) -> None:
+        if not response:
+            return
+        norm = normalize_prompt(prompt)
+        bucket = self._bucket_key(role, model, system_prompt, temperature, scope)
+        key = hashlib.sha256(f"{bucket}\0{norm}".encode("utf-8")).hexdigest()
+        created = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            emb = self._encode(norm)
+            self._exact[key] = (role, response, created)
+            self._buckets.setdefault(bucket, _Bucket(emb.shape[0])).add(emb, response, created)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, bucket, role, emb.tobytes(), response, created),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Failed to write semantic cache entry: {e!r}")
+
+
+_caches: Dict[tuple, SemanticCache] = {}
+_caches_lock = threading.Lock()
+
+
+def semantic_cache_for(config: Optional[Config] = None) -> Optional[SemanticCache]:
+    """Process-wide semantic cache for the configured path, or None when disabled."""
+    cfg = config or Config()
+    if not cfg.SEMANTIC_CACHE_ENABLED:
+        return None
+    key = (cfg.SEMANTIC_CACHE_PATH, cfg.SEMANTIC_CACHE_THRESHOLD, cfg.SEMANTIC_CACHE_TTLS)
+    with _caches_lock:
+        if key not in _caches:
+            path = cfg.SEMANTIC_CACHE_PATH
+            if path:
+                path = os.path.expanduser(path)
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            _caches[key] = SemanticCache(path, cfg.SEMANTIC_CACHE_THRESHOLD, cfg.semantic_cache_ttls())
+        return _caches[key]
@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from config import Config
+
+
+class SyntheticResultCache:
+    """Synthetic gatekeeper test results keyed by (model, diagnosis, test), persisted in SQLite.
+
+    Cases with the same final diagnosis get the same made-up result for the same
+    test, so repeat benchmark runs skip the most expensive gatekeeper calls.
+    Keys are expected to be normalised by the caller.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results (model TEXT, diagnosis TEXT, test TEXT, result TEXT,"
+            " PRIMARY KEY (model, diagnosis, test))"
+        )
+        self._db.commit()
+
+    def get(self, model: str, diagnosis: str, test: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result FROM results WHERE model = ? AND diagnosis = ? AND test = ?",
+                (model, diagnosis, test),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, model: str, diagnosis: str, test: str, result: str) -> None:
+        with self._lock:
+            try:
+                self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                 (model, diagnosis, test, result))
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Failed to write synthetic result cache entry: {e!r}")
+
+
+_caches: Dict[str, SyntheticResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def synthetic_cache_for(config: Optional[Config] = None) -> Optional[SyntheticResultCache]:
+    """Process-wide cache for the configured path, or None when the path is empty."""
+    cfg = config or Config()
+    if not cfg.SYNTHETIC_CACHE_PATH:
+        return None
+    path = os.path.expanduser(cfg.SYNTHETIC_CACHE_PATH)
+    with _caches_lock:
+        if path not in _caches:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                _caches[path] = SyntheticResultCache(path)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Synthetic result cache disabled for {path}: {e!r}")
+                return None
+        return _caches[path]